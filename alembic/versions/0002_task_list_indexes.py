@@ -0,0 +1,56 @@
+"""task list indexes
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 09:30:00.000000
+
+Backs the filters and sorts of `GET /api/v1/tasks`. On PostgreSQL the indexes
+are built CONCURRENTLY, outside the migration transaction, so the tasks table
+stays writable while they build.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# name, columns, extra `create_index` keywords
+INDEXES = [
+    ("ix_tasks_created_at_id", ["created_at", "id"], {}),
+    ("ix_tasks_created_by_created_at", ["created_by", "created_at", "id"], {}),
+    ("ix_tasks_created_by_due_date", ["created_by", "due_date", "id"], {}),
+    ("ix_tasks_created_by_status", ["created_by", "status", "priority"], {}),
+    ("ix_tasks_assigned_to", ["assigned_to"], {}),
+    ("ix_tasks_tags", ["tags"], {"postgresql_using": "gin"}),
+]
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, columns, kwargs in INDEXES:
+            op.create_index(
+                name,
+                "tasks",
+                columns,
+                unique=False,
+                if_not_exists=True,
+                postgresql_concurrently=True,
+                **kwargs,
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, _, _ in reversed(INDEXES):
+            op.drop_index(
+                name,
+                table_name="tasks",
+                if_exists=True,
+                postgresql_concurrently=True,
+            )
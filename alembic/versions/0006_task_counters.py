@@ -0,0 +1,73 @@
+"""task counters
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 16:00:00.000000
+
+Adds `task_counters`, the per-user task counts by status that task list
+totals are read from, and the triggers maintaining them, see
+`api.db.counters`. The counters are filled in the same transaction as the
+triggers are created. Creating a trigger blocks writes to `tasks` until the
+migration commits, so every write is counted exactly once. On large
+databases, run it in a quiet window: writes wait for one scan of the table.
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from api.db.counters import (
+    COUNTERS_TABLE,
+    POSTGRESQL_DDL,
+    SQLITE_DDL,
+    SYNC_FUNCTION,
+    counters,
+    visible_counts_statement,
+)
+
+# revision identifiers, used by Alembic.
+revision: str = "0006"
+down_revision: Union[str, None] = "0005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        COUNTERS_TABLE,
+        sa.Column("user_id", sa.String(), nullable=False),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("total", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("revision", sa.BigInteger(), server_default="0", nullable=False),
+        sa.PrimaryKeyConstraint("user_id", "status"),
+    )
+
+    dialect = op.get_context().dialect.name
+    if dialect == "postgresql":
+        for statement in POSTGRESQL_DDL:
+            op.execute(statement)
+    elif dialect == "sqlite":
+        for statement in SQLITE_DDL:
+            op.execute(statement)
+
+    counts = visible_counts_statement().subquery()
+    op.execute(
+        counters.insert().from_select(
+            ["user_id", "status", "total", "revision"],
+            sa.select(counts.c.user_id, counts.c.status, counts.c.total, sa.literal(1)),
+        )
+    )
+
+
+def downgrade() -> None:
+    dialect = op.get_context().dialect.name
+    if dialect == "postgresql":
+        for operation in ("insert", "update", "delete"):
+            op.execute(f"DROP TRIGGER IF EXISTS {COUNTERS_TABLE}_{operation} ON tasks")
+        op.execute(f"DROP FUNCTION IF EXISTS {SYNC_FUNCTION}()")
+    elif dialect == "sqlite":
+        for suffix in ("ai", "ad", "au"):
+            op.execute(f"DROP TRIGGER IF EXISTS {COUNTERS_TABLE}_{suffix}")
+
+    op.drop_table(COUNTERS_TABLE)
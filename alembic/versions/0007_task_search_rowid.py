@@ -0,0 +1,86 @@
+"""task search rowid
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 18:00:00.000000
+
+Keys the SQLite FTS5 index of tasks by `tasks.search_rowid`, an integer
+numbered by the insert trigger, instead of the implicit rowid of `tasks`,
+which VACUUM may renumber. The FTS table is rebuilt from the tasks.
+PostgreSQL keeps its search vector on the row and is left as is.
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0007"
+down_revision: Union[str, None] = "0006"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+FTS_OPTIONS = "tokenize='porter unicode61'"
+
+
+def drop_fts() -> None:
+    for suffix in ("ai", "ad", "au"):
+        op.execute(f"DROP TRIGGER IF EXISTS tasks_fts_{suffix}")
+    op.execute("DROP TABLE IF EXISTS tasks_fts")
+
+
+def create_fts(key: str) -> None:
+    """FTS5 table over the tasks, keyed by their `key` column, its triggers
+    and its rows"""
+    op.execute(
+        "CREATE VIRTUAL TABLE tasks_fts USING fts5(title, description, "
+        f"content='tasks', content_rowid='{key}', {FTS_OPTIONS})"
+    )
+    if key == "rowid":
+        inserted = (
+            "INSERT INTO tasks_fts(rowid, title, description) "
+            "VALUES (new.rowid, new.title, new.description);"
+        )
+    else:
+        inserted = (
+            f"UPDATE tasks SET {key} = (SELECT coalesce(max({key}), 0) + 1 "
+            "FROM tasks) WHERE id = new.id; "
+            "INSERT INTO tasks_fts(rowid, title, description) "
+            f"SELECT {key}, title, description FROM tasks WHERE id = new.id;"
+        )
+    deleted = (
+        "INSERT INTO tasks_fts(tasks_fts, rowid, title, description) "
+        f"VALUES ('delete', old.{key}, old.title, old.description);"
+    )
+    op.execute(
+        f"CREATE TRIGGER tasks_fts_ai AFTER INSERT ON tasks BEGIN {inserted} END"
+    )
+    op.execute(f"CREATE TRIGGER tasks_fts_ad AFTER DELETE ON tasks BEGIN {deleted} END")
+    op.execute(
+        "CREATE TRIGGER tasks_fts_au AFTER UPDATE OF title, description ON tasks "
+        f"BEGIN {deleted} "
+        "INSERT INTO tasks_fts(rowid, title, description) "
+        f"VALUES (new.{key}, new.title, new.description); END"
+    )
+    op.execute("INSERT INTO tasks_fts(tasks_fts) VALUES ('rebuild')")
+
+
+def upgrade() -> None:
+    if op.get_context().dialect.name != "sqlite":
+        return
+
+    drop_fts()
+    op.execute("ALTER TABLE tasks ADD COLUMN search_rowid INTEGER")
+    op.execute("UPDATE tasks SET search_rowid = rowid")
+    op.execute("CREATE UNIQUE INDEX ix_tasks_search_rowid ON tasks (search_rowid)")
+    create_fts("search_rowid")
+
+
+def downgrade() -> None:
+    if op.get_context().dialect.name != "sqlite":
+        return
+
+    drop_fts()
+    op.execute("DROP INDEX IF EXISTS ix_tasks_search_rowid")
+    op.execute("ALTER TABLE tasks DROP COLUMN search_rowid")
+    create_fts("rowid")
@@ -0,0 +1,55 @@
+"""Import tasks for a user from an NDJSON or CSV file
+
+Runs the same import as `POST /api/v1/tasks/import` straight against the
+database, without the upload. Needs the same environment as the API (a
+`.env` file or exported variables).
+
+    python -m api.cli.import_tasks tasks.csv --user owner@example.com
+    zcat tasks.ndjson.gz | python -m api.cli.import_tasks - --user owner@example.com
+"""
+
+import argparse
+import sys
+
+from sqlalchemy import select
+
+from api.core.dependencies.security import UserPrincipal
+from api.db import database
+from api.v1.models.user import User
+from api.v1.schemas import task as TaskSchema
+from api.v1.services.task_import import import_tasks
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("path", help="File to import, `-` reads standard input")
+    parser.add_argument("--user", required=True, help="Email of the tasks' creator")
+    parser.add_argument(
+        "--format",
+        choices=[item.value for item in TaskSchema.TaskFileFormat],
+        help="File format, guessed from the file extension by default",
+    )
+    args = parser.parse_args()
+
+    import_format = TaskSchema.TaskFileFormat(
+        args.format or ("csv" if args.path.endswith(".csv") else "ndjson")
+    )
+
+    database.init_engines()
+    with database.SessionLocal() as db:
+        user = db.scalars(select(User).where(User.email == args.user)).first()
+        if user is None:
+            parser.error(f"No user with email {args.user}")
+        current_user = UserPrincipal.from_user(user)
+
+        if args.path == "-":
+            response = import_tasks(db, sys.stdin.buffer, import_format, current_user)
+        else:
+            with open(args.path, "rb") as file:
+                response = import_tasks(db, file, import_format, current_user)
+
+    print(response.data.model_dump_json(indent=2))
+
+
+if __name__ == "__main__":
+    main()
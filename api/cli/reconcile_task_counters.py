@@ -0,0 +1,43 @@
+"""Fix task counters that drifted from the tasks they count
+
+Walks the users in batches of `--batch-size`, recounting their tasks and
+rewriting the counters that differ, one transaction per batch. Safe to run
+against a live database, e.g. from a nightly cron job. Needs the same
+environment as the API (a `.env` file or exported variables).
+
+    python -m api.cli.reconcile_task_counters --batch-size 500
+"""
+
+import argparse
+
+from api.db import database
+from api.db.counters import reconcile_batch, user_batch_statement
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--batch-size", type=int, default=1000, help="Users recounted per transaction"
+    )
+    args = parser.parse_args()
+
+    checked = fixed = 0
+    last_user_id = None
+    database.init_engines()
+    with database.engine.connect() as connection:
+        while True:
+            user_ids = connection.scalars(
+                user_batch_statement(last_user_id, args.batch_size)
+            ).all()
+            if not user_ids:
+                break
+            fixed += reconcile_batch(connection, user_ids)
+            connection.commit()
+            checked += len(user_ids)
+            last_user_id = user_ids[-1]
+
+    print(f"Checked the task counters of {checked} users, fixed {fixed}")
+
+
+if __name__ == "__main__":
+    main()
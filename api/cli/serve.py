@@ -0,0 +1,305 @@
+"""Serve the API with a pool of forked uvicorn workers
+
+The master process binds the socket, calibrates the bcrypt cost once for
+all workers and, with `SERVER_PRELOAD`, imports the app before forking, so
+workers share its memory pages until they write to them. Each worker runs
+uvicorn with uvloop and httptools on the shared socket, and reports ready
+over a pipe once its lifespan startup is done.
+
+Signals to the master:
+
+- `SIGHUP` replaces the workers one at a time, each old worker being
+  stopped once its replacement is ready. Preloaded workers restart on the
+  code the master loaded, restart the master itself to deploy new code.
+- `SIGTERM` or `SIGINT` stop the workers, which finish their in-flight
+  requests within `SERVER_GRACEFUL_TIMEOUT` seconds, then the master.
+
+Workers that exit, e.g. after `SERVER_MAX_REQUESTS`, are replaced. POSIX
+only, needs the same environment as the API (a `.env` file or exported
+variables).
+
+    python -m api.cli.serve --workers 4 --max-requests 10000
+    python -m api.cli.serve --reload  # single process, for development
+"""
+
+import argparse
+import importlib
+import logging
+import os
+import random
+import select
+import signal
+import socket
+import sys
+import time
+from typing import Dict, List, Optional, Union
+
+import uvicorn
+from starlette.types import ASGIApp
+
+from api.core.config import settings
+from api.utils import logger as logging_setup
+from api.utils import password_utils
+
+APP = "main:app"
+
+# a worker that dies before it is ready is respawned after this many seconds
+RESPAWN_DELAY = 1.0
+
+logger = logging.getLogger("api.server")
+
+
+class WorkerServer(uvicorn.Server):
+    """uvicorn server telling the master once it accepts requests"""
+
+    def __init__(self, config: uvicorn.Config, ready_fd: int) -> None:
+        super().__init__(config)
+        self.ready_fd = ready_fd
+
+    async def startup(self, sockets: Optional[List[socket.socket]] = None) -> None:
+        await super().startup(sockets=sockets)
+        if self.started:
+            os.write(self.ready_fd, b"1")
+        os.close(self.ready_fd)
+
+
+def exit_worker(signum: int, frame) -> None:
+    raise SystemExit(0)
+
+
+def run_worker(
+    app: Union[ASGIApp, str], sock: socket.socket, ready_fd: int, args
+) -> None:
+    # the master's handlers were inherited. uvicorn installs its own while
+    # serving, then raises the signal it stopped on again for these handlers,
+    # which exit through `spawn` so the log queue is flushed
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, exit_worker)
+    for signum in (signal.SIGHUP, signal.SIGCHLD):
+        signal.signal(signum, signal.SIG_DFL)
+    signal.set_wakeup_fd(-1)
+
+    max_requests = None
+    if args.max_requests:
+        max_requests = args.max_requests + random.randint(0, args.max_requests_jitter)
+    config = uvicorn.Config(
+        app,
+        loop="uvloop",
+        http="httptools",
+        lifespan="on",
+        limit_max_requests=max_requests,
+        timeout_graceful_shutdown=args.graceful_timeout,
+        # logging is set up by `api.utils.logger`, and requests are logged
+        # by `AccessLogMiddleware`
+        log_config=None,
+        access_log=False,
+    )
+    WorkerServer(config, ready_fd).run(sockets=[sock])
+
+
+class Master:
+    """Forks, watches and replaces the workers"""
+
+    def __init__(self, app: Union[ASGIApp, str], sock: socket.socket, args) -> None:
+        self.app = app
+        self.sock = sock
+        self.args = args
+        self.workers: Dict[int, float] = {}  # pid to start time
+        self.retiring: Dict[int, float] = {}  # pid to stop deadline
+        self.signals: List[int] = []
+
+    def spawn(self) -> Optional[int]:
+        """Fork a worker and wait until it is ready, return its pid, or
+        `None` when it died or timed out first"""
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            status = 1
+            try:
+                run_worker(self.app, self.sock, write_fd, self.args)
+                status = 0
+            except SystemExit as exc:
+                status = exc.code or 0
+            except BaseException:
+                logger.exception("Worker failed")
+            finally:
+                # `os._exit` skips the atexit hook flushing the log queue
+                logging_setup.listener.stop()
+                os._exit(status)
+
+        os.close(write_fd)
+        try:
+            readable, _, _ = select.select([read_fd], [], [], self.args.startup_timeout)
+            ready = bool(readable) and os.read(read_fd, 1) == b"1"
+        finally:
+            os.close(read_fd)
+
+        if ready:
+            self.workers[pid] = time.monotonic()
+            logger.info(f"Worker {pid} ready")
+            return pid
+
+        logger.error(f"Worker {pid} did not become ready, stopping it")
+        self.kill(pid)
+        return None
+
+    def kill(self, pid: int) -> None:
+        try:
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+        except (ChildProcessError, ProcessLookupError):
+            pass
+
+    def retire(self, pid: int) -> None:
+        """Ask a worker to drain its requests and stop"""
+        self.workers.pop(pid, None)
+        self.retiring[pid] = time.monotonic() + self.args.graceful_timeout + 5
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+
+    def reap(self) -> None:
+        """Collect exited workers, and kill retiring ones past their deadline"""
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                break
+            if self.retiring.pop(pid, None) is not None:
+                continue
+            if self.workers.pop(pid, None) is None:
+                continue
+            code = os.waitstatus_to_exitcode(status)
+            if code == 0:
+                # e.g. recycled after `SERVER_MAX_REQUESTS`
+                logger.info(f"Worker {pid} exited, replacing it")
+            else:
+                logger.warning(f"Worker {pid} exited with status {code}, replacing it")
+
+        now = time.monotonic()
+        for pid, deadline in list(self.retiring.items()):
+            if now > deadline:
+                logger.warning(f"Worker {pid} did not drain in time, killing it")
+                self.retiring.pop(pid)
+                self.kill(pid)
+
+    def fill(self) -> bool:
+        """Spawn workers up to the configured count, False if one failed"""
+        while len(self.workers) < self.args.workers:
+            if self.spawn() is None:
+                return False
+        return True
+
+    def rolling_reload(self) -> None:
+        logger.info("Reloading workers one at a time")
+        for pid in list(self.workers):
+            if self.spawn() is None:
+                logger.error("Reload aborted, the old workers keep serving")
+                return
+            self.retire(pid)
+
+    def stop(self) -> None:
+        logger.info("Stopping workers, draining in-flight requests")
+        for pid in list(self.workers):
+            self.retire(pid)
+        while self.retiring:
+            self.reap()
+            time.sleep(0.1)
+        self.sock.close()
+
+    def on_signal(self, signum: int, frame) -> None:
+        self.signals.append(signum)
+
+    def run(self) -> int:
+        wakeup_read, wakeup_write = os.pipe()
+        os.set_blocking(wakeup_read, False)
+        os.set_blocking(wakeup_write, False)
+        signal.set_wakeup_fd(wakeup_write)
+        for signum in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT, signal.SIGCHLD):
+            signal.signal(signum, self.on_signal)
+
+        if not self.fill():
+            logger.error("Workers failed to start")
+            self.stop()
+            return 1
+        logger.info(
+            f"Serving on {self.args.host}:{self.args.port} "
+            f"with {self.args.workers} workers"
+        )
+
+        while True:
+            readable, _, _ = select.select([wakeup_read], [], [], 1.0)
+            if readable:
+                os.read(wakeup_read, 512)
+            signals, self.signals = self.signals, []
+            if signal.SIGTERM in signals or signal.SIGINT in signals:
+                self.stop()
+                return 0
+            if signal.SIGHUP in signals:
+                self.rolling_reload()
+
+            self.reap()
+            if not self.fill():
+                # e.g. the database is down, try again instead of spinning
+                time.sleep(RESPAWN_DELAY)
+
+
+def default_workers() -> int:
+    """One worker per CPU the process may run on"""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default=settings.SERVER_HOST)
+    parser.add_argument("--port", type=int, default=settings.SERVER_PORT)
+    parser.add_argument(
+        "--workers", type=int, default=settings.SERVER_WORKERS or default_workers()
+    )
+    parser.add_argument(
+        "--max-requests", type=int, default=settings.SERVER_MAX_REQUESTS
+    )
+    parser.add_argument(
+        "--max-requests-jitter", type=int, default=settings.SERVER_MAX_REQUESTS_JITTER
+    )
+    parser.add_argument(
+        "--preload",
+        action=argparse.BooleanOptionalAction,
+        default=settings.SERVER_PRELOAD,
+    )
+    parser.add_argument(
+        "--graceful-timeout", type=int, default=settings.SERVER_GRACEFUL_TIMEOUT
+    )
+    parser.add_argument(
+        "--startup-timeout", type=int, default=settings.SERVER_STARTUP_TIMEOUT
+    )
+    parser.add_argument(
+        "--reload",
+        action="store_true",
+        help="single process restarting on code changes, for development",
+    )
+    args = parser.parse_args()
+
+    if args.reload:
+        uvicorn.run(APP, host=args.host, port=args.port, reload=True)
+        return
+
+    # calibrated once, so every worker hashes with the same cost
+    settings.BCRYPT_ROUNDS = password_utils.configure_bcrypt_cost()
+
+    app: Union[ASGIApp, str] = APP
+    if args.preload:
+        app = importlib.import_module("main").app
+
+    sock = socket.create_server((args.host, args.port), backlog=2048)
+    sys.exit(Master(app, sock, args).run())
+
+
+if __name__ == "__main__":
+    main()
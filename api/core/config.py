@@ -1,4 +1,5 @@
 import os
+from typing import Dict, Optional
 from pydantic_settings import BaseSettings
 from pathlib import Path
 
@@ -23,15 +24,129 @@ class Settings(BaseSettings):
     DATABASE_PASSWORD: str
     DATABASE_NAME: str
     DATABASE_TYPE: str
+    # Full SQLAlchemy URL, overrides the DATABASE_* parts above when set
+    # e.g. sqlite:///./local.db for local runs
+    DATABASE_URL: Optional[str] = None
+    # Serve the API from the asyncio engine (asyncpg / aiosqlite)
+    ASYNC_DATABASE: bool = False
+    # Connection pool of each engine, per worker process. Sizes apply to queue
+    # pools, SQLite in memory and aiosqlite do not pool connections that way
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: int = 30  # seconds to wait for a free connection
+    DB_POOL_RECYCLE: int = 1800  # seconds before a connection is replaced, -1 never
+    DB_POOL_PRE_PING: bool = True
+    # PostgreSQL statement_timeout in milliseconds, 0 disables it
+    DB_STATEMENT_TIMEOUT_MS: int = 0
+    # Read replica for read-only routes, reads use the primary when unset.
+    # After a write, the users it touched read from the primary for
+    # REPLICA_STICKY_SECONDS so replication lag never hides their own writes
+    REPLICA_DATABASE_URL: Optional[str] = None
+    REPLICA_STICKY_SECONDS: int = 5
+
+    # Authenticated principal cache
+    PRINCIPAL_CACHE_SIZE: int = 10000
+    PRINCIPAL_CACHE_TTL: int = 60  # seconds
+
+    # Password hashing pool, defaults to min(4, cpu count) workers
+    PASSWORD_HASH_WORKERS: Optional[int] = None
+    PASSWORD_HASH_MAX_QUEUE: int = 64
+    # Pin the bcrypt cost, otherwise it is calibrated to BCRYPT_TARGET_MS on the
+    # first start and kept in BCRYPT_ROUNDS_FILE, so restarts do not change it
+    BCRYPT_ROUNDS: Optional[int] = None
+    BCRYPT_TARGET_MS: int = 250
+    BCRYPT_ROUNDS_FILE: str = os.path.join(BASE_DIR, "bcrypt_rounds")
+
+    # Verified JWT cache, 0 disables it
+    JWT_CACHE_SIZE: int = 10000
+
+    # Request metrics cardinality bounds
+    METRICS_MAX_SERIES: int = 1000
+    METRICS_MAX_CLIENTS_PER_ROUTE: int = 100
+
+    # Serialize task responses straight from ORM rows with orjson
+    FAST_TASK_SERIALIZATION: bool = False
+
+    # Cache of task read responses: none, memory, redis or fakeredis
+    # (an in-process stand-in for redis, for local runs)
+    RESPONSE_CACHE_BACKEND: str = "none"
+    RESPONSE_CACHE_URL: str = "redis://localhost:6379/0"
+    RESPONSE_CACHE_SIZE: int = 10000  # entries, memory and fakeredis backends
+    RESPONSE_CACHE_TTL: int = 300  # seconds
+
+    # Rows fetched per round trip when streaming a task export
+    TASK_EXPORT_BATCH_SIZE: int = 1000
+
+    # Task imports: rows validated and loaded per transaction, and how many
+    # rejected rows are detailed in the report
+    TASK_IMPORT_CHUNK_SIZE: int = 5000
+    TASK_IMPORT_MAX_ERRORS: int = 100
+
+    # Rate limiting: a token bucket per client and policy, the client being the
+    # user of a valid access token or else the client address. Policies are
+    # `<requests>/<second|minute|hour>`, the request count doubling as the
+    # burst, keyed by path prefix with an optional method, longest match wins.
+    # The redis backend shares buckets between workers
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_BACKEND: str = "memory"  # memory or redis
+    RATE_LIMIT_URL: str = "redis://localhost:6379/0"
+    RATE_LIMIT_DEFAULT: str = "600/minute"
+    RATE_LIMIT_POLICIES: Dict[str, str] = {
+        "POST /api/v1/users/login": "10/minute",
+        "POST /api/v1/users/register": "10/minute",
+        "POST /api/v1/users/token/refresh": "30/minute",
+        "/api/v1/tasks": "300/minute",
+    }
+    RATE_LIMIT_MAX_KEYS: int = 100000  # buckets kept by the memory backend
+
+    # Opt-in per-request SQL timing in a `Server-Timing` header. Statements
+    # run PROFILING_REPEAT_THRESHOLD times or more in one request are flagged
+    # as likely N+1 queries. Requests sending `X-Profile: <PROFILING_TOKEN>`,
+    # and a PROFILING_SAMPLE_RATE fraction of all requests, are also profiled
+    # by stack sampling into PROFILES_DIR
+    PROFILING_ENABLED: bool = False
+    PROFILING_REPEAT_THRESHOLD: int = 5
+    PROFILING_TOKEN: Optional[str] = None
+    PROFILING_SAMPLE_RATE: float = 0.0
+    PROFILING_INTERVAL_MS: float = 5.0
+
+    # Logging: JSON lines written by a background thread, so slow output
+    # never blocks a request. Records are dropped, and counted, while
+    # LOG_QUEUE_SIZE of them wait. LOG_LEVELS sets the level of single loggers
+    # and LOG_SAMPLE_RATES keeps a fraction of a logger's records below ERROR,
+    # e.g. {"api.access": 0.1}
+    LOG_LEVEL: str = "INFO"
+    LOG_LEVELS: Dict[str, str] = {}
+    LOG_FILE: Optional[str] = "error.log"
+    LOG_FILE_LEVEL: str = "ERROR"
+    LOG_QUEUE_SIZE: int = 10000
+    LOG_SAMPLE_RATES: Dict[str, float] = {}
+
+    # Production server, `python -m api.cli.serve`. SERVER_WORKERS of 0 runs
+    # one worker per CPU. A worker is replaced after SERVER_MAX_REQUESTS
+    # requests, plus a random share of SERVER_MAX_REQUESTS_JITTER so workers
+    # do not all restart at once, 0 keeps workers for good. SERVER_PRELOAD
+    # imports the app before forking, so workers share its memory
+    SERVER_HOST: str = "0.0.0.0"
+    SERVER_PORT: int = 7001
+    SERVER_WORKERS: int = 0
+    SERVER_MAX_REQUESTS: int = 0
+    SERVER_MAX_REQUESTS_JITTER: int = 0
+    SERVER_PRELOAD: bool = True
+    SERVER_GRACEFUL_TIMEOUT: int = 30  # seconds to drain in-flight requests
+    SERVER_STARTUP_TIMEOUT: int = 60  # seconds for a worker to become ready
 
     # Directories
     MEDIA_DIR: str = os.path.join(BASE_DIR, "media")
     STATIC_DIR: str = os.path.join(BASE_DIR, "static")
     TEMPLATES_DIR: str = os.path.join(BASE_DIR, "templates")
+    PROFILES_DIR: str = os.path.join(BASE_DIR, "profiles")
 
     @property
     def database_url(self) -> str:
         """Dynamically construct DATABASE_URL"""
+        if self.DATABASE_URL:
+            return self.DATABASE_URL
         return f"{self.DATABASE_TYPE}://{self.DATABASE_USER}:{self.DATABASE_PASSWORD}@{self.DATABASE_HOST}:{self.DATABASE_PORT}/{self.DATABASE_NAME}"
 
     class Config:
@@ -0,0 +1,42 @@
+from datetime import datetime
+from typing import Annotated, List, Optional
+
+from fastapi import Query
+
+from api.v1.schemas.task import TaskListFilters, TaskPriority, TaskSort, TaskStatus
+
+
+def get_task_list_filters(
+    task_status: Annotated[
+        Optional[List[TaskStatus]],
+        Query(alias="status", description="Only tasks with one of these statuses"),
+    ] = None,
+    priority: Annotated[
+        Optional[List[TaskPriority]],
+        Query(description="Only tasks with one of these priorities"),
+    ] = None,
+    due_after: Annotated[
+        Optional[datetime], Query(description="Only tasks due at or after this time")
+    ] = None,
+    due_before: Annotated[
+        Optional[datetime], Query(description="Only tasks due before this time")
+    ] = None,
+    tags: Annotated[
+        Optional[List[str]], Query(description="Only tasks carrying all of these tags")
+    ] = None,
+    sort: Annotated[
+        TaskSort, Query(description="Sort field, prefixed with `-` for descending")
+    ] = TaskSort.NEWEST,
+) -> TaskListFilters:
+    """Dependency collecting the task list filter and sort query parameters
+
+    e.g. `?status=pending&status=in-progress&tags=urgent&sort=due_date`
+    """
+    return TaskListFilters(
+        status=task_status,
+        priority=priority,
+        due_after=due_after,
+        due_before=due_before,
+        tags=tags,
+        sort=sort,
+    )
@@ -0,0 +1,72 @@
+"""Database sessions of read-only routes
+
+Reads go to the replica configured by `REPLICA_DATABASE_URL`, except for
+users who wrote within `REPLICA_STICKY_SECONDS`, whose reads stay on the
+primary until the replica has caught up with their writes.
+"""
+
+from typing import Annotated, AsyncIterator, Iterator
+
+from fastapi import Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, sessionmaker
+
+from api.core.dependencies.security import (
+    UserPrincipal,
+    get_current_user_id,
+    load_principal,
+    load_principal_async,
+)
+from api.db import database
+from api.db.replica import recent_writers
+
+
+def get_read_sessionmaker(
+    user_id: Annotated[str, Depends(get_current_user_id)],
+) -> sessionmaker:
+    """Dependency to get the session factory reads of the user should use"""
+    if database.ReplicaSessionLocal is None or recent_writers.wrote_recently(user_id):
+        return database.SessionLocal
+    return database.ReplicaSessionLocal
+
+
+def get_read_db(
+    sessions: Annotated[sessionmaker, Depends(get_read_sessionmaker)],
+) -> Iterator[Session]:
+    """Yield a session on the replica, or on the primary after a recent write"""
+    if sessions is database.SessionLocal:
+        yield from database.get_db()
+        return
+
+    with sessions() as db:
+        yield db
+
+
+async def get_async_read_db(
+    user_id: Annotated[str, Depends(get_current_user_id)],
+) -> AsyncIterator[AsyncSession]:
+    """`get_read_db` for routes running on the async database stack"""
+    database.init_engines()
+    sessions = database.AsyncReplicaSessionLocal
+    if sessions is None or await recent_writers.awrote_recently(user_id):
+        sessions = database.AsyncSessionLocal
+
+    async with sessions() as db:
+        yield db
+
+
+def get_current_reader(
+    db: Annotated[Session, Depends(get_read_db)],
+    user_id: Annotated[str, Depends(get_current_user_id)],
+) -> UserPrincipal:
+    """`get_current_user` looked up through the session of a read-only route"""
+    return load_principal(db, user_id)
+
+
+async def get_current_reader_async(
+    db: Annotated[AsyncSession, Depends(get_async_read_db)],
+    user_id: Annotated[str, Depends(get_current_user_id)],
+) -> UserPrincipal:
+    """`get_current_user_async` looked up through the session of a read-only
+    route"""
+    return await load_principal_async(db, user_id)
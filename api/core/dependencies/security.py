@@ -1,10 +1,15 @@
+from dataclasses import dataclass
 from fastapi.security import OAuth2PasswordBearer
 from fastapi import Depends, HTTPException, status
+from sqlalchemy import event
 from sqlalchemy.orm import Session
-from typing import Annotated
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Annotated, Optional
 
 from api.v1.models.user import User
-from api.db.database import get_db
+from api.core.config import settings
+from api.db.database import get_db, get_async_db
+from api.utils.cache import TTLCache
 from api.utils.jwt_helpers import verify_jwt_token
 from api.core import response_messages
 
@@ -12,35 +17,129 @@ from api.core import response_messages
 oauth_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login")
 
 
+@dataclass(frozen=True)
+class UserPrincipal:
+    """Detached snapshot of an authenticated user
+
+    Safe to cache and share between requests, unlike a session-bound `User`.
+    """
+
+    id: str
+    email: str
+    username: Optional[str]
+
+    @classmethod
+    def from_user(cls, user: User) -> "UserPrincipal":
+        return cls(id=user.id, email=user.email, username=user.username)
+
+
+# Principals by user id, saves the users lookup on every protected request.
+# Entries are dropped when this process changes a user, the ttl bounds how
+# long other workers may serve a stale snapshot.
+principal_cache = TTLCache(
+    maxsize=settings.PRINCIPAL_CACHE_SIZE, ttl=settings.PRINCIPAL_CACHE_TTL
+)
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def invalidate_principal(mapper, connection, target: User) -> None:
+    """Drop the cached principal of a user that was changed or deleted"""
+    principal_cache.pop(target.id)
+
+
+def get_credentials_exception() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail=response_messages.INVALID_CREDENTIALS,
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+async def get_current_user_id(
+    access_token: Annotated[str, Depends(oauth_scheme)],
+) -> str:
+    """Dependency to get the id of the user an access token was issued to
+
+    Args:
+        access_token (Annotated[str, Depends): JWT access token
+
+    Returns:
+        str: ID of the token's user, who may not exist anymore
+    """
+
+    return verify_jwt_token(
+        token=access_token,
+        credentials_exception=get_credentials_exception(),
+        token_type="access",
+    )
+
+
+def load_principal(db: Session, user_id: str) -> UserPrincipal:
+    """Snapshot of the user, from the principal cache or from `db`"""
+    principal = principal_cache.get(user_id)
+    if principal is not None:
+        return principal
+
+    user = db.query(User).filter(User.id == user_id).first()
+
+    if not user:
+        raise get_credentials_exception()
+
+    principal = UserPrincipal.from_user(user)
+    principal_cache.set(user_id, principal)
+
+    return principal
+
+
+async def load_principal_async(db: AsyncSession, user_id: str) -> UserPrincipal:
+    """`load_principal` on an AsyncSession"""
+    principal = principal_cache.get(user_id)
+    if principal is not None:
+        return principal
+
+    user = await db.get(User, user_id)
+
+    if not user:
+        raise get_credentials_exception()
+
+    principal = UserPrincipal.from_user(user)
+    principal_cache.set(user_id, principal)
+
+    return principal
+
+
 def get_current_user(
     db: Annotated[Session, Depends(get_db)],
-    access_token: Annotated[str, Depends(oauth_scheme)],
-) -> User:
+    user_id: Annotated[str, Depends(get_current_user_id)],
+) -> UserPrincipal:
     """Dependency to get current logged in user
     Useful for protecting routes and restricting their access to only
     authenticated users
 
     Args:
         db (Annotated[Session, Depends): Database Session
-        access_token (Annotated[str, Depends): JWT access token
+        user_id (Annotated[str, Depends): ID from the JWT access token
 
     Returns:
-        User: Logged in User object
+        UserPrincipal: Snapshot of the logged in user
     """
 
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail=response_messages.INVALID_CREDENTIALS,
-        headers={"WWW-Authenticate": "Bearer"},
-    )
+    return load_principal(db, user_id)
 
-    user_id = verify_jwt_token(
-        token=access_token, credentials_exception=credentials_exception
-    )
 
-    user = db.query(User).filter(User.id == user_id).first()
+async def get_current_user_async(
+    db: Annotated[AsyncSession, Depends(get_async_db)],
+    user_id: Annotated[str, Depends(get_current_user_id)],
+) -> UserPrincipal:
+    """`get_current_user` for routes running on the async database stack
 
-    if not user:
-        raise credentials_exception
+    Args:
+        db (Annotated[AsyncSession, Depends): Async database Session
+        user_id (Annotated[str, Depends): ID from the JWT access token
+
+    Returns:
+        UserPrincipal: Snapshot of the logged in user
+    """
 
-    return user
+    return await load_principal_async(db, user_id)
@@ -0,0 +1,69 @@
+"""Request ids and access log records by a pure ASGI middleware"""
+
+import logging
+import re
+import time
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from uuid_extensions import uuid7
+
+from api.utils.logger import RequestContext, current_request
+
+REQUEST_ID_HEADER = b"x-request-id"
+
+# request ids taken from the client, anything else gets a fresh one
+VALID_REQUEST_ID = re.compile(r"[A-Za-z0-9._-]{1,64}")
+
+access_logger = logging.getLogger("api.access")
+
+
+def request_id_of(scope: Scope) -> str:
+    """The client's `X-Request-ID` when it is well formed, else a new id"""
+    for name, value in scope["headers"]:
+        if name == REQUEST_ID_HEADER:
+            request_id = value.decode("latin-1")
+            if VALID_REQUEST_ID.fullmatch(request_id):
+                return request_id
+            break
+    return uuid7().hex
+
+
+class AccessLogMiddleware:
+    """Pure ASGI middleware tagging every log record of a request with its id,
+    echoed in the `X-Request-ID` response header, and logging one `api.access`
+    record with the status and latency once the request is served"""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = request_id_of(scope)
+        reset_token = current_request.set(RequestContext(request_id, scope))
+        started_at = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                MutableHeaders(scope=message).append("X-Request-ID", request_id)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            client = scope.get("client")
+            access_logger.info(
+                f"{scope['method']} {scope['path']} {status_code}",
+                extra={
+                    "status": status_code,
+                    "latency_ms": round((time.perf_counter() - started_at) * 1000, 3),
+                    "client": client[0] if client else None,
+                },
+            )
+            current_request.reset(reset_token)
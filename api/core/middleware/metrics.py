@@ -0,0 +1,196 @@
+"""Request metrics collected by a pure ASGI middleware"""
+
+import time
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Tuple
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from api.core.config import settings
+
+# upper bounds of the histogram buckets, `+Inf` is implied
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+KNOWN_METHODS = {"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"}
+
+# label values used once a bounded dimension is full
+UNMATCHED_ROUTE = "<unmatched>"
+OVERFLOW_ROUTE = "<overflow>"
+OVERFLOW_CLIENT = "<other>"
+
+
+class Histogram:
+    """Fixed-bucket histogram, counts are per bucket and not cumulative"""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...]) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+def render_histogram(
+    name: str, help: str, histograms: Iterable[Tuple[str, Histogram]]
+) -> List[str]:
+    """Prometheus text lines of labelled histograms sharing one metric name"""
+    lines = [f"# HELP {name} {help}", f"# TYPE {name} histogram"]
+    for labels, histogram in histograms:
+        cumulative = 0
+        for bound, count in zip(histogram.buckets, histogram.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+        lines.append(f"{name}_sum{{{labels}}} {histogram.sum}")
+        lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+    return lines
+
+
+class SeriesMetrics:
+    """Metrics of one (method, route, status) series"""
+
+    __slots__ = ("latency", "size")
+
+    def __init__(self) -> None:
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.size = Histogram(SIZE_BUCKETS)
+
+
+def escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class MetricsRegistry:
+    """In-memory store of request metrics keyed by route template
+
+    The number of series and of client addresses kept per route are capped,
+    extra values are folded into overflow labels so memory stays bounded.
+    Only touched from the event loop, so no locking is needed.
+    """
+
+    def __init__(self, max_series: int, max_clients_per_route: int) -> None:
+        self.max_series = max_series
+        self.max_clients_per_route = max_clients_per_route
+        self.series: Dict[Tuple[str, str, str], SeriesMetrics] = {}
+        self.client_counts: Dict[str, Dict[str, int]] = {}
+
+    def record(
+        self,
+        method: str,
+        route: str,
+        status_code: int,
+        duration: float,
+        size: int,
+        client: str,
+    ) -> None:
+        if method not in KNOWN_METHODS:
+            method = "OTHER"
+
+        key = (method, route, str(status_code))
+        series = self.series.get(key)
+        if series is None:
+            if len(self.series) >= self.max_series:
+                route = OVERFLOW_ROUTE
+                key = (method, route, str(status_code))
+                series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = SeriesMetrics()
+
+        series.latency.observe(duration)
+        series.size.observe(size)
+
+        clients = self.client_counts.setdefault(route, {})
+        if client not in clients and len(clients) >= self.max_clients_per_route:
+            client = OVERFLOW_CLIENT
+        clients[client] = clients.get(client, 0) + 1
+
+    def request_counts(self) -> Dict[str, Dict[str, int]]:
+        """Request counts by route template and client address"""
+        return {route: dict(clients) for route, clients in self.client_counts.items()}
+
+    def render_prometheus(self) -> str:
+        """Render all series in the Prometheus text exposition format"""
+        labelled = [
+            (
+                f'method="{method}",route="{escape_label(route)}",status="{status}"',
+                series,
+            )
+            for (method, route, status), series in self.series.items()
+        ]
+
+        lines = [
+            "# HELP http_requests_total Total HTTP requests",
+            "# TYPE http_requests_total counter",
+        ]
+        lines += [
+            f"http_requests_total{{{labels}}} {series.latency.count}"
+            for labels, series in labelled
+        ]
+        lines += render_histogram(
+            "http_request_duration_seconds",
+            "HTTP request latency in seconds",
+            ((labels, series.latency) for labels, series in labelled),
+        )
+        lines += render_histogram(
+            "http_response_size_bytes",
+            "HTTP response body size in bytes",
+            ((labels, series.size) for labels, series in labelled),
+        )
+        return "\n".join(lines) + "\n"
+
+
+metrics_registry = MetricsRegistry(
+    max_series=settings.METRICS_MAX_SERIES,
+    max_clients_per_route=settings.METRICS_MAX_CLIENTS_PER_ROUTE,
+)
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording count, latency and response size
+
+    Requests are labelled with the matched route template, e.g.
+    `/api/v1/tasks/{task_id}`, rather than the raw path.
+    """
+
+    def __init__(self, app: ASGIApp, registry: MetricsRegistry = metrics_registry):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started_at = time.perf_counter()
+        status_code = 500
+        size = 0
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code, size
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # the router stores the matched route in the shared scope
+            route = scope.get("route")
+            client = scope.get("client")
+            self.registry.record(
+                method=scope["method"],
+                route=getattr(route, "path_format", None) or UNMATCHED_ROUTE,
+                status_code=status_code,
+                duration=time.perf_counter() - started_at,
+                size=size,
+                client=client[0] if client else "unknown",
+            )
@@ -0,0 +1,242 @@
+"""Per-request SQL timing and profiling by a pure ASGI middleware
+
+Statements are timed by cursor execution events of every engine, and
+credited to the request through a context variable, which the threadpool
+running sync routes and SQLAlchemy's async greenlets both inherit. The
+response's `Server-Timing` header reports the query count and time, the
+slowest query, and statements repeated often enough to be an N+1 pattern.
+Only queries run before the response starts are counted, later ones of a
+streamed response are not.
+
+Profiled requests are stack sampled: a thread snapshots the stacks of all
+threads every `PROFILING_INTERVAL_MS`, so work on the threadpool is caught
+as well as on the event loop. Other requests served meanwhile show up too,
+profile on a quiet worker. The samples are written in the folded format of
+flame graph tools, e.g. `flamegraph.pl` or speedscope.
+"""
+
+import hmac
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from uuid_extensions import uuid7
+
+from api.core.config import settings
+from api.utils.logger import logger
+
+PROFILE_HEADER = b"x-profile"
+
+# files whose frames mean a thread is idle, waiting for work or for I/O
+IDLE_FILES = ("threading.py", "queue.py", "selectors.py")
+
+# statements and their repeats reported in `Server-Timing`
+REPORTED_REPEATS = 3
+STATEMENT_PREVIEW = 80
+
+WHITESPACE = re.compile(r"\s+")
+
+
+class RequestProfile:
+    """Statements run by one request"""
+
+    def __init__(self) -> None:
+        self.queries = 0
+        self.query_time = 0.0
+        self.slowest: Tuple[float, str] = (0.0, "")
+        self.statements: Counter = Counter()
+
+    def record(self, statement: str, seconds: float) -> None:
+        self.queries += 1
+        self.query_time += seconds
+        self.statements[statement] += 1
+        if seconds > self.slowest[0]:
+            self.slowest = (seconds, statement)
+
+    def repeats(self, threshold: int) -> List[Tuple[str, int]]:
+        """Statements run at least `threshold` times, most repeated first"""
+        return [
+            (statement, count)
+            for statement, count in self.statements.most_common()
+            if count >= threshold
+        ]
+
+
+current_profile: ContextVar[Optional[RequestProfile]] = ContextVar(
+    "current_profile", default=None
+)
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, many):
+    if current_profile.get() is not None:
+        conn.info.setdefault("profiling_started_at", []).append(time.perf_counter())
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, many):
+    profile = current_profile.get()
+    if profile is not None and conn.info.get("profiling_started_at"):
+        started_at = conn.info["profiling_started_at"].pop()
+        profile.record(statement, time.perf_counter() - started_at)
+
+
+def instrument_engines() -> None:
+    """Time the statements of every engine, the async engines included"""
+    if not event.contains(Engine, "before_cursor_execute", before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", after_cursor_execute)
+
+
+class StackSampler:
+    """Background thread counting the stacks of all busy threads"""
+
+    def __init__(self, interval: float) -> None:
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="stack-sampler", daemon=True
+        )
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            self.samples += 1
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id or frame.f_code.co_filename.endswith(IDLE_FILES):
+                    continue
+                self.stacks[folded_stack(frame)] += 1
+
+    def folded(self) -> str:
+        """Samples as `frame;frame;frame count` lines, root frame first"""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.items())
+
+
+def folded_stack(frame) -> str:
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(
+            f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+        )
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+def write_profile(profile_id: str, sampler: StackSampler) -> None:
+    os.makedirs(settings.PROFILES_DIR, exist_ok=True)
+    path = os.path.join(settings.PROFILES_DIR, f"{profile_id}.folded")
+    with open(path, "w") as file:
+        file.write(sampler.folded())
+
+
+def preview(statement: str) -> str:
+    """`statement` on one line and shortened, safe in a quoted header value"""
+    statement = WHITESPACE.sub(" ", statement).strip().replace('"', "'")
+    if len(statement) > STATEMENT_PREVIEW:
+        statement = statement[: STATEMENT_PREVIEW - 3] + "..."
+    return statement
+
+
+def server_timing(
+    profile: RequestProfile, elapsed: float, profile_id: Optional[str]
+) -> str:
+    """`Server-Timing` header value of a request's profile"""
+    queries = f"{profile.queries} {'query' if profile.queries == 1 else 'queries'}"
+    metrics = [
+        f"app;dur={elapsed * 1000:.3f}",
+        f'db;dur={profile.query_time * 1000:.3f};desc="{queries}"',
+    ]
+    seconds, statement = profile.slowest
+    if profile.queries:
+        metrics.append(
+            f'db-slowest;dur={seconds * 1000:.3f};desc="{preview(statement)}"'
+        )
+    for statement, count in profile.repeats(settings.PROFILING_REPEAT_THRESHOLD)[
+        :REPORTED_REPEATS
+    ]:
+        metrics.append(f'n-plus-one;desc="{count}x {preview(statement)}"')
+    if profile_id is not None:
+        metrics.append(f'profile;desc="{profile_id}"')
+    return ", ".join(metrics)
+
+
+def wants_profile(scope: Scope) -> bool:
+    """Whether the request asked for a profile with the right token, or was
+    drawn by `PROFILING_SAMPLE_RATE`"""
+    token = settings.PROFILING_TOKEN
+    if token:
+        for name, value in scope["headers"]:
+            if name == PROFILE_HEADER:
+                return hmac.compare_digest(value, token.encode())
+    return random.random() < settings.PROFILING_SAMPLE_RATE
+
+
+def log_repeats(scope: Scope, profile: RequestProfile) -> None:
+    for statement, count in profile.repeats(settings.PROFILING_REPEAT_THRESHOLD):
+        logger.warning(
+            f"Likely N+1 query in {scope['method']} {scope['path']}, "
+            f"run {count} times: {preview(statement)}"
+        )
+
+
+class ProfilingMiddleware:
+    """Pure ASGI middleware adding a `Server-Timing` header with the
+    request's SQL timings, and profiling requests that ask for it"""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+        instrument_engines()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile()
+        reset_token = current_profile.set(profile)
+        sampler: Optional[StackSampler] = None
+        profile_id: Optional[str] = None
+        if wants_profile(scope):
+            profile_id = uuid7().hex
+            sampler = StackSampler(settings.PROFILING_INTERVAL_MS / 1000)
+            sampler.start()
+        started_at = time.perf_counter()
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers.append(
+                    "Server-Timing",
+                    server_timing(
+                        profile, time.perf_counter() - started_at, profile_id
+                    ),
+                )
+                log_repeats(scope, profile)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_profile.reset(reset_token)
+            if sampler is not None:
+                sampler.stop()
+                await run_in_threadpool(write_profile, profile_id, sampler)
@@ -0,0 +1,270 @@
+"""Per-client rate limiting by a pure ASGI middleware
+
+Buckets follow the generic cell rate algorithm, a token bucket stored as one
+number per client and policy: the time at which the bucket would be full
+again. A request takes a token by pushing that time one emission interval
+further, and is refused when it would land more than a full bucket ahead.
+
+Clients are keyed on the user of a valid access token, checked against the
+verified token cache the auth dependencies fill anyway, or else on the client
+address. Run uvicorn with `--proxy-headers` behind a proxy, so the address is
+the client's and not the proxy's.
+"""
+
+import math
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, List, NamedTuple, Optional
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from api.core.config import settings
+from api.utils.jwt_helpers import verified_claims
+from api.utils.logger import logger
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600}
+
+# GCRA on the redis server's clock, so workers with skewed clocks agree.
+# Returns whether the request is allowed, and the seconds to wait otherwise.
+GCRA_SCRIPT = """
+local interval = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local full_at = math.max(tonumber(redis.call('GET', KEYS[1])) or now, now)
+local excess = full_at + interval - now - capacity
+if excess > 0 then
+    return {0, tostring(excess)}
+end
+local ttl = math.ceil((full_at + interval - now) * 1000)
+redis.call('SET', KEYS[1], tostring(full_at + interval), 'PX', ttl)
+return {1, '0'}
+"""
+
+
+class RateLimitPolicy(NamedTuple):
+    name: str
+    # seconds per request, and seconds of requests a full bucket holds
+    interval: float
+    capacity: float
+
+    @classmethod
+    def parse(cls, name: str, value: str) -> "RateLimitPolicy":
+        """Policy from `<requests>/<second|minute|hour>`, e.g. `10/minute`"""
+        requests, _, period = value.partition("/")
+        if not requests.strip().isdigit() or period.strip() not in PERIODS:
+            raise ValueError(f"Invalid rate limit {value!r} for {name!r}")
+        requests = int(requests)
+        interval = PERIODS[period.strip()] / requests
+        return cls(name, interval, interval * requests)
+
+
+class RateLimitBackend(ABC):
+    """Bucket store under the rate limiter"""
+
+    @abstractmethod
+    async def acquire(self, key: str, policy: RateLimitPolicy) -> float:
+        """Take a token from the bucket `key`
+
+        Returns 0 when the request is allowed, otherwise the seconds until
+        it would be.
+        """
+
+
+class MemoryRateLimitBackend(RateLimitBackend):
+    """Buckets of this worker process
+
+    Only touched from the event loop, so no locking is needed. The least
+    recently used buckets are dropped past `max_keys`, a client whose
+    bucket is dropped starts over with a full one.
+    """
+
+    def __init__(self, max_keys: int) -> None:
+        self.max_keys = max_keys
+        # time each bucket is full again, in least recently used order
+        self.full_at: Dict[str, float] = {}
+
+    async def acquire(self, key: str, policy: RateLimitPolicy) -> float:
+        now = time.monotonic()
+        full_at = max(self.full_at.pop(key, now), now)
+
+        excess = full_at + policy.interval - now - policy.capacity
+        if excess > 0:
+            self.full_at[key] = full_at
+            return excess
+
+        self.full_at[key] = full_at + policy.interval
+        if len(self.full_at) > self.max_keys:
+            del self.full_at[next(iter(self.full_at))]
+        return 0.0
+
+
+class RedisRateLimitBackend(RateLimitBackend):
+    """Buckets shared by all workers, updated by a server-side script"""
+
+    def __init__(self, client) -> None:
+        self.script = client.register_script(GCRA_SCRIPT)
+
+    @classmethod
+    def from_url(cls, url: str) -> "RedisRateLimitBackend":
+        import redis.asyncio  # only needed when this backend is configured
+
+        return cls(redis.asyncio.Redis.from_url(url))
+
+    async def acquire(self, key: str, policy: RateLimitPolicy) -> float:
+        allowed, excess = await self.script(
+            keys=[f"rate:{key}"], args=[policy.interval, policy.capacity]
+        )
+        return 0.0 if allowed else float(excess)
+
+
+class RateLimiter:
+    """Matches requests to policies and their clients to buckets"""
+
+    def __init__(
+        self,
+        backend: Optional[RateLimitBackend],
+        default: RateLimitPolicy,
+        policies: Dict[str, RateLimitPolicy],
+    ) -> None:
+        self.backend = backend
+        self.default = default
+        self.policies = policies
+        self.allowed: Dict[str, int] = {}
+        self.limited: Dict[str, int] = {}
+        self.errors = 0
+
+    def policy(self, method: str, path: str) -> RateLimitPolicy:
+        """Policy of the longest matching path prefix, `METHOD /path` keys
+        before bare `/path` keys"""
+        while path:
+            policy = self.policies.get(f"{method} {path}") or self.policies.get(path)
+            if policy is not None:
+                return policy
+            path = path.rpartition("/")[0]
+        return self.default
+
+    async def check(self, scope: Scope) -> float:
+        """Take a token for the request, see `RateLimitBackend.acquire`
+
+        A failing backend lets requests through rather than failing them.
+        """
+        policy = self.policy(scope["method"], scope["path"])
+        try:
+            retry_after = await self.backend.acquire(
+                f"{policy.name}:{client_key(scope)}", policy
+            )
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"Rate limit backend failed, request let through; {e}")
+            return 0.0
+
+        counts = self.limited if retry_after else self.allowed
+        counts[policy.name] = counts.get(policy.name, 0) + 1
+        return retry_after
+
+    def stats(self) -> dict:
+        if self.backend is None:
+            return {"backend": "none"}
+        return {
+            "backend": settings.RATE_LIMIT_BACKEND,
+            "allowed": dict(self.allowed),
+            "limited": dict(self.limited),
+            "errors": self.errors,
+        }
+
+    def render_prometheus(self) -> str:
+        """Limiter counters in the Prometheus text exposition format"""
+        if self.backend is None:
+            return ""
+
+        lines: List[str] = []
+        for name, counts, help_text in (
+            ("allowed", self.allowed, "Requests let through by the rate limiter"),
+            ("limited", self.limited, "Requests refused by the rate limiter"),
+        ):
+            metric = f"rate_limit_{name}_total"
+            lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} counter"]
+            lines += [
+                f'{metric}{{policy="{policy}"}} {count}'
+                for policy, count in counts.items()
+            ]
+        lines += [
+            "# HELP rate_limit_errors_total Rate limit backend failures",
+            "# TYPE rate_limit_errors_total counter",
+            f"rate_limit_errors_total {self.errors}",
+        ]
+        return "\n".join(lines) + "\n"
+
+
+def client_key(scope: Scope) -> str:
+    """`user:<id>` for requests with a valid access token, `ip:<address>`
+    otherwise"""
+    for name, value in scope["headers"]:
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() == "bearer" and token:
+                claims = verified_claims(token.strip(), "access")
+                if claims is not None:
+                    return f"user:{claims['user_id']}"
+            break
+
+    client = scope.get("client")
+    return f"ip:{client[0] if client else 'unknown'}"
+
+
+def build_rate_limiter() -> RateLimiter:
+    """Create the rate limiter selected by the `RATE_LIMIT_*` settings"""
+    name = settings.RATE_LIMIT_BACKEND.lower()
+    backend: Optional[RateLimitBackend] = None
+    if not settings.RATE_LIMIT_ENABLED:
+        pass
+    elif name == "memory":
+        backend = MemoryRateLimitBackend(settings.RATE_LIMIT_MAX_KEYS)
+    elif name == "redis":
+        backend = RedisRateLimitBackend.from_url(settings.RATE_LIMIT_URL)
+    else:
+        raise ValueError(f"Unknown RATE_LIMIT_BACKEND {name!r}")
+
+    return RateLimiter(
+        backend,
+        RateLimitPolicy.parse("default", settings.RATE_LIMIT_DEFAULT),
+        {
+            key: RateLimitPolicy.parse(key, value)
+            for key, value in settings.RATE_LIMIT_POLICIES.items()
+        },
+    )
+
+
+rate_limiter = build_rate_limiter()
+
+
+class RateLimitMiddleware:
+    """Pure ASGI middleware answering `429` with a `Retry-After` header once
+    a client's bucket is empty"""
+
+    def __init__(self, app: ASGIApp, limiter: RateLimiter = rate_limiter) -> None:
+        self.app = app
+        self.limiter = limiter
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or self.limiter.backend is None:
+            await self.app(scope, receive, send)
+            return
+
+        retry_after = await self.limiter.check(scope)
+        if not retry_after:
+            await self.app(scope, receive, send)
+            return
+
+        response = JSONResponse(
+            status_code=429,
+            content={
+                "status": False,
+                "status_code": 429,
+                "message": "Too many requests, retry later.",
+            },
+            headers={"Retry-After": str(math.ceil(retry_after))},
+        )
+        await response(scope, receive, send)
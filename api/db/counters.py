@@ -0,0 +1,197 @@
+"""Per-user task counters
+
+`task_counters` holds the number of tasks visible to each user by status,
+counted the way `visibility_arms` splits them: tasks the user created, plus
+tasks assigned to the user by someone else. Triggers on `tasks` keep it up to
+date for every write path, including bulk statements, `COPY` imports and
+foreign key cascades. On PostgreSQL they are statement level triggers with
+transition tables, so a bulk statement applies one aggregated delta per
+user and status. SQLite, used for local runs, gets row level triggers.
+
+Every change also bumps the `revision` of the rows it touches, which makes the
+sum of a user's revisions a validator of everything visible to them.
+
+Counters can still drift, e.g. after writes with triggers disabled, and
+`reconcile_batch` rewrites the ones that did from a count of the tasks.
+"""
+
+from typing import List, Optional, Sequence
+
+from sqlalchemy import (
+    DDL,
+    Table,
+    column,
+    event,
+    func,
+    select,
+    table,
+    union_all,
+)
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Connection
+from sqlalchemy.sql import Select
+
+COUNTERS_TABLE = "task_counters"
+SYNC_FUNCTION = "task_counters_sync"
+
+tasks = table("tasks", column("created_by"), column("assignee_id"), column("status"))
+counters = table(
+    COUNTERS_TABLE,
+    column("user_id"),
+    column("status"),
+    column("total"),
+    column("revision"),
+)
+users = table("users", column("id"))
+
+
+def _postgresql_upsert(changes: str) -> str:
+    """Apply `changes`, rows of `(created_by, assignee_id, status, delta)`,
+    in user and status order so concurrent writers lock counters alike"""
+    return f"""
+        WITH changes AS ({changes}),
+        deltas AS (
+            SELECT created_by AS user_id, status, delta FROM changes
+            UNION ALL
+            SELECT assignee_id, status, delta FROM changes
+            WHERE assignee_id IS NOT NULL AND assignee_id <> created_by
+        )
+        INSERT INTO {COUNTERS_TABLE} AS counter (user_id, status, total, revision)
+        SELECT user_id, status, sum(delta), 1 FROM deltas
+        GROUP BY user_id, status
+        ORDER BY user_id, status
+        ON CONFLICT (user_id, status) DO UPDATE
+        SET total = counter.total + excluded.total,
+            revision = counter.revision + 1;"""
+
+
+_INSERTED = "SELECT created_by, assignee_id, status, 1 AS delta FROM new_rows"
+_DELETED = "SELECT created_by, assignee_id, status, -1 AS delta FROM old_rows"
+
+POSTGRESQL_DDL = [
+    f"""CREATE OR REPLACE FUNCTION {SYNC_FUNCTION}() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            {_postgresql_upsert(_INSERTED)}
+        ELSIF TG_OP = 'UPDATE' THEN
+            {_postgresql_upsert(f"{_DELETED} UNION ALL {_INSERTED}")}
+        ELSE
+            {_postgresql_upsert(_DELETED)}
+        END IF;
+        RETURN NULL;
+    END
+    $$""",
+    f"CREATE TRIGGER {COUNTERS_TABLE}_insert AFTER INSERT ON tasks "
+    "REFERENCING NEW TABLE AS new_rows "
+    f"FOR EACH STATEMENT EXECUTE FUNCTION {SYNC_FUNCTION}()",
+    f"CREATE TRIGGER {COUNTERS_TABLE}_update AFTER UPDATE ON tasks "
+    "REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows "
+    f"FOR EACH STATEMENT EXECUTE FUNCTION {SYNC_FUNCTION}()",
+    f"CREATE TRIGGER {COUNTERS_TABLE}_delete AFTER DELETE ON tasks "
+    "REFERENCING OLD TABLE AS old_rows "
+    f"FOR EACH STATEMENT EXECUTE FUNCTION {SYNC_FUNCTION}()",
+]
+
+
+def _sqlite_upsert(row: str, delta: int) -> str:
+    # `WHERE true` keeps SQLite from parsing ON CONFLICT as a join constraint
+    return (
+        f"INSERT INTO {COUNTERS_TABLE} (user_id, status, total, revision) "
+        f"SELECT user_id, {row}.status, {delta}, 1 FROM ("
+        f"SELECT {row}.created_by AS user_id UNION ALL "
+        f"SELECT {row}.assignee_id WHERE {row}.assignee_id IS NOT NULL "
+        f"AND {row}.assignee_id <> {row}.created_by) WHERE true "
+        "ON CONFLICT (user_id, status) DO UPDATE "
+        "SET total = total + excluded.total, revision = revision + 1;"
+    )
+
+
+SQLITE_DDL = [
+    f"CREATE TRIGGER IF NOT EXISTS {COUNTERS_TABLE}_ai AFTER INSERT ON tasks "
+    f"BEGIN {_sqlite_upsert('new', 1)} END",
+    f"CREATE TRIGGER IF NOT EXISTS {COUNTERS_TABLE}_ad AFTER DELETE ON tasks "
+    f"BEGIN {_sqlite_upsert('old', -1)} END",
+    f"CREATE TRIGGER IF NOT EXISTS {COUNTERS_TABLE}_au AFTER UPDATE ON tasks "
+    f"BEGIN {_sqlite_upsert('old', -1)} {_sqlite_upsert('new', 1)} END",
+]
+
+
+def register_counter_ddl(table: Table) -> None:
+    """Create the counter triggers whenever `table`, the tasks table, is
+    created"""
+    for statement in POSTGRESQL_DDL:
+        event.listen(
+            table, "after_create", DDL(statement).execute_if(dialect="postgresql")
+        )
+    for statement in SQLITE_DDL:
+        event.listen(table, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+
+
+def visible_counts_statement(user_ids: Optional[Sequence[str]] = None) -> Select:
+    """Select `(user_id, status, total)` counted from the tasks themselves,
+    for `user_ids` or for every user"""
+    created = select(tasks.c.created_by.label("user_id"), tasks.c.status)
+    assigned = select(tasks.c.assignee_id, tasks.c.status).where(
+        tasks.c.assignee_id.is_not(None), tasks.c.assignee_id != tasks.c.created_by
+    )
+    if user_ids is not None:
+        created = created.where(tasks.c.created_by.in_(user_ids))
+        assigned = assigned.where(tasks.c.assignee_id.in_(user_ids))
+
+    visible = union_all(created, assigned).subquery("visible")
+    return select(
+        visible.c.user_id, visible.c.status, func.count().label("total")
+    ).group_by(visible.c.user_id, visible.c.status)
+
+
+def user_batch_statement(after: Optional[str], batch_size: int) -> Select:
+    """Select the ids of the next `batch_size` users after `after`"""
+    statement = select(users.c.id).order_by(users.c.id).limit(batch_size)
+    if after is not None:
+        statement = statement.where(users.c.id > after)
+    return statement
+
+
+def reconcile_batch(connection: Connection, user_ids: List[str]) -> int:
+    """Rewrite the counters of `user_ids` that drifted from the tasks, and
+    return how many were fixed
+
+    The existing counters are locked first, so writes to them wait until the
+    batch commits instead of being overwritten.
+    """
+    stored = {
+        (row.user_id, row.status): row.total
+        for row in connection.execute(
+            select(counters.c.user_id, counters.c.status, counters.c.total)
+            .where(counters.c.user_id.in_(user_ids))
+            .with_for_update()
+        )
+    }
+    actual = {
+        (row.user_id, row.status): row.total
+        for row in connection.execute(visible_counts_statement(user_ids))
+    }
+
+    drifted = []
+    for user_id, status in sorted(stored.keys() | actual.keys()):
+        total = actual.get((user_id, status), 0)
+        if stored.get((user_id, status)) != total:
+            drifted.append(
+                {"user_id": user_id, "status": status, "total": total, "revision": 1}
+            )
+
+    if drifted:
+        dialect = postgresql if connection.dialect.name == "postgresql" else sqlite
+        statement = dialect.insert(counters)
+        connection.execute(
+            statement.on_conflict_do_update(
+                index_elements=["user_id", "status"],
+                set_={
+                    "total": statement.excluded.total,
+                    "revision": counters.c.revision + 1,
+                },
+            ),
+            drifted,
+        )
+    return len(drifted)
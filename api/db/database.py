@@ -1,30 +1,160 @@
 """The database module"""
 
+import logging
+import threading
 from sqlalchemy.orm import sessionmaker, scoped_session, declarative_base
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from api.core.config import settings
+from api.db.pool import engine_options, pool_registry
+
+logger = logging.getLogger(__name__)
 
 DATABASE_URL = settings.database_url
 
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-db_session = scoped_session(SessionLocal)
+# asyncio drivers to swap in for each backend when ASYNC_DATABASE is on
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def get_async_database_url(url: str) -> str:
+    """Rewrite a database url to use the asyncio driver of its backend"""
+    url = make_url(url)
+    drivername = ASYNC_DRIVERS.get(url.get_backend_name(), url.drivername)
+    return url.set(drivername=drivername).render_as_string(hide_password=False)
+
+
+# Engines and session factories are created by `init_engines`, on startup
+# of the app rather than at import, so importing the app stays cheap and
+# drivers are only loaded by processes that talk to the database
+engine = None
+SessionLocal = None
+db_session = None
+
+# read-only routes use the replica when one is configured, see
+# `api.core.dependencies.replica`
+replica_engine = None
+ReplicaSessionLocal = None
+
+async_engine = None
+AsyncSessionLocal = None
+async_replica_engine = None
+AsyncReplicaSessionLocal = None
+_engines_lock = threading.Lock()
+_engines_created = False
+
+
+def init_engines():
+    """Create the engines and session factories, once per process"""
+    global _engines_created
+    if _engines_created:
+        return
+    with _engines_lock:
+        if not _engines_created:
+            _create_engines()
+            _engines_created = True
+
+
+def _create_engines():
+    global engine, SessionLocal, db_session, replica_engine, ReplicaSessionLocal
+    global async_engine, AsyncSessionLocal
+    global async_replica_engine, AsyncReplicaSessionLocal
+
+    primary_pool = pool_registry.register("primary")
+    engine = create_engine(DATABASE_URL, **engine_options(DATABASE_URL, primary_pool))
+    primary_pool.instrument(engine)
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db_session = scoped_session(SessionLocal)
+
+    if settings.REPLICA_DATABASE_URL:
+        replica_pool = pool_registry.register("replica")
+        replica_engine = create_engine(
+            settings.REPLICA_DATABASE_URL,
+            **engine_options(settings.REPLICA_DATABASE_URL, replica_pool),
+        )
+        replica_pool.instrument(replica_engine)
+        ReplicaSessionLocal = sessionmaker(
+            autocommit=False, autoflush=False, bind=replica_engine
+        )
+
+    if not settings.ASYNC_DATABASE:
+        return
+
+    async_url = get_async_database_url(DATABASE_URL)
+    async_pool = pool_registry.register("async")
+    async_engine = create_async_engine(
+        async_url, **engine_options(async_url, async_pool)
+    )
+    async_pool.instrument(async_engine.sync_engine)
+    # keep attributes loaded after commit, lazy loads are not possible on
+    # an AsyncSession once the response is being built
+    AsyncSessionLocal = async_sessionmaker(
+        bind=async_engine, autoflush=False, expire_on_commit=False
+    )
+
+    if settings.REPLICA_DATABASE_URL:
+        async_replica_url = get_async_database_url(settings.REPLICA_DATABASE_URL)
+        async_replica_pool = pool_registry.register("async_replica")
+        async_replica_engine = create_async_engine(
+            async_replica_url, **engine_options(async_replica_url, async_replica_pool)
+        )
+        async_replica_pool.instrument(async_replica_engine.sync_engine)
+        AsyncReplicaSessionLocal = async_sessionmaker(
+            bind=async_replica_engine, autoflush=False, expire_on_commit=False
+        )
+
+
+async def dispose_engines():
+    """Close the pooled connections of every engine"""
+    for sync_engine in (engine, replica_engine):
+        if sync_engine is not None:
+            sync_engine.dispose()
+    for an_async_engine in (async_engine, async_replica_engine):
+        if an_async_engine is not None:
+            await an_async_engine.dispose()
+
 
 Base = declarative_base()
 
 
 def init_db():
     """Initialize the database by creating all tables defined by Base metadata."""
+    init_engines()
     return Base.metadata.create_all(bind=engine)
 
 
+async def init_async_db():
+    """Create all tables defined by Base metadata through the async engine."""
+    init_engines()
+    async with async_engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+
+
 def get_db():
     """Yield a new database session and ensure it's closed after use."""
-    db = db_session()
+    init_engines()
+    # not the thread-local `db_session`: threadpool threads serve many
+    # requests, and one request may run on several of them
+    db = SessionLocal()
     try:
         yield db
-    except Exception as e:
-        print(f"Database Error: {e}")
+    except Exception:
+        # HTTP errors of the route end up here too, the app's exception
+        # handlers log the unexpected ones
+        logger.debug("Database session closed by an exception", exc_info=True)
         raise
     finally:
         db.close()
+
+
+async def get_async_db():
+    """Yield a new async database session and ensure it's closed after use."""
+    init_engines()
+    async with AsyncSessionLocal() as db:
+        try:
+            yield db
+        except Exception:
+            logger.debug("Database session closed by an exception", exc_info=True)
+            raise
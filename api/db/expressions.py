@@ -0,0 +1,75 @@
+"""Portable SQL expressions with dialect specific compilation"""
+
+from typing import List
+
+from sqlalchemy import Boolean, DateTime, String, and_, cast, exists, literal, select
+from sqlalchemy import func
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql import coercions, roles
+from sqlalchemy.sql.expression import ColumnElement
+from sqlalchemy.sql.functions import FunctionElement
+from sqlalchemy.sql.visitors import InternalTraversal
+
+
+class array_contains(ColumnElement):
+    """True when an array column holds every one of `values`
+
+    Renders `column @> ARRAY[...]` on PostgreSQL, which a GIN index on the
+    column can answer, and one `json_each` lookup per value on SQLite where
+    arrays are stored as JSON.
+    """
+
+    type = Boolean()
+    inherit_cache = True
+    # values are bound parameters, statements with as many values share one
+    # compiled form
+    _traverse_internals = [
+        ("column", InternalTraversal.dp_clauseelement),
+        ("values", InternalTraversal.dp_clauseelement_list),
+    ]
+
+    def __init__(self, column, values: List[str]) -> None:
+        self.column = coercions.expect(roles.ExpressionElementRole, column)
+        self.values = [literal(value, String) for value in values]
+
+
+@compiles(array_contains)
+def compile_array_contains(element: array_contains, compiler, **kw) -> str:
+    # cast so the operands match a VARCHAR[] column, there is no
+    # `character varying[] @> text[]` operator
+    values = cast(postgresql.array(element.values), postgresql.ARRAY(String))
+    return compiler.process(element.column.op("@>")(values), **kw)
+
+
+@compiles(array_contains, "sqlite")
+def compile_array_contains_sqlite(element: array_contains, compiler, **kw) -> str:
+    clauses = []
+    for value in element.values:
+        items = func.json_each(element.column).table_valued("value")
+        clauses.append(
+            exists(select(literal(1)).select_from(items).where(items.c.value == value))
+        )
+    return compiler.process(and_(*clauses), **kw)
+
+
+class utc_now(FunctionElement):
+    """Current time, with sub-second precision on every dialect
+
+    SQLite's `CURRENT_TIMESTAMP` has whole seconds only, so there it renders
+    the time in milliseconds, padded to the microseconds `Timestamp` stores
+    bound values with so both compare correctly as text.
+    """
+
+    type = DateTime(timezone=True)
+    inherit_cache = True
+
+
+@compiles(utc_now)
+def compile_utc_now(element: utc_now, compiler, **kw) -> str:
+    return compiler.process(func.now(), **kw)
+
+
+@compiles(utc_now, "sqlite")
+def compile_utc_now_sqlite(element: utc_now, compiler, **kw) -> str:
+    return "(strftime('%Y-%m-%d %H:%M:%f', 'now') || '000')"
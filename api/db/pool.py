@@ -0,0 +1,208 @@
+"""Connection pool configuration and instrumentation
+
+Every engine gets its pool class, sizes and timeouts from `Settings`, and a
+`PoolMetrics` fed by the pool's events. Checkout latency is timed by a
+subclass of the dialect's default pool class, which `Pool.recreate()` keeps
+across `engine.dispose()`.
+"""
+
+import threading
+import time
+from typing import Dict, List, Optional, Type
+
+from sqlalchemy import event, make_url
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import Pool, QueuePool
+
+from api.core.config import settings
+from api.core.middleware.metrics import Histogram, render_histogram
+
+# upper bounds of the checkout latency buckets in seconds, `+Inf` is implied
+CHECKOUT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+
+class PoolMetrics:
+    """Checkout latency and connection counters of one engine's pool
+
+    Pool events fire on threadpool threads, updates are locked.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.checkout_latency = Histogram(CHECKOUT_BUCKETS)
+        self.checked_out = 0
+        self.peak_checked_out = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.timeouts = 0
+        self.pool: Optional[Pool] = None
+        self._lock = threading.Lock()
+
+    def observe_checkout(self, seconds: float) -> None:
+        with self._lock:
+            self.checkout_latency.observe(seconds)
+
+    def observe_timeout(self) -> None:
+        with self._lock:
+            self.timeouts += 1
+
+    def instrument(self, engine: Engine) -> None:
+        """Count connections through the events of `engine`'s pool"""
+        self.pool = engine.pool
+
+        @event.listens_for(engine, "connect")
+        def on_connect(dbapi_connection, connection_record) -> None:
+            with self._lock:
+                self.connects += 1
+
+        @event.listens_for(engine, "checkout")
+        def on_checkout(dbapi_connection, connection_record, connection_proxy):
+            with self._lock:
+                self.checked_out += 1
+                self.peak_checked_out = max(self.peak_checked_out, self.checked_out)
+
+        @event.listens_for(engine, "checkin")
+        def on_checkin(dbapi_connection, connection_record) -> None:
+            with self._lock:
+                self.checked_out -= 1
+
+        @event.listens_for(engine, "invalidate")
+        def on_invalidate(dbapi_connection, connection_record, exception) -> None:
+            with self._lock:
+                self.invalidations += 1
+
+        # `dispose()` swaps in a new pool, sizes are read from the current one
+        @event.listens_for(engine, "engine_disposed")
+        def on_disposed(engine: Engine) -> None:
+            self.pool = engine.pool
+
+    def stats(self) -> dict:
+        latency = self.checkout_latency
+        stats = {
+            "pool": type(self.pool).__name__,
+            "checked_out": self.checked_out,
+            "peak_checked_out": self.peak_checked_out,
+            "connects": self.connects,
+            "invalidations": self.invalidations,
+            "timeouts": self.timeouts,
+            "checkouts": latency.count,
+            "checkout_avg_ms": (
+                round(latency.sum / latency.count * 1000, 3) if latency.count else 0.0
+            ),
+        }
+        if isinstance(self.pool, QueuePool):
+            stats.update(
+                size=self.pool.size(),
+                checked_in=self.pool.checkedin(),
+                # negative until the pool has opened `size` connections
+                overflow=self.pool.overflow(),
+                max_overflow=settings.DB_MAX_OVERFLOW,
+            )
+        return stats
+
+
+def timed_pool_class(base: Type[Pool], metrics: PoolMetrics) -> Type[Pool]:
+    """Subclass `base` to time every checkout into `metrics`"""
+
+    class TimedPool(base):
+        def connect(self):
+            started_at = time.perf_counter()
+            try:
+                return super().connect()
+            except PoolTimeoutError:
+                metrics.observe_timeout()
+                raise
+            finally:
+                metrics.observe_checkout(time.perf_counter() - started_at)
+
+    TimedPool.__name__ = f"Timed{base.__name__}"
+    return TimedPool
+
+
+def engine_options(url: str, metrics: PoolMetrics) -> dict:
+    """Pool and connection arguments of `create_engine` for `url`
+
+    Pool sizes only apply to queue pools, SQLite in memory keeps one
+    connection per thread and aiosqlite opens one per checkout.
+    """
+    url = make_url(url)
+    pool_class = url.get_dialect().get_pool_class(url)
+
+    options = {
+        "poolclass": timed_pool_class(pool_class, metrics),
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+    if issubclass(pool_class, QueuePool):
+        options.update(
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+            pool_recycle=settings.DB_POOL_RECYCLE,
+        )
+
+    if url.get_backend_name() == "postgresql" and url.get_driver_name() == "psycopg2":
+        # bulk UPDATEs by primary key run as executemany, which psycopg2
+        # otherwise sends as one round trip per row
+        options["executemany_mode"] = "values_plus_batch"
+
+    timeout = settings.DB_STATEMENT_TIMEOUT_MS
+    if timeout and url.get_backend_name() == "postgresql":
+        if url.get_driver_name() == "asyncpg":
+            options["connect_args"] = {
+                "server_settings": {"statement_timeout": str(timeout)}
+            }
+        else:
+            options["connect_args"] = {"options": f"-c statement_timeout={timeout}"}
+    return options
+
+
+class PoolRegistry:
+    """`PoolMetrics` of every engine, by name"""
+
+    def __init__(self) -> None:
+        self.pools: Dict[str, PoolMetrics] = {}
+
+    def register(self, name: str) -> PoolMetrics:
+        metrics = self.pools[name] = PoolMetrics(name)
+        return metrics
+
+    def stats(self) -> Dict[str, dict]:
+        return {
+            name: metrics.stats()
+            for name, metrics in self.pools.items()
+            if metrics.pool is not None
+        }
+
+    def render_prometheus(self) -> str:
+        """Pool gauges, counters and checkout latency in the Prometheus text
+        exposition format"""
+        stats = self.stats()
+        lines: List[str] = []
+        for name, kind, help_text in (
+            ("checked_out", "gauge", "Connections currently checked out"),
+            ("overflow", "gauge", "Connections opened beyond the pool size"),
+            ("connects", "counter", "Connections opened"),
+            ("invalidations", "counter", "Connections invalidated"),
+            ("timeouts", "counter", "Checkouts that timed out"),
+        ):
+            metric = f"db_pool_{name}" + ("_total" if kind == "counter" else "")
+            lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} {kind}"]
+            lines += [
+                f'{metric}{{engine="{engine}"}} {values[name]}'
+                for engine, values in stats.items()
+                if name in values
+            ]
+
+        lines += render_histogram(
+            "db_pool_checkout_duration_seconds",
+            "Connection checkout latency in seconds",
+            (
+                (f'engine="{engine}"', self.pools[engine].checkout_latency)
+                for engine in stats
+            ),
+        )
+        return "\n".join(lines) + "\n"
+
+
+pool_registry = PoolRegistry()
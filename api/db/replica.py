@@ -0,0 +1,60 @@
+"""Read-your-writes stickiness for read replica routing
+
+A write marks the users it touched for `REPLICA_STICKY_SECONDS`, and their
+reads go to the primary while the mark lasts. Marks live in the response
+cache backend when one is configured, so a redis backend shares them across
+workers, and in a per-process LRU otherwise.
+"""
+
+from typing import Iterable, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from api.core.config import settings
+from api.utils.response_cache import CacheBackend, MemoryBackend, response_cache
+
+# marks expire within seconds, the bound only matters under a write storm
+MAX_TRACKED_WRITERS = 100_000
+
+
+class RecentWriters:
+    """Users who wrote within the last `window` seconds"""
+
+    def __init__(self, backend: Optional[CacheBackend], window: int) -> None:
+        self.backend = backend
+        self.window = window
+
+    def mark(self, user_ids: Iterable[str]) -> None:
+        if self.backend is None:
+            return
+        for user_id in set(user_ids):
+            self.backend.set(f"wrote:{user_id}", b"1", self.window)
+
+    def wrote_recently(self, user_id: str) -> bool:
+        if self.backend is None:
+            return False
+        return self.backend.get(f"wrote:{user_id}") is not None
+
+    async def amark(self, user_ids: Iterable[str]) -> None:
+        if self.backend is not None and self.backend.blocking:
+            await run_in_threadpool(self.mark, list(user_ids))
+        else:
+            self.mark(user_ids)
+
+    async def awrote_recently(self, user_id: str) -> bool:
+        if self.backend is not None and self.backend.blocking:
+            return await run_in_threadpool(self.wrote_recently, user_id)
+        return self.wrote_recently(user_id)
+
+
+def build_recent_writers() -> RecentWriters:
+    """Track writers only when there is a replica to route reads to"""
+    backend: Optional[CacheBackend] = None
+    if settings.REPLICA_DATABASE_URL and settings.REPLICA_STICKY_SECONDS > 0:
+        backend = response_cache.backend or MemoryBackend(
+            MAX_TRACKED_WRITERS, settings.REPLICA_STICKY_SECONDS
+        )
+    return RecentWriters(backend, settings.REPLICA_STICKY_SECONDS)
+
+
+recent_writers = build_recent_writers()
@@ -0,0 +1,175 @@
+"""Full-text search over task titles and descriptions
+
+PostgreSQL keeps a stored, weighted `tsvector` of each task in
+`tasks.search_vector` behind a GIN index. SQLite, used for local runs, keeps
+an FTS5 index of the same columns in `tasks_fts`, synced by triggers. FTS5
+rows are keyed by `tasks.search_rowid`, an integer numbered by the insert
+trigger, as the implicit rowid of `tasks` may change on VACUUM. None of this
+is mapped on the model: the DDL is attached to the table here, and the
+`search_match` / `search_rank` expressions compile to the right SQL for each
+dialect.
+"""
+
+from sqlalchemy import DDL, Float, Boolean, String, Table, event, literal
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ColumnElement
+from sqlalchemy.sql.visitors import InternalTraversal
+
+SEARCH_CONFIG = "english"
+SEARCH_VECTOR_COLUMN = "search_vector"
+SEARCH_INDEX = "ix_tasks_search_vector"
+FTS_TABLE = "tasks_fts"
+FTS_ROWID_COLUMN = "search_rowid"
+FTS_ROWID_INDEX = "ix_tasks_search_rowid"
+
+# title matches outrank description matches
+SEARCH_VECTOR_SQL = (
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(title, '')), 'A') || "
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(description, '')), 'B')"
+)
+
+POSTGRESQL_DDL = [
+    f"ALTER TABLE tasks ADD COLUMN IF NOT EXISTS {SEARCH_VECTOR_COLUMN} tsvector "
+    f"GENERATED ALWAYS AS ({SEARCH_VECTOR_SQL}) STORED",
+    f"CREATE INDEX IF NOT EXISTS {SEARCH_INDEX} ON tasks "
+    f"USING gin ({SEARCH_VECTOR_COLUMN})",
+]
+
+SQLITE_DDL = [
+    f"ALTER TABLE tasks ADD COLUMN {FTS_ROWID_COLUMN} INTEGER",
+    f"CREATE UNIQUE INDEX IF NOT EXISTS {FTS_ROWID_INDEX} "
+    f"ON tasks ({FTS_ROWID_COLUMN})",
+    # number rows that existed before the column
+    f"UPDATE tasks SET {FTS_ROWID_COLUMN} = rowid WHERE {FTS_ROWID_COLUMN} IS NULL",
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    f"title, description, content='tasks', content_rowid='{FTS_ROWID_COLUMN}', "
+    "tokenize='porter unicode61')",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON tasks BEGIN "
+    f"UPDATE tasks SET {FTS_ROWID_COLUMN} = "
+    f"(SELECT coalesce(max({FTS_ROWID_COLUMN}), 0) + 1 FROM tasks) "
+    "WHERE id = new.id; "
+    f"INSERT INTO {FTS_TABLE}(rowid, title, description) "
+    f"SELECT {FTS_ROWID_COLUMN}, title, description FROM tasks WHERE id = new.id; "
+    "END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON tasks BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description) "
+    f"VALUES ('delete', old.{FTS_ROWID_COLUMN}, old.title, old.description); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au "
+    "AFTER UPDATE OF title, description ON tasks BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description) "
+    f"VALUES ('delete', old.{FTS_ROWID_COLUMN}, old.title, old.description); "
+    f"INSERT INTO {FTS_TABLE}(rowid, title, description) "
+    f"VALUES (new.{FTS_ROWID_COLUMN}, new.title, new.description); END",
+    # index rows that existed before the FTS table
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+
+
+def register_search_ddl(table: Table) -> None:
+    """Create the search column or FTS table whenever `table` is created"""
+    for statement in POSTGRESQL_DDL:
+        event.listen(
+            table, "after_create", DDL(statement).execute_if(dialect="postgresql")
+        )
+    for statement in SQLITE_DDL:
+        event.listen(table, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+
+
+def is_search_object(name: str) -> bool:
+    """Whether a reflected object belongs to the unmapped search DDL"""
+    return name in (
+        SEARCH_VECTOR_COLUMN,
+        SEARCH_INDEX,
+        FTS_ROWID_COLUMN,
+        FTS_ROWID_INDEX,
+    ) or name.startswith(FTS_TABLE)
+
+
+def fts5_query(text: str) -> str:
+    """Quote every term so user input can never be FTS5 query syntax
+
+    Terms without any letter or digit are dropped, FTS5 would otherwise treat
+    them as empty phrases that match nothing. Without any term left, the
+    query is a single empty phrase.
+    """
+    terms = [term for term in text.split() if any(char.isalnum() for char in term)]
+    return " ".join('"{}"'.format(term.replace('"', '""')) for term in terms) or '""'
+
+
+class SearchExpression(ColumnElement):
+    """Expression over `table` for the search `text`
+
+    The text is held as bound parameters, the query for PostgreSQL and the
+    quoted terms for FTS5, so statements compile once whatever is searched
+    and are then served from the compiled cache.
+    """
+
+    inherit_cache = True
+    _traverse_internals = [
+        ("table", InternalTraversal.dp_clauseelement),
+        ("text", InternalTraversal.dp_clauseelement),
+        ("fts5_text", InternalTraversal.dp_clauseelement),
+    ]
+
+    def __init__(self, table: Table, text: str) -> None:
+        self.table = table
+        self.text = literal(text, String)
+        self.fts5_text = literal(fts5_query(text), String)
+
+
+class search_match(SearchExpression):
+    """True when a task matches the search `text`, all terms required"""
+
+    type = Boolean()
+    inherit_cache = True
+
+
+class search_rank(SearchExpression):
+    """Relevance of a task for the search `text`, higher is better"""
+
+    type = Float()
+    inherit_cache = True
+
+
+def _tsquery(element: SearchExpression, compiler, **kw) -> str:
+    text = compiler.process(element.text, **kw)
+    return f"websearch_to_tsquery('{SEARCH_CONFIG}', {text})"
+
+
+@compiles(search_match)
+def compile_search_match(element: search_match, compiler, **kw) -> str:
+    table = compiler.preparer.format_table(element.table)
+    return f"{table}.{SEARCH_VECTOR_COLUMN} @@ {_tsquery(element, compiler, **kw)}"
+
+
+@compiles(search_rank)
+def compile_search_rank(element: search_rank, compiler, **kw) -> str:
+    table = compiler.preparer.format_table(element.table)
+    return (
+        f"ts_rank_cd({table}.{SEARCH_VECTOR_COLUMN}, "
+        f"{_tsquery(element, compiler, **kw)})"
+    )
+
+
+def _fts5_query(element: SearchExpression, compiler, **kw) -> str:
+    return compiler.process(element.fts5_text, **kw)
+
+
+@compiles(search_match, "sqlite")
+def compile_search_match_sqlite(element: search_match, compiler, **kw) -> str:
+    table = compiler.preparer.format_table(element.table)
+    return (
+        f"{table}.{FTS_ROWID_COLUMN} IN (SELECT rowid FROM {FTS_TABLE} "
+        f"WHERE {FTS_TABLE} MATCH {_fts5_query(element, compiler, **kw)})"
+    )
+
+
+@compiles(search_rank, "sqlite")
+def compile_search_rank_sqlite(element: search_rank, compiler, **kw) -> str:
+    # bm25 is lower for better matches, weighted like the tsvector
+    table = compiler.preparer.format_table(element.table)
+    return (
+        f"-(SELECT bm25({FTS_TABLE}, 2.0, 1.0) FROM {FTS_TABLE} "
+        f"WHERE {FTS_TABLE} MATCH {_fts5_query(element, compiler, **kw)} "
+        f"AND {FTS_TABLE}.rowid = {table}.{FTS_ROWID_COLUMN})"
+    )
@@ -0,0 +1,57 @@
+import hashlib
+import re
+from typing import Any, List, Optional
+
+from fastapi import Response, status
+
+# entity tag of a versioned row, see `version_etag`
+VERSION_ETAG = re.compile(r'"v(\d+)"')
+
+
+def make_etag(*parts: Any) -> str:
+    """Strong entity tag for a representation identified by `parts`"""
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        digest.update(str(part).encode())
+        digest.update(b"\x00")
+    return f'"{digest.hexdigest()}"'
+
+
+def version_etag(version: int) -> str:
+    """Strong entity tag of a versioned row, read back by `if_match_versions`"""
+    return f'"v{version}"'
+
+
+def if_match_versions(if_match: Optional[str]) -> Optional[List[int]]:
+    """Row versions an `If-Match` header accepts, None when any version does
+
+    Uses the strong comparison RFC 9110 requires for `If-Match`, so weak
+    tags, like tags that are not version tags, match no version.
+    """
+    if not if_match or if_match.strip() == "*":
+        return None
+    return [
+        int(match.group(1))
+        for candidate in if_match.split(",")
+        if (match := VERSION_ETAG.fullmatch(candidate.strip()))
+    ]
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an `If-None-Match` header matches `etag`
+
+    Uses the weak comparison RFC 9110 requires for `If-None-Match`, so a
+    `W/` prefix on the client's copy is ignored.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(
+        candidate.strip().removeprefix("W/") == etag
+        for candidate in if_none_match.split(",")
+    )
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
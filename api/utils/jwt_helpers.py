@@ -1,10 +1,21 @@
+import hashlib
+import time
 from datetime import datetime, timedelta
+from typing import Optional
 
 from api.core.config import settings
 from api.core import response_messages
+from api.utils.cache import TTLCache
 from fastapi import HTTPException
 from jose import JWTError, jwt
 
+# Claims of tokens that already passed verification, keyed by token type and
+# the token's sha256 digest. Every entry expires with the token's own `exp`.
+verified_tokens = TTLCache(
+    maxsize=settings.JWT_CACHE_SIZE,
+    ttl=max(settings.ACCESS_TOKEN_EXPIRY, settings.REFRESH_TOKEN_EXPIRY) * 3600,
+)
+
 
 def create_jwt_token(token_type: str, user_id: str) -> str:
     """Function to create an access token"""
@@ -23,22 +34,56 @@ def create_jwt_token(token_type: str, user_id: str) -> str:
     return encoded_jwt
 
 
-def verify_jwt_token(token: str, credentials_exception: HTTPException) -> str:
-    """Funtcion to decode and verify access and refresh tokens"""
+def decode_jwt_token(token: str, token_type: Optional[str] = None) -> dict:
+    """Decode a token and verify its signature, expiry and type
+
+    Raises:
+        JWTError: If the token is invalid or of another type
+    """
+    payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+
+    if token_type is not None and payload.get("type") != token_type:
+        raise JWTError(f"Expected a {token_type} token")
+
+    return payload
+
+
+def verified_claims(token: str, token_type: Optional[str] = None) -> Optional[dict]:
+    """Claims of a valid token carrying a user id, None for any other token
 
-    try:
-        payload = jwt.decode(
-            token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
-        )
-        user_id: str = payload.get("user_id")
+    Verified claims are cached until the token expires, so repeated requests
+    with the same token skip the signature check.
+    """
+
+    cache_key = (token_type, hashlib.sha256(token.encode()).digest())
+    payload = verified_tokens.get(cache_key)
+
+    if payload is None:
+        try:
+            payload = decode_jwt_token(token, token_type)
+        except JWTError:
+            return None
+
+        if payload.get("user_id") is None:
+            return None
 
-        if user_id is None:
-            raise credentials_exception
+        verified_tokens.set(cache_key, payload, ttl=payload["exp"] - time.time())
+
+    return payload
+
+
+def verify_jwt_token(
+    token: str,
+    credentials_exception: HTTPException,
+    token_type: Optional[str] = None,
+) -> str:
+    """Funtcion to decode and verify access and refresh tokens"""
 
-    except JWTError:
+    payload = verified_claims(token, token_type)
+    if payload is None:
         raise credentials_exception
 
-    return user_id
+    return payload["user_id"]
 
 
 def refresh_access_token(refresh_token: str) -> str:
@@ -55,7 +100,9 @@ def refresh_access_token(refresh_token: str) -> str:
     )
 
     user_id = verify_jwt_token(
-        token=refresh_token, credentials_exception=credentials_exception
+        token=refresh_token,
+        credentials_exception=credentials_exception,
+        token_type="refresh",
     )
 
     if user_id:
@@ -1,10 +1,183 @@
+"""Structured logging through a background queue
+
+Records are rendered as JSON lines on the thread that logs them, where the
+request they belong to is known, then put on a bounded queue. A
+`QueueListener` thread writes them to stderr and to `LOG_FILE`, so a slow
+disk or terminal never holds up a request. When the queue is full, records
+are dropped and counted instead of waiting for room.
+"""
+
+import atexit
 import logging
+import os
+import queue
+import random
+import sys
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, NamedTuple, Optional
+
+import orjson
+
+from api.core.config import settings
+
+# attributes every record has, anything else was passed with `extra`
+RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
 
-# Configure the logging
-logging.basicConfig(
-    level=logging.ERROR,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    handlers=[logging.FileHandler("error.log"), logging.StreamHandler()],
+
+class RequestContext(NamedTuple):
+    request_id: str
+    # ASGI scope of the request, the router adds the matched route to it
+    scope: dict
+
+
+current_request: ContextVar[Optional[RequestContext]] = ContextVar(
+    "current_request", default=None
 )
 
+
+def request_fields() -> dict:
+    """Request id, method, path and route of the request being served"""
+    context = current_request.get()
+    if context is None:
+        return {}
+    route = context.scope.get("route")
+    return {
+        "request_id": context.request_id,
+        "method": context.scope.get("method"),
+        "path": context.scope.get("path"),
+        "route": getattr(route, "path_format", None),
+    }
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, with the request context and `extra`
+    fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            **request_fields(),
+        }
+        entry.update(
+            (key, value)
+            for key, value in vars(record).items()
+            if key not in RECORD_ATTRIBUTES
+        )
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        if record.stack_info:
+            entry["stack"] = self.formatStack(record.stack_info)
+        return orjson.dumps(entry, default=str).decode()
+
+
+class SamplingFilter(logging.Filter):
+    """Keep a fraction of the records below `ERROR` of the loggers in
+    `rates`, and of their children"""
+
+    def __init__(self, rates: Dict[str, float]) -> None:
+        super().__init__()
+        self.rates = rates
+        self.sampled_out = 0
+
+    def rate(self, name: str) -> float:
+        while name:
+            if name in self.rates:
+                return self.rates[name]
+            name = name.rpartition(".")[0]
+        return 1.0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.ERROR or not self.rates:
+            return True
+        if random.random() < self.rate(record.name):
+            return True
+        self.sampled_out += 1
+        return False
+
+
+class DroppingQueueHandler(QueueHandler):
+    """`QueueHandler` dropping records while its queue is full"""
+
+    def __init__(self, log_queue: queue.Queue) -> None:
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def output_handlers() -> list:
+    """Handlers the listener thread writes the rendered records to"""
+    handlers = [logging.StreamHandler(sys.stderr)]
+    if settings.LOG_FILE:
+        file_handler = logging.FileHandler(settings.LOG_FILE, delay=True)
+        file_handler.setLevel(settings.LOG_FILE_LEVEL.upper())
+        handlers.append(file_handler)
+    for handler in handlers:
+        handler.setFormatter(logging.Formatter("%(message)s"))
+    return handlers
+
+
+def configure_logging() -> DroppingQueueHandler:
+    """Route the records of every logger through the queue, and start the
+    listener thread"""
+    queue_handler = DroppingQueueHandler(queue.Queue(settings.LOG_QUEUE_SIZE))
+    queue_handler.setFormatter(JsonFormatter())
+    queue_handler.addFilter(SamplingFilter(settings.LOG_SAMPLE_RATES))
+
+    root = logging.getLogger()
+    root.handlers = [queue_handler]
+    root.setLevel(settings.LOG_LEVEL.upper())
+    for name, level in settings.LOG_LEVELS.items():
+        logging.getLogger(name).setLevel(level.upper())
+
+    start_listener(queue_handler)
+    return queue_handler
+
+
+listener: Optional[QueueListener] = None
+
+
+def start_listener(queue_handler: DroppingQueueHandler) -> None:
+    global listener
+    listener = QueueListener(
+        queue_handler.queue, *output_handlers(), respect_handler_level=True
+    )
+    listener.start()
+    # flush what is still queued when the process exits
+    atexit.register(listener.stop)
+
+
+def restart_listener_in_child() -> None:
+    """Give a forked worker its own queue and listener
+
+    The listener thread is not copied into the child, and the queue may have
+    been forked while locked.
+    """
+    atexit.unregister(listener.stop)
+    queue_handler.queue = queue.Queue(settings.LOG_QUEUE_SIZE)
+    start_listener(queue_handler)
+
+
+def logging_stats() -> dict:
+    sampling = queue_handler.filters[0]
+    return {
+        "queued": queue_handler.queue.qsize(),
+        "dropped": queue_handler.dropped,
+        "sampled_out": sampling.sampled_out,
+    }
+
+
+queue_handler = configure_logging()
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=restart_listener_in_child)
+
 logger = logging.getLogger(__name__)
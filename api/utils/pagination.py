@@ -0,0 +1,48 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Tuple
+
+from fastapi import HTTPException, status
+
+
+def encode_cursor(sort: str, value: Any, id: str) -> str:
+    """Encodes a keyset position into an opaque, url-safe cursor
+
+    Args:
+        sort (str): The sort the position belongs to
+        value (Any): Sort column value of the last row on the page
+        id (str): `id` of the last row on the page
+
+    Returns:
+        str: The opaque cursor
+    """
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    raw = json.dumps([sort, value, id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str) -> Tuple[str, str]:
+    """Decodes a cursor created by `encode_cursor`
+
+    Args:
+        cursor (str): The opaque cursor
+        sort (str): The sort of the page being requested
+
+    Raises:
+        HTTPException: If the cursor is malformed or from another sort
+
+    Returns:
+        Tuple[str, str]: The serialized sort value and `id` of the position
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        cursor_sort, value, id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if cursor_sort != sort:
+            raise ValueError("Cursor belongs to another sort")
+        return str(value), str(id)
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor."
+        )
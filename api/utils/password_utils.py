@@ -1,9 +1,197 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Optional, Tuple
+
+from fastapi import HTTPException, status
 from passlib.context import CryptContext
+from passlib.hash import bcrypt
+
+from api.core.config import settings
 
 password_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+logger = logging.getLogger(__name__)
+
+# calibration never goes below this cost, whatever the target latency
+MIN_BCRYPT_ROUNDS = 10
+MAX_BCRYPT_ROUNDS = 16
+# cost calibration hashes at, every extra round doubles the work of a hash
+CALIBRATION_ROUNDS = 8
+
+# Dedicated pool so login storms queue here instead of occupying the
+# threads that serve every other request
+HASH_WORKERS = settings.PASSWORD_HASH_WORKERS or min(4, os.cpu_count() or 1)
+_executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="bcrypt")
+
+
+class HashingMetrics:
+    """Queue depth and latency counters of the bcrypt pool"""
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.pending = 0  # submitted and not finished yet
+        self.running = 0
+        self.completed = 0
+        self.rejected = 0
+        self.wait_seconds = 0.0
+        self.run_seconds = 0.0
+        self.max_run_seconds = 0.0
+
+    def stats(self) -> dict:
+        with self.lock:
+            completed = self.completed or 1
+            return {
+                "workers": HASH_WORKERS,
+                "rounds": password_context.to_dict().get("bcrypt__default_rounds"),
+                "queue_depth": self.pending - self.running,
+                "running": self.running,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "avg_wait_ms": round(self.wait_seconds / completed * 1000, 2),
+                "avg_run_ms": round(self.run_seconds / completed * 1000, 2),
+                "max_run_ms": round(self.max_run_seconds * 1000, 2),
+            }
+
+
+metrics = HashingMetrics()
+
+
+def _run(fn: Callable, submitted_at: float, *args):
+    started_at = time.perf_counter()
+    with metrics.lock:
+        metrics.running += 1
+        metrics.wait_seconds += started_at - submitted_at
+    try:
+        return fn(*args)
+    finally:
+        elapsed = time.perf_counter() - started_at
+        with metrics.lock:
+            metrics.running -= 1
+            metrics.pending -= 1
+            metrics.completed += 1
+            metrics.run_seconds += elapsed
+            metrics.max_run_seconds = max(metrics.max_run_seconds, elapsed)
+
+
+def _submit(fn: Callable, *args) -> Future:
+    """Queue `fn` on the bcrypt pool, shedding load once the queue is full"""
+    with metrics.lock:
+        if metrics.pending >= settings.PASSWORD_HASH_MAX_QUEUE:
+            metrics.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many authentication requests, try again shortly",
+                headers={"Retry-After": "1"},
+            )
+        metrics.pending += 1
+    return _executor.submit(_run, fn, time.perf_counter(), *args)
+
+
+# The blocking helpers below keep the calling thread waiting for the whole
+# hash, they only bound how many hashes run at once. Request handlers await
+# the `*_async` helpers instead, which free their thread meanwhile
+
+
 def hash_password(password: str) -> str:
-    return password_context.hash(password)
+    return _submit(password_context.hash, password).result()
+
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return _submit(password_context.verify, plain_password, hashed_password).result()
+
+
+def verify_and_update(
+    plain_password: str, hashed_password: str
+) -> Tuple[bool, Optional[str]]:
+    """Verify a password and rehash it if it uses an outdated cost
+
+    Returns:
+        Tuple[bool, Optional[str]]: Whether the password matches, and the new
+        hash to store when the old one needs an update
+    """
+    return _submit(
+        password_context.verify_and_update, plain_password, hashed_password
+    ).result()
+
+
+async def hash_password_async(password: str) -> str:
+    return await asyncio.wrap_future(_submit(password_context.hash, password))
+
+
+async def verify_and_update_async(
+    plain_password: str, hashed_password: str
+) -> Tuple[bool, Optional[str]]:
+    """`verify_and_update` that awaits the bcrypt pool instead of blocking"""
+    return await asyncio.wrap_future(
+        _submit(password_context.verify_and_update, plain_password, hashed_password)
+    )
+
+
+def calibrate_bcrypt_rounds(target_ms: int) -> int:
+    """Find the highest bcrypt cost that hashes within `target_ms` on this host
+
+    Times a few cheap hashes and extrapolates from them, rather than hashing
+    at every candidate cost, which held up startup for several times the
+    target latency.
+
+    Args:
+        target_ms (int): Target latency of a single hash in milliseconds
+
+    Returns:
+        int: The calibrated cost, at least `MIN_BCRYPT_ROUNDS`
+    """
+    hasher = bcrypt.using(rounds=CALIBRATION_ROUNDS)
+    samples = []
+    for _ in range(3):
+        started_at = time.perf_counter()
+        hasher.hash("calibration")
+        samples.append((time.perf_counter() - started_at) * 1000)
+
+    rounds = MIN_BCRYPT_ROUNDS
+    for candidate in range(MIN_BCRYPT_ROUNDS, MAX_BCRYPT_ROUNDS + 1):
+        if min(samples) * 2 ** (candidate - CALIBRATION_ROUNDS) > target_ms:
+            break
+        rounds = candidate
+    return rounds
+
+
+def stored_bcrypt_rounds() -> int:
+    """The cost calibrated by an earlier start, calibrated and stored in
+    `BCRYPT_ROUNDS_FILE` on the first one
+
+    Calibration is an estimate that varies from one start to the next, a
+    stored cost keeps every start hashing the same way.
+    """
+    path = settings.BCRYPT_ROUNDS_FILE
+    try:
+        with open(path) as file:
+            return int(file.read())
+    except (OSError, ValueError):
+        pass
+
+    rounds = calibrate_bcrypt_rounds(settings.BCRYPT_TARGET_MS)
+    try:
+        # workers starting together each write their own file, then swap it in
+        partial_path = f"{path}.{os.getpid()}"
+        with open(partial_path, "w") as file:
+            file.write(str(rounds))
+        os.replace(partial_path, path)
+    except OSError:
+        logger.warning(f"Could not store the bcrypt cost in {path}", exc_info=True)
+    return rounds
+
+
+def configure_bcrypt_cost() -> int:
+    """Set the bcrypt cost from `BCRYPT_ROUNDS`, or the stored calibration
 
-def verify_password(plain_password: str, hashed_password: str) -> str:
-    return password_context.verify(plain_password, hashed_password)
+    Hashes made with a lower cost are flagged by `needs_update`, so they are
+    transparently rehashed on the user's next login. Hashes with a higher
+    cost are kept, lowering the cost never weakens stored hashes.
+    """
+    rounds = settings.BCRYPT_ROUNDS or stored_bcrypt_rounds()
+    password_context.update(bcrypt__default_rounds=rounds, bcrypt__min_rounds=rounds)
+    return rounds
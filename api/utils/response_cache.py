@@ -0,0 +1,265 @@
+"""Cache of serialized task read responses
+
+Entries are namespaced by user and by a per-user generation token. A write
+replaces the generation of every user who can see the task, which orphans
+all of their cached entries at once without scanning keys. Orphans age out
+through the TTL or LRU eviction.
+
+Readers take the generation before they query the database and store their
+response under it. A response built while a write is committing is then
+stored under a generation that the write has already replaced.
+"""
+
+import secrets
+import threading
+from abc import ABC, abstractmethod
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from api.core.config import settings
+from api.utils.cache import TTLCache
+
+
+class CacheBackend(ABC):
+    """Byte store under the response cache"""
+
+    # calls block on the network, the async stack runs them in the threadpool
+    blocking = False
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[bytes]:
+        pass
+
+    @abstractmethod
+    def set(self, key: str, value: bytes, ttl: int) -> None:
+        pass
+
+    def stats(self) -> dict:
+        return {}
+
+
+class MemoryBackend(CacheBackend):
+    """In-process LRU, private to each worker process"""
+
+    def __init__(self, maxsize: int, ttl: int) -> None:
+        self.cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.cache.get(key)
+
+    def set(self, key: str, value: bytes, ttl: int) -> None:
+        self.cache.set(key, value, ttl)
+
+    def stats(self) -> dict:
+        stats = self.cache.stats()
+        return {
+            "size": stats["size"],
+            "maxsize": stats["maxsize"],
+            "evictions": stats["evictions"],
+        }
+
+
+class RedisBackend(CacheBackend):
+    """Backend on a client speaking the Redis protocol, shared by all workers
+
+    Only `GET`, `SET ... EX` and `INFO stats` are used, so `FakeRedis` can
+    stand in for `redis.Redis` in local runs.
+    """
+
+    blocking = True
+
+    def __init__(self, client) -> None:
+        self.client = client
+
+    @classmethod
+    def from_url(cls, url: str) -> "RedisBackend":
+        import redis  # only needed when this backend is configured
+
+        return cls(redis.Redis.from_url(url))
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.client.get(key)
+
+    def set(self, key: str, value: bytes, ttl: int) -> None:
+        self.client.set(key, value, ex=ttl)
+
+    def stats(self) -> dict:
+        return {"evictions": self.client.info("stats").get("evicted_keys", 0)}
+
+
+class FakeRedis:
+    """In-process stand-in for a Redis server with an LRU eviction policy
+
+    Implements the subset of `redis.Redis` used by `RedisBackend`.
+    """
+
+    def __init__(self, maxkeys: int) -> None:
+        self.store = TTLCache(maxsize=maxkeys, ttl=float("inf"))
+
+    def get(self, name: str) -> Optional[bytes]:
+        return self.store.get(name)
+
+    def set(self, name: str, value, ex: Optional[int] = None) -> bool:
+        if isinstance(value, str):
+            value = value.encode()
+        self.store.set(name, value, ex)
+        return True
+
+    def info(self, section: Optional[str] = None) -> dict:
+        return {"evicted_keys": self.store.evictions}
+
+
+class CachedResponse(NamedTuple):
+    etag: Optional[str]
+    body: bytes
+
+
+class ResponseCache:
+    """Per-user response cache with generation based invalidation
+
+    Without a backend the cache is disabled: lookups miss and stores are
+    dropped.
+    """
+
+    def __init__(self, backend: Optional[CacheBackend], ttl: int) -> None:
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+
+    def _generation(self, scope: str) -> bytes:
+        key = f"gen:{scope}"
+        generation = self.backend.get(key)
+        if generation is None:
+            # tokens are never reused, so a generation that expired or was
+            # evicted cannot bring back entries stored under it
+            generation = secrets.token_hex(8).encode()
+            self.backend.set(key, generation, self.ttl)
+        return generation
+
+    def lookup(self, scope: str, key: str) -> Tuple[bytes, Optional[CachedResponse]]:
+        """Return the scope's current generation and the entry cached under it
+
+        Pass the generation back to `store` once the response is built.
+        """
+        if self.backend is None:
+            return b"", None
+
+        generation = self._generation(scope)
+        entry = self.backend.get(f"resp:{scope}:{generation.decode()}:{key}")
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        if entry is None:
+            return generation, None
+        etag, _, body = entry.partition(b"\n")
+        return generation, CachedResponse(etag.decode() or None, body)
+
+    def store(
+        self,
+        scope: str,
+        generation: bytes,
+        key: str,
+        body: bytes,
+        etag: Optional[str] = None,
+    ) -> None:
+        if self.backend is None:
+            return
+        entry = (etag or "").encode() + b"\n" + body
+        self.backend.set(f"resp:{scope}:{generation.decode()}:{key}", entry, self.ttl)
+
+    def invalidate(self, scopes: Iterable[str]) -> None:
+        """Orphan every entry cached for `scopes`"""
+        if self.backend is None:
+            return
+        for scope in set(scopes):
+            self.backend.set(f"gen:{scope}", secrets.token_hex(8).encode(), self.ttl)
+            with self._lock:
+                self.invalidations += 1
+
+    async def alookup(
+        self, scope: str, key: str
+    ) -> Tuple[bytes, Optional[CachedResponse]]:
+        if self.backend is not None and self.backend.blocking:
+            return await run_in_threadpool(self.lookup, scope, key)
+        return self.lookup(scope, key)
+
+    async def astore(
+        self,
+        scope: str,
+        generation: bytes,
+        key: str,
+        body: bytes,
+        etag: Optional[str] = None,
+    ) -> None:
+        if self.backend is not None and self.backend.blocking:
+            await run_in_threadpool(self.store, scope, generation, key, body, etag)
+        else:
+            self.store(scope, generation, key, body, etag)
+
+    async def ainvalidate(self, scopes: Iterable[str]) -> None:
+        if self.backend is not None and self.backend.blocking:
+            await run_in_threadpool(self.invalidate, list(scopes))
+        else:
+            self.invalidate(scopes)
+
+    def stats(self) -> dict:
+        """Backend, hit/miss and eviction counters of the cache"""
+        if self.backend is None:
+            return {"backend": "none"}
+
+        lookups = self.hits + self.misses
+        return {
+            "backend": settings.RESPONSE_CACHE_BACKEND,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "invalidations": self.invalidations,
+            **self.backend.stats(),
+        }
+
+    def render_prometheus(self) -> str:
+        """Cache counters in the Prometheus text exposition format"""
+        if self.backend is None:
+            return ""
+
+        stats = self.stats()
+        lines: List[str] = []
+        for name, value, help_text in (
+            ("hits", stats["hits"], "Response cache hits"),
+            ("misses", stats["misses"], "Response cache misses"),
+            ("evictions", stats.get("evictions", 0), "Response cache evictions"),
+            ("invalidations", stats["invalidations"], "Per-user invalidations"),
+        ):
+            lines += [
+                f"# HELP response_cache_{name}_total {help_text}",
+                f"# TYPE response_cache_{name}_total counter",
+                f"response_cache_{name}_total {value}",
+            ]
+        return "\n".join(lines) + "\n"
+
+
+def build_response_cache() -> ResponseCache:
+    """Create the response cache selected by `RESPONSE_CACHE_BACKEND`"""
+    name = settings.RESPONSE_CACHE_BACKEND.lower()
+    backend: Optional[CacheBackend] = None
+    if name == "memory":
+        backend = MemoryBackend(
+            settings.RESPONSE_CACHE_SIZE, settings.RESPONSE_CACHE_TTL
+        )
+    elif name == "redis":
+        backend = RedisBackend.from_url(settings.RESPONSE_CACHE_URL)
+    elif name == "fakeredis":
+        backend = RedisBackend(FakeRedis(settings.RESPONSE_CACHE_SIZE))
+    elif name != "none":
+        raise ValueError(f"Unknown RESPONSE_CACHE_BACKEND {name!r}")
+    return ResponseCache(backend, settings.RESPONSE_CACHE_TTL)
+
+
+response_cache = build_response_cache()
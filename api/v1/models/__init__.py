@@ -1,2 +1,3 @@
 from api.v1.models.task import Task
+from api.v1.models.task_counter import TaskCounter
 from api.v1.models.user import User
@@ -8,7 +8,19 @@ from sqlalchemy import (
     Column,
     String,
     DateTime,
-    func
+)
+from sqlalchemy.dialects import sqlite
+from api.db.expressions import utc_now
+
+# stored as text on SQLite, in the format of `utc_now` so timestamps compare
+# correctly (e.g. task cursors), with sub-second precision so two writes in
+# the same second still move `updated_at` (e.g. task list ETags)
+Timestamp = DateTime(timezone=True).with_variant(
+    sqlite.DATETIME(
+        storage_format="%(year)04d-%(month)02d-%(day)02d "
+        "%(hour)02d:%(minute)02d:%(second)02d.%(microsecond)06d"
+    ),
+    "sqlite",
 )
 
 class BaseTableModel(Base):
@@ -17,10 +29,8 @@ class BaseTableModel(Base):
     __abstract__ = True
 
     id = Column(String, primary_key=True, index=True, default=lambda: str(uuid7()))
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(
-        DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
-    )
+    created_at = Column(Timestamp, server_default=utc_now())
+    updated_at = Column(Timestamp, server_default=utc_now(), onupdate=utc_now())
 
     def to_dict(self):
         """returns a dictionary representation of the instance"""
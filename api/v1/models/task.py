@@ -1,12 +1,38 @@
 """Task data model"""
 
-from sqlalchemy import Column, String, DateTime, ForeignKey, ARRAY
+from sqlalchemy import (
+    ARRAY,
+    JSON,
+    Column,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    literal_column,
+)
 from sqlalchemy.orm import relationship
+from api.db.counters import register_counter_ddl
+from api.db.search import register_search_ddl
 from api.v1.models.base_model import BaseTableModel
 
 
 class Task(BaseTableModel):
     __tablename__ = "tasks"
+    __table_args__ = (
+        # keyset pagination order for the task list
+        Index("ix_tasks_created_at_id", "created_at", "id"),
+        # per owner list orders and filters, `id` keeps keyset seeks on the index
+        Index("ix_tasks_created_by_created_at", "created_by", "created_at", "id"),
+        Index("ix_tasks_created_by_due_date", "created_by", "due_date", "id"),
+        Index("ix_tasks_created_by_status", "created_by", "status", "priority"),
+        # assignee half of the visibility predicate, in list order
+        Index("ix_tasks_assignee_id_created_at", "assignee_id", "created_at", "id"),
+        # claims tasks assigned by email when the assignee registers
+        Index("ix_tasks_assigned_to", "assigned_to"),
+        # tag containment (`tags @> ARRAY[...]`)
+        Index("ix_tasks_tags", "tags", postgresql_using="gin"),
+    )
 
     title = Column(String, nullable=False)
     description = Column(String, nullable=True)
@@ -17,10 +43,29 @@ class Task(BaseTableModel):
         String, ForeignKey("users.id", ondelete="CASCADE"), nullable=False
     )
     assigned_to = Column(String, nullable=True)  # Email of the assigned user
-    tags = Column(ARRAY(String), nullable=True)
+    # user `assigned_to` resolves to, NULL until that email is registered
+    assignee_id = Column(
+        String, ForeignKey("users.id", ondelete="SET NULL"), nullable=True
+    )
+    # SQLite has no ARRAY type, store tags as JSON there for local runs
+    tags = Column(ARRAY(String).with_variant(JSON(), "sqlite"), nullable=True)
+    # bumped by every UPDATE, the task's ETag and the `If-Match` precondition
+    version = Column(
+        Integer,
+        nullable=False,
+        default=1,
+        server_default="1",
+        onupdate=literal_column(f"{__tablename__}.version", Integer) + 1,
+    )
 
     # Relationship with User
-    creator = relationship("User", back_populates="tasks")
+    creator = relationship("User", back_populates="tasks", foreign_keys=[created_by])
 
     def __repr__(self):
         return f"<Task(id={self.id}, title='{self.title}', status='{self.status}')>"
+
+
+# full-text search column (PostgreSQL) or FTS5 table (SQLite), not mapped
+register_search_ddl(Task.__table__)
+# triggers maintaining `task_counters`
+register_counter_ddl(Task.__table__)
@@ -0,0 +1,29 @@
+"""Task counter data model"""
+
+from sqlalchemy import BigInteger, Column, Integer, String
+from api.db.counters import COUNTERS_TABLE
+from api.db.database import Base
+
+
+class TaskCounter(Base):
+    """Number of tasks visible to a user with one status
+
+    Written only by the triggers in `api.db.counters` and by counter
+    reconciliation. Rows are never deleted, so the sum of a user's
+    revisions only grows. Counters of deleted users are left behind, there
+    is no foreign key for the cascade to trip over.
+    """
+
+    __tablename__ = COUNTERS_TABLE
+
+    user_id = Column(String, primary_key=True)
+    status = Column(String, primary_key=True)
+    total = Column(Integer, nullable=False, server_default="0")
+    # bumped by every change to a counted task
+    revision = Column(BigInteger, nullable=False, server_default="0")
+
+    def __repr__(self):
+        return (
+            f"<TaskCounter(user_id={self.user_id}, status='{self.status}', "
+            f"total={self.total})>"
+        )
@@ -12,7 +12,9 @@ class User(BaseTableModel):
     password = Column(String, nullable=True)
     username = Column(String, unique=True, nullable=True)
 
-    tasks = relationship("Task", back_populates="creator")
+    tasks = relationship(
+        "Task", back_populates="creator", foreign_keys="Task.created_by"
+    )
 
     def to_dict(self):
         obj_dict = super().to_dict()
@@ -0,0 +1,251 @@
+from typing import Annotated, Optional
+from fastapi import APIRouter, File, Header, Query, UploadFile, status, Depends
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.db.database import get_async_db
+from api.core.dependencies.filters import get_task_list_filters
+from api.core.dependencies.replica import (
+    get_async_read_db,
+    get_current_reader_async,
+)
+from api.core.dependencies.security import UserPrincipal, get_current_user_async
+from api.v1.schemas import task as TaskSchema
+from api.v1.services.async_task import AsyncTaskService
+
+async_task_router = APIRouter(prefix="/tasks", tags=["Tasks"])
+
+
+@async_task_router.post(
+    path="",
+    response_model=TaskSchema.CreateTaskResponse,
+    status_code=status.HTTP_201_CREATED,
+    summary="Create a new task",
+    description="This endpoint creates a new task",
+    tags=["Tasks"],
+)
+async def create_task(
+    schema: TaskSchema.CreateTask,
+    db: Annotated[AsyncSession, Depends(get_async_db)],
+    current_user: Annotated[UserPrincipal, Depends(get_current_user_async)],
+) -> TaskSchema.CreateTaskResponse:
+    return await AsyncTaskService(db).create(schema, current_user)
+
+
+@async_task_router.post(
+    path="/bulk",
+    response_model=TaskSchema.BulkTaskResponse,
+    status_code=status.HTTP_201_CREATED,
+    summary="Create tasks in bulk",
+    description="This endpoint creates up to 1000 tasks in a single transaction",
+    tags=["Tasks"],
+)
+async def bulk_create_tasks(
+    schema: TaskSchema.BulkCreateTask,
+    db: Annotated[AsyncSession, Depends(get_async_db)],
+    current_user: Annotated[UserPrincipal, Depends(get_current_user_async)],
+) -> TaskSchema.BulkTaskResponse:
+    return await AsyncTaskService(db).bulk_create(schema, current_user)
+
+
+@async_task_router.patch(
+    path="/bulk",
+    response_model=TaskSchema.BulkTaskResponse,
+    status_code=status.HTTP_200_OK,
+    summary="Update tasks in bulk",
+    description="This endpoint updates up to 1000 tasks in a single transaction and reports the result of each item",
+    tags=["Tasks"],
+)
+async def bulk_update_tasks(
+    schema: TaskSchema.BulkUpdateTask,
+    db: Annotated[AsyncSession, Depends(get_async_db)],
+    current_user: Annotated[UserPrincipal, Depends(get_current_user_async)],
+) -> TaskSchema.BulkTaskResponse:
+    return await AsyncTaskService(db).bulk_update(current_user, schema)
+
+
+@async_task_router.delete(
+    path="/bulk",
+    response_model=TaskSchema.BulkTaskResponse,
+    status_code=status.HTTP_200_OK,
+    summary="Delete tasks in bulk",
+    description="This endpoint deletes up to 1000 tasks by ID in a single statement and reports the result of each item",
+    tags=["Tasks"],
+)
+async def bulk_delete_tasks(
+    schema: TaskSchema.BulkDeleteTask,
+    db: Annotated[AsyncSession, Depends(get_async_db)],
+    current_user: Annotated[UserPrincipal, Depends(get_current_user_async)],
+) -> TaskSchema.BulkTaskResponse:
+    return await AsyncTaskService(db).bulk_delete(current_user, schema)
+
+
+@async_task_router.post(
+    path="/import",
+    response_model=TaskSchema.ImportTaskResponse,
+    status_code=status.HTTP_200_OK,
+    summary="Import tasks from a file",
+    description="This endpoint creates a task for every row of an uploaded NDJSON or CSV file, "
+    "with the fields of a new task (CSV `tags` are separated by `;`). Rows that fail validation "
+    "are reported by line number and skipped, the rest of the file is still imported",
+    tags=["Tasks"],
+)
+async def import_tasks(
+    db: Annotated[AsyncSession, Depends(get_async_db)],
+    current_user: Annotated[UserPrincipal, Depends(get_current_user_async)],
+    file: Annotated[UploadFile, File(description="NDJSON or CSV file of tasks")],
+    import_format: Annotated[
+        TaskSchema.TaskFileFormat, Query(alias="format", description="File format")
+    ] = TaskSchema.TaskFileFormat.NDJSON,
+) -> TaskSchema.ImportTaskResponse:
+    return await AsyncTaskService(db).import_tasks(
+        file.file, import_format, current_user
+    )
+
+
+@async_task_router.get(
+    path="/search",
+    response_model=TaskSchema.TaskListResponse,
+    status_code=status.HTTP_200_OK,
+    summary="Search tasks",
+    description="This endpoint runs a full-text search over the titles and descriptions of the "
+    "current user's tasks and returns the best matches first. All words of `q` must match",
+    tags=["Tasks"],
+)
+async def search_tasks(
+    db: Annotated[AsyncSession, Depends(get_async_read_db)],
+    current_user: Annotated[UserPrincipal, Depends(get_current_reader_async)],
+    q: Annotated[
+        str, Query(min_length=1, max_length=200, description="Words to search for")
+    ],
+    page: Annotated[int, Query(ge=1)] = 1,
+    limit: Annotated[int, Query(ge=1, le=100)] = 10,
+) -> TaskSchema.TaskListResponse:
+    return await AsyncTaskService(db).search(current_user, q, page, limit)
+
+
+@async_task_router.get(
+    path="/export",
+    response_class=StreamingResponse,
+    status_code=status.HTTP_200_OK,
+    responses={
+        status.HTTP_200_OK: {
+            "content": {"application/x-ndjson": {}, "text/csv": {}},
+            "description": "All of the current user's tasks, one per line",
+        }
+    },
+    summary="Export all tasks",
+    description="This endpoint streams every task of the current user as newline delimited JSON "
+    "or as CSV. Rows are sent as they are read, however many tasks there are",
+    tags=["Tasks"],
+)
+async def export_tasks(
+    db: Annotated[AsyncSession, Depends(get_async_read_db)],
+    current_user: Annotated[UserPrincipal, Depends(get_current_reader_async)],
+    export_format: Annotated[
+        TaskSchema.TaskFileFormat, Query(alias="format", description="Export format")
+    ] = TaskSchema.TaskFileFormat.NDJSON,
+) -> StreamingResponse:
+    return await AsyncTaskService(db).export(current_user, export_format)
+
+
+@async_task_router.get(
+    path="/{task_id}",
+    response_model=TaskSchema.TaskDetailResponse,
+    status_code=status.HTTP_200_OK,
+    responses={status.HTTP_304_NOT_MODIFIED: {"description": "Task not modified"}},
+    summary="Fetch a single task by id",
+    description="This endpoint fetches a single task by it's ID and returns the task details. "
+    "Send the returned `ETag` as `If-None-Match` to get a `304` while the task is unchanged",
+    tags=["Tasks"],
+)
+async def fetch_task_by_id(
+    task_id: str,
+    db: Annotated[AsyncSession, Depends(get_async_read_db)],
+    current_user: Annotated[UserPrincipal, Depends(get_current_reader_async)],
+    if_none_match: Annotated[
+        Optional[str], Header(description="ETag of the copy the client holds")
+    ] = None,
+) -> TaskSchema.TaskDetailResponse:
+    return await AsyncTaskService(db).fetch(current_user, task_id, if_none_match)
+
+
+@async_task_router.get(
+    path="",
+    response_model=TaskSchema.TaskListResponse,
+    status_code=status.HTTP_200_OK,
+    responses={status.HTTP_304_NOT_MODIFIED: {"description": "Tasks not modified"}},
+    summary="Fetch all tasks",
+    description="This endpoint fetches a paginated list of all tasks related to the current user, "
+    "optionally filtered by status, priority, due date and tags and sorted by a whitelisted field. "
+    "Pass the returned `next_cursor` as `cursor` to page through large lists at constant cost. "
+    "Numbered pages carry an `ETag`, send it as `If-None-Match` to get a `304` while they are unchanged",
+    tags=["Tasks"],
+)
+async def fetch_all_tasks(
+    db: Annotated[AsyncSession, Depends(get_async_read_db)],
+    current_user: Annotated[UserPrincipal, Depends(get_current_reader_async)],
+    filters: Annotated[TaskSchema.TaskListFilters, Depends(get_task_list_filters)],
+    page: Annotated[int, Query(ge=1)] = 1,
+    limit: Annotated[int, Query(ge=1)] = 10,
+    cursor: Annotated[
+        Optional[str], Query(description="`next_cursor` from the previous page")
+    ] = None,
+    if_none_match: Annotated[
+        Optional[str], Header(description="ETag of the copy the client holds")
+    ] = None,
+) -> TaskSchema.TaskListResponse:
+    return await AsyncTaskService(db).fetch_all(
+        current_user, page, limit, cursor, filters, if_none_match
+    )
+
+
+@async_task_router.patch(
+    path="/{task_id}",
+    response_model=TaskSchema.UpdateTaskResponse,
+    status_code=status.HTTP_200_OK,
+    responses={
+        status.HTTP_412_PRECONDITION_FAILED: {
+            "description": "Task modified since the `If-Match` ETag"
+        }
+    },
+    summary="Update a task",
+    description="This endpoint updates a task by ID. "
+    "Send the task's `ETag` as `If-Match` to only update the version you retrieved, "
+    "a `412` means another request modified it first",
+    tags=["Tasks"],
+)
+async def update_task(
+    db: Annotated[AsyncSession, Depends(get_async_db)],
+    current_user: Annotated[UserPrincipal, Depends(get_current_user_async)],
+    schema: TaskSchema.UpdateTask,
+    task_id: str,
+    if_match: Annotated[
+        Optional[str], Header(description="ETag of the version to modify")
+    ] = None,
+) -> TaskSchema.UpdateTaskResponse:
+    return await AsyncTaskService(db).update(current_user, task_id, schema, if_match)
+
+
+@async_task_router.delete(
+    path="/{task_id}",
+    status_code=status.HTTP_204_NO_CONTENT,
+    responses={
+        status.HTTP_412_PRECONDITION_FAILED: {
+            "description": "Task modified since the `If-Match` ETag"
+        }
+    },
+    summary="Delete a task",
+    description="This endpoint deletes a task by ID. "
+    "Send the task's `ETag` as `If-Match` to only delete the version you retrieved",
+    tags=["Tasks"],
+)
+async def delete_task(
+    db: Annotated[AsyncSession, Depends(get_async_db)],
+    current_user: Annotated[UserPrincipal, Depends(get_current_user_async)],
+    task_id: str,
+    if_match: Annotated[
+        Optional[str], Header(description="ETag of the version to modify")
+    ] = None,
+) -> None:
+    await AsyncTaskService(db).delete(current_user, task_id, if_match)
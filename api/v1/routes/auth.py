@@ -5,7 +5,8 @@ from typing import Annotated
 from api.core import response_messages
 from api.db.database import get_db
 from api.utils import jwt_helpers
-from api.core.dependencies.security import get_current_user
+from api.core.dependencies.replica import get_current_reader
+from api.core.dependencies.security import UserPrincipal
 from api.v1.schemas import auth as auth_schema
 from api.v1.services import auth as auth_service
 from api.v1.models import User
@@ -21,7 +22,7 @@ auth = APIRouter(prefix="/users", tags=["Authentication"])
     description="This endpoint takes in the user creation details and returns jwt tokens along with user data",
     tags=["Authentication"],
 )
-def register(
+async def register(
     schema: auth_schema.RegisterRequest,
     db: Annotated[Session, Depends(get_db)],
 ):
@@ -34,7 +35,7 @@ def register(
 
     # Create user account
 
-    user = auth_service.register(db=db, schema=schema)
+    user = await auth_service.register(db=db, schema=schema)
 
     # Create access and refresh tokens
     access_token = jwt_helpers.create_jwt_token("access", user.id)
@@ -61,7 +62,7 @@ def register(
     description="This endpoint retrieves the jwt tokens for a registered user",
     tags=["Authentication"],
 )
-def login(
+async def login(
     schema: auth_schema.LoginRequest,
     db: Annotated[Session, Depends(get_db)],
 ):
@@ -72,7 +73,7 @@ def login(
         db (Annotated[Session, Depends): Database session
     """
 
-    user = auth_service.authenticate(db=db, schema=schema)
+    user = await auth_service.authenticate(db=db, schema=schema)
 
     # Create access and refresh tokens
     access_token = jwt_helpers.create_jwt_token("access", user.id)
@@ -118,11 +119,11 @@ def refresh_token(schema: auth_schema.TokenRefreshRequest):
 
 
 @auth.get("/greet/user")
-def greet(current_user: Annotated[User, Depends(get_current_user)]):
+def greet(current_user: Annotated[UserPrincipal, Depends(get_current_reader)]):
     """Protected route to greet the current user
 
     Args:
-        current_user (Annotated[User, Depends): The currently logged in user
+        current_user (Annotated[UserPrincipal, Depends): The currently logged in user
     """
 
     return {"greeting": f"Hello, {current_user.username}!"}
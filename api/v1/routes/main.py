@@ -1,9 +1,19 @@
 from fastapi import APIRouter
 
-from api.v1.routes.auth import auth
-from api.v1.routes.task import task_router
+from api.core.config import settings
 
 main_router = APIRouter(prefix="/api/v1")
 
-main_router.include_router(router=auth)
-main_router.include_router(router=task_router)
+# only the routes and services of the stack in use are imported
+if settings.ASYNC_DATABASE:
+    from api.v1.routes.async_auth import async_auth
+    from api.v1.routes.async_task import async_task_router
+
+    main_router.include_router(router=async_auth)
+    main_router.include_router(router=async_task_router)
+else:
+    from api.v1.routes.auth import auth
+    from api.v1.routes.task import task_router
+
+    main_router.include_router(router=auth)
+    main_router.include_router(router=task_router)
@@ -1,5 +1,4 @@
-from fastapi.openapi.models import Example
-from pydantic import BaseModel, Field, EmailStr, StringConstraints
+from pydantic import BaseModel, ConfigDict, Field, EmailStr, StringConstraints
 from typing import Optional, List, Annotated, Union
 from datetime import datetime
 from enum import Enum
@@ -17,6 +16,43 @@ class TaskPriority(str, Enum):
     HIGH = "high"
 
 
+class TaskSort(str, Enum):
+    NEWEST = "-created_at"
+    OLDEST = "created_at"
+    DUE_SOONEST = "due_date"
+    DUE_LATEST = "-due_date"
+    TITLE = "title"
+    TITLE_DESC = "-title"
+
+
+class TaskFileFormat(str, Enum):
+    NDJSON = "ndjson"
+    CSV = "csv"
+
+
+class TaskListFilters(BaseModel):
+    """Filters and sort of the task list, see `get_task_list_filters`"""
+
+    status: Optional[List[TaskStatus]] = Field(
+        None, description="Only tasks with one of these statuses"
+    )
+    priority: Optional[List[TaskPriority]] = Field(
+        None, description="Only tasks with one of these priorities"
+    )
+    due_after: Optional[datetime] = Field(
+        None, description="Only tasks due at or after this time"
+    )
+    due_before: Optional[datetime] = Field(
+        None, description="Only tasks due before this time"
+    )
+    tags: Optional[List[str]] = Field(
+        None, description="Only tasks carrying all of these tags"
+    )
+    sort: TaskSort = Field(
+        TaskSort.NEWEST, description="Sort field, prefixed with `-` for descending"
+    )
+
+
 class CreateTask(BaseModel):
     title: Annotated[str, StringConstraints(min_length=1)] = Field(
         ..., description="The title of the task"
@@ -36,8 +72,8 @@ class CreateTask(BaseModel):
         None, description="List of tags associated with the task"
     )
 
-    class Config:
-        schema_extra = {
+    model_config = ConfigDict(
+        json_schema_extra={
             "example": {
                 "title": "Finish documentation",
                 "description": "Complete the API documentation for the project",
@@ -48,6 +84,7 @@ class CreateTask(BaseModel):
                 "tags": ["documentation", "high-priority"],
             }
         }
+    )
 
 
 class UpdateTask(BaseModel):
@@ -73,8 +110,8 @@ class UpdateTask(BaseModel):
         None, description="List of tags associated with the task"
     )
 
-    class Config:
-        schema_extra = {
+    model_config = ConfigDict(
+        json_schema_extra={
             "example": {
                 "title": "Finish documentation",
                 "description": "Update the API documentation based on new endpoints",
@@ -85,6 +122,7 @@ class UpdateTask(BaseModel):
                 "tags": ["documentation", "update"],
             }
         }
+    )
 
 
 class TaskBaseResponse(BaseModel):
@@ -105,9 +143,10 @@ class TaskBaseResponse(BaseModel):
         None, description="Email of the assigned user"
     )
     tags: Optional[List[str]] = Field(None, description="Tags associated with the task")
+    version: int = Field(..., description="Version of the task, bumped by every update")
 
-    class Config:
-        schema_extra = {
+    model_config = ConfigDict(
+        json_schema_extra={
             "example": {
                 "id": "123e4567-e89b-12d3-a456-426614174000",
                 "title": "Finish documentation",
@@ -120,8 +159,10 @@ class TaskBaseResponse(BaseModel):
                 "created_by": "user-1234",
                 "assigned_to": "assignee@example.com",
                 "tags": ["documentation", "high-priority"],
+                "version": 3,
             }
         }
+    )
 
 
 class ResponseWrapper(BaseModel):
@@ -131,86 +172,212 @@ class ResponseWrapper(BaseModel):
         ..., description="Response data"
     )
 
-    class Config:
-        schema_extra = {
+    model_config = ConfigDict(
+        json_schema_extra={
             "example": {
                 "status_code": 200,
                 "detail": "Request successful",
                 "data": None,
             }
         }
+    )
 
 
 # Response for task creation
 class CreateTaskResponse(ResponseWrapper):
     data: TaskBaseResponse = Field(..., description="Details of the created task")
 
-    class Config:
-        schema_extra = {
+    model_config = ConfigDict(
+        json_schema_extra={
             "example": {
                 "status_code": 201,
                 "detail": "Task successfully created.",
-                "data": TaskBaseResponse.Config.schema_extra["example"],
+                "data": TaskBaseResponse.model_config["json_schema_extra"]["example"],
             }
         }
+    )
 
 
 # Response for task update
 class UpdateTaskResponse(ResponseWrapper):
     data: TaskBaseResponse = Field(..., description="Details of the updated task")
 
-    class Config:
-        schema_extra = {
+    model_config = ConfigDict(
+        json_schema_extra={
             "example": {
                 "status_code": 200,
                 "detail": "Task successfully updated.",
-                "data": TaskBaseResponse.Config.schema_extra["example"],
+                "data": TaskBaseResponse.model_config["json_schema_extra"]["example"],
             }
         }
+    )
 
 
 # Response for a detailed view of a single task
 class TaskDetailResponse(ResponseWrapper):
     data: TaskBaseResponse = Field(..., description="Details of the task")
 
-    class Config:
-        schema_extra = {
+    model_config = ConfigDict(
+        json_schema_extra={
             "example": {
                 "status_code": 200,
                 "detail": "Task details retrieved successfully.",
-                "data": TaskBaseResponse.Config.schema_extra["example"],
+                "data": TaskBaseResponse.model_config["json_schema_extra"]["example"],
             }
         }
+    )
 
 
 class TaskListData(BaseModel):
-    total: int = Field(..., description="Total number of tasks")
-    totalPages: int = Field(..., description="Total number of pages")
-    page: int = Field(..., description="current page")
+    total: Optional[int] = Field(
+        None, description="Total number of tasks, omitted in cursor mode"
+    )
+    totalPages: Optional[int] = Field(
+        None, description="Total number of pages, omitted in cursor mode"
+    )
+    page: Optional[int] = Field(None, description="current page")
     limit: int = Field(..., description="number of tasks per page")
+    next_cursor: Optional[str] = Field(
+        None, description="Opaque cursor for the next page, null on the last page"
+    )
     tasks: List[TaskBaseResponse] = Field(..., description="List of tasks")
 
-    class Config:
-        schema_extra = {
+    model_config = ConfigDict(
+        json_schema_extra={
             "example": {
                 "total": 100,
                 "totalPages": 10,
                 "page": 1,
                 "limit": 10,
-                "tasks": [TaskBaseResponse.Config.schema_extra["example"]],
+                "next_cursor": "WyIyMDIzLTExLTAxVDEyOjAwOjAwKzAwOjAwIiwiMTIzIl0",
+                "tasks": [
+                    TaskBaseResponse.model_config["json_schema_extra"]["example"]
+                ],
             }
         }
+    )
 
 
 # Response for a list of tasks
 class TaskListResponse(ResponseWrapper):
     data: TaskListData = Field(..., description="Paginated list of tasks")
 
-    class Config:
-        schema_extra = {
+    model_config = ConfigDict(
+        json_schema_extra={
             "example": {
                 "status_code": 200,
                 "detail": "Tasks retrieved successfully.",
-                "data": TaskListData.Config.schema_extra["example"],
+                "data": TaskListData.model_config["json_schema_extra"]["example"],
+            }
+        }
+    )
+
+
+# Bulk operations
+MAX_BULK_TASKS = 1000
+
+
+class BulkCreateTask(BaseModel):
+    tasks: List[CreateTask] = Field(
+        ...,
+        min_length=1,
+        max_length=MAX_BULK_TASKS,
+        description="Tasks to create, in one transaction",
+    )
+
+
+class BulkUpdateTaskItem(UpdateTask):
+    id: str = Field(..., description="ID of the task to update")
+
+
+class BulkUpdateTask(BaseModel):
+    tasks: List[BulkUpdateTaskItem] = Field(
+        ...,
+        min_length=1,
+        max_length=MAX_BULK_TASKS,
+        description="Task updates, each with the ID of the task to update",
+    )
+
+
+class BulkDeleteTask(BaseModel):
+    ids: List[str] = Field(
+        ...,
+        min_length=1,
+        max_length=MAX_BULK_TASKS,
+        description="IDs of the tasks to delete",
+    )
+
+
+class BulkTaskResult(BaseModel):
+    index: int = Field(..., description="Position of the item in the request")
+    id: Optional[str] = Field(None, description="ID of the task")
+    status_code: int = Field(..., description="HTTP status code of the item")
+    detail: str = Field(..., description="Result message of the item")
+    data: Optional[TaskBaseResponse] = Field(None, description="The resulting task")
+
+
+# Response for bulk task operations
+class BulkTaskResponse(ResponseWrapper):
+    data: List[BulkTaskResult] = Field(..., description="Result of each item")
+
+    model_config = ConfigDict(
+        json_schema_extra={
+            "example": {
+                "status_code": 200,
+                "detail": "Bulk update processed.",
+                "data": [
+                    {
+                        "index": 0,
+                        "id": "123e4567-e89b-12d3-a456-426614174000",
+                        "status_code": 200,
+                        "detail": "Task successfully updated.",
+                        "data": TaskBaseResponse.model_config["json_schema_extra"][
+                            "example"
+                        ],
+                    },
+                    {
+                        "index": 1,
+                        "id": "123e4567-e89b-12d3-a456-426614174001",
+                        "status_code": 404,
+                        "detail": "Task not found.",
+                        "data": None,
+                    },
+                ],
             }
         }
+    )
+
+
+# Import of tasks from a file
+class ImportTaskError(BaseModel):
+    line: int = Field(..., description="Line of the rejected row in the file")
+    detail: str = Field(..., description="Why the row was rejected")
+
+
+class ImportTaskData(BaseModel):
+    imported: int = Field(..., description="Number of tasks created")
+    rejected: int = Field(..., description="Number of rows that were not imported")
+    errors: List[ImportTaskError] = Field(
+        ..., description="The first rejected rows, up to `TASK_IMPORT_MAX_ERRORS`"
+    )
+
+
+class ImportTaskResponse(ResponseWrapper):
+    data: ImportTaskData = Field(..., description="Outcome of the import")
+
+    model_config = ConfigDict(
+        json_schema_extra={
+            "example": {
+                "status_code": 200,
+                "detail": "Import processed.",
+                "data": {
+                    "imported": 9998,
+                    "rejected": 2,
+                    "errors": [
+                        {"line": 17, "detail": "due_date: Field required"},
+                        {"line": 342, "detail": "Invalid JSON: unexpected character"},
+                    ],
+                },
+            }
+        }
+    )
@@ -0,0 +1,99 @@
+from typing import Optional
+from fastapi import HTTPException, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.utils import password_utils
+from api.core import response_messages
+from api.v1.schemas import auth as auth_schema
+from api.v1.models.user import User
+from api.v1.services.task import atasks_written, claim_assigned_tasks_statement
+
+
+class AsyncAuthService:
+    """User account service running on an AsyncSession
+
+    bcrypt is CPU bound, so hashing and verification await the bcrypt pool
+    in `password_utils` instead of running on the event loop. Like the sync
+    `auth` module it only registers and authenticates users, so it does not
+    implement the CRUD interface of `AsyncService`.
+    """
+
+    def __init__(self, db: AsyncSession) -> None:
+        self.db = db
+
+    async def fetch_by_email(self, email: str) -> Optional[User]:
+        return (await self.db.scalars(select(User).where(User.email == email))).first()
+
+    async def create(self, schema: auth_schema.RegisterRequest) -> User:
+        """Creates a new user
+
+        Args:
+            schema (auth_schema.RegisterRequest): Registration schema
+
+        Returns:
+            User: User object for the newly created user
+        """
+
+        # check if user with email already exists
+        if await self.fetch_by_email(schema.email):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=response_messages.EMAIL_ALREADY_EXISTS,
+            )
+
+        # Hash password
+        if schema.password:
+            schema.password = await password_utils.hash_password_async(schema.password)
+
+        user = User(**schema.model_dump())
+
+        self.db.add(user)
+        await self.db.flush()
+        # tasks may have been assigned to this email before it was registered
+        await self.db.execute(claim_assigned_tasks_statement(user.id, user.email))
+        await self.db.commit()
+        # the new user and the tasks it claimed are not on the replica yet
+        await atasks_written([user.id])
+        await self.db.refresh(user)
+
+        return user
+
+    async def authenticate(self, schema: auth_schema.LoginRequest) -> User:
+        """Authenticates a registered user
+
+        Args:
+            schema (auth_schema.LoginRequest): Login Request schema
+
+        Returns:
+            User: Authenticated user
+        """
+
+        # check if user with the email exists
+        user = await self.fetch_by_email(schema.email)
+
+        if not user:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=response_messages.INVALID_EMAIL,
+            )
+
+        is_valid, new_hash = await password_utils.verify_and_update_async(
+            schema.password, user.password
+        )
+
+        if not is_valid:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=response_messages.INVALID_PASSWORD,
+            )
+
+        # stored hash uses an outdated bcrypt cost, upgrade it transparently
+        if new_hash:
+            user.password = new_hash
+            await self.db.commit()
+
+        return user
+
+    async def fetch(self, user_id: str) -> Optional[User]:
+        return await self.db.get(User, user_id)
@@ -0,0 +1,415 @@
+from typing import AsyncIterator, BinaryIO, List, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import status, HTTPException
+from fastapi.responses import StreamingResponse
+
+from api.core.base.async_services import AsyncService
+from api.core.dependencies.security import UserPrincipal
+from api.utils.etag import etag_matches, if_match_versions, not_modified
+from api.utils.response_cache import response_cache
+from api.v1.models.task import Task as TaskModel
+from api.v1.schemas import task as TaskSchema
+from api.v1.services.task_import import aimport_tasks
+from api.v1.services.task import (
+    affected_users,
+    assign,
+    assigned_emails,
+    assignee_ids_statement,
+    atasks_written,
+    bulk_delete_statement,
+    bulk_insert_rows,
+    bulk_insert_statement,
+    bulk_response,
+    bulk_update_rows,
+    bulk_update_statement,
+    cached_response,
+    delete_task_statement,
+    detail_cache_key,
+    export_chunk,
+    export_header,
+    export_response,
+    export_statements,
+    joins_previous_row,
+    list_cache_key,
+    list_etag,
+    list_response,
+    list_statements,
+    reload_tasks_statement,
+    search_statement,
+    task_assignee_statement,
+    task_envelope,
+    task_etag,
+    task_statement,
+    task_version_statement,
+    to_response,
+    update_task_statement,
+    visible_owners_statement,
+    with_assignee_ids,
+    write_failed,
+)
+
+
+class AsyncTaskService(AsyncService):
+    """Task service running on an AsyncSession
+
+    Mirrors the functions in `api.v1.services.task` and shares their
+    statement builders, so both stacks return identical responses.
+    """
+
+    def __init__(self, db: AsyncSession) -> None:
+        self.db = db
+
+    async def _get_visible_task(
+        self, current_user: UserPrincipal, task_id: str
+    ) -> TaskModel:
+        retrieved_task = (
+            await self.db.scalars(task_statement(current_user, task_id))
+        ).first()
+
+        if not retrieved_task:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Task not found."
+            )
+
+        return retrieved_task
+
+    async def _with_assignee_ids(self, rows: List[dict]) -> List[dict]:
+        emails = assigned_emails(rows)
+        if emails:
+            result = await self.db.execute(assignee_ids_statement(emails))
+            with_assignee_ids(rows, dict(result.all()))
+        return rows
+
+    async def create(
+        self, schema: TaskSchema.CreateTask, current_user: UserPrincipal
+    ) -> TaskSchema.CreateTaskResponse:
+        new_task = TaskModel(**schema.model_dump())
+        new_task.created_by = current_user.id
+        assign(new_task, new_task.assigned_to)
+
+        try:
+            self.db.add(new_task)
+            await self.db.commit()
+            await self.db.refresh(new_task)
+        except Exception as e:
+            await self.db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Failed to create task {e}",
+            ) from e
+
+        await atasks_written(affected_users([new_task]))
+
+        return task_envelope(
+            TaskSchema.CreateTaskResponse,
+            status.HTTP_201_CREATED,
+            "Task successfully created.",
+            new_task,
+        )
+
+    async def fetch(
+        self,
+        current_user: UserPrincipal,
+        task_id: str,
+        if_none_match: Optional[str] = None,
+    ) -> TaskSchema.TaskDetailResponse:
+        cache_key = detail_cache_key(task_id)
+        generation, cached = await response_cache.alookup(current_user.id, cache_key)
+        if cached is not None:
+            return cached_response(cached, if_none_match)
+
+        if if_none_match:
+            # revalidate with a single column before loading the whole row
+            version = await self.db.scalar(
+                task_version_statement(current_user, task_id)
+            )
+            if version is not None:
+                etag = task_etag(version)
+                if etag_matches(if_none_match, etag):
+                    return not_modified(etag)
+
+        retrieved_task = await self._get_visible_task(current_user, task_id)
+
+        etag = task_etag(retrieved_task.version)
+        response = to_response(
+            task_envelope(
+                TaskSchema.TaskDetailResponse,
+                status.HTTP_200_OK,
+                "Task successfully retrieved.",
+                retrieved_task,
+            ),
+            etag,
+        )
+        await response_cache.astore(
+            current_user.id, generation, cache_key, response.body, etag
+        )
+        return response
+
+    async def fetch_all(
+        self,
+        current_user: UserPrincipal,
+        page: int,
+        limit: int,
+        cursor: Optional[str] = None,
+        filters: Optional[TaskSchema.TaskListFilters] = None,
+        if_none_match: Optional[str] = None,
+    ) -> TaskSchema.TaskListResponse:
+        filters = filters or TaskSchema.TaskListFilters()
+
+        cache_key = list_cache_key(page, limit, cursor, filters)
+        generation, cached = await response_cache.alookup(current_user.id, cache_key)
+        if cached is not None:
+            return cached_response(cached, if_none_match)
+
+        page_query, count_query = list_statements(
+            current_user, page, limit, cursor, filters
+        )
+
+        # cursor pages are not counted and carry no ETag
+        etag = total_tasks = None
+        if count_query is not None:
+            total_tasks, validator = (await self.db.execute(count_query)).one()
+            etag = list_etag(current_user, page, limit, filters, total_tasks, validator)
+            if etag_matches(if_none_match, etag):
+                return not_modified(etag)
+
+        paginated_tasks = (await self.db.scalars(page_query)).all()
+
+        response = to_response(
+            list_response(
+                paginated_tasks,
+                None if count_query is None else page,
+                limit,
+                total_tasks,
+                filters.sort,
+            ),
+            etag,
+        )
+        await response_cache.astore(
+            current_user.id, generation, cache_key, response.body, etag
+        )
+        return response
+
+    async def search(
+        self, current_user: UserPrincipal, text: str, page: int, limit: int
+    ) -> TaskSchema.TaskListResponse:
+        found_tasks = (
+            await self.db.scalars(search_statement(current_user, text, page, limit))
+        ).all()
+
+        return list_response(found_tasks, page, limit, None, sort=None)
+
+    async def _export_chunks(
+        self, current_user: UserPrincipal, export_format: TaskSchema.TaskFileFormat
+    ) -> AsyncIterator[bytes]:
+        header = export_header(export_format)
+        if header:
+            yield header
+
+        # the request closed the session before the body is streamed, it is
+        # used again here and closed once the export ends
+        try:
+            for statement in export_statements(current_user):
+                result = await self.db.stream(statement)
+                async for rows in result.partitions():
+                    yield export_chunk(rows, export_format)
+        finally:
+            await self.db.close()
+
+    async def import_tasks(
+        self,
+        file: BinaryIO,
+        import_format: TaskSchema.TaskFileFormat,
+        current_user: UserPrincipal,
+    ) -> TaskSchema.ImportTaskResponse:
+        return await aimport_tasks(self.db, file, import_format, current_user)
+
+    async def export(
+        self, current_user: UserPrincipal, export_format: TaskSchema.TaskFileFormat
+    ) -> StreamingResponse:
+        return export_response(
+            self._export_chunks(current_user, export_format), export_format
+        )
+
+    async def _write_failed(
+        self,
+        current_user: UserPrincipal,
+        task_id: str,
+        versions: Optional[List[int]],
+    ) -> HTTPException:
+        current_version = None
+        if versions is not None:
+            current_version = await self.db.scalar(
+                task_version_statement(current_user, task_id)
+            )
+        return write_failed(current_version, versions)
+
+    async def update(
+        self,
+        current_user: UserPrincipal,
+        task_id: str,
+        schema: TaskSchema.UpdateTask,
+        if_match: Optional[str] = None,
+    ) -> TaskSchema.UpdateTaskResponse:
+        versions = if_match_versions(if_match)
+        values = schema.model_dump(exclude_unset=True)
+        join_previous = joins_previous_row(self.db.bind.dialect)
+        statement = update_task_statement(
+            current_user, task_id, values, versions, join_previous
+        )
+
+        try:
+            replaced_assignee_id = None
+            if "assigned_to" in values and not join_previous:
+                replaced_assignee_id = await self.db.scalar(
+                    task_assignee_statement(current_user, task_id)
+                )
+            row = (await self.db.execute(statement)).first()
+            await self.db.commit()
+        except Exception as e:
+            await self.db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Failed to update task {e}",
+            ) from e
+
+        if row is None:
+            raise await self._write_failed(current_user, task_id, versions)
+
+        updated_task, previous_assignee_id = row
+        # owners before the update lose the task if it is reassigned
+        affected = affected_users([updated_task]) | {
+            user_id
+            for user_id in (previous_assignee_id, replaced_assignee_id)
+            if user_id
+        }
+        await atasks_written(affected)
+
+        return to_response(
+            task_envelope(
+                TaskSchema.UpdateTaskResponse,
+                status.HTTP_200_OK,
+                "Task successfully updated.",
+                updated_task,
+            ),
+            task_etag(updated_task.version),
+        )
+
+    async def delete(
+        self,
+        current_user: UserPrincipal,
+        task_id: str,
+        if_match: Optional[str] = None,
+    ) -> None:
+        versions = if_match_versions(if_match)
+
+        try:
+            deleted = (
+                await self.db.execute(
+                    delete_task_statement(current_user, task_id, versions)
+                )
+            ).all()
+            await self.db.commit()
+        except Exception as e:
+            await self.db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Failed to delete task {e}",
+            ) from e
+
+        if not deleted:
+            raise await self._write_failed(current_user, task_id, versions)
+
+        await atasks_written(affected_users(deleted))
+
+    async def bulk_create(
+        self, schema: TaskSchema.BulkCreateTask, current_user: UserPrincipal
+    ) -> TaskSchema.BulkTaskResponse:
+        try:
+            rows = await self._with_assignee_ids(bulk_insert_rows(schema, current_user))
+            new_tasks = (await self.db.scalars(bulk_insert_statement(), rows)).all()
+            await self.db.commit()
+        except Exception as e:
+            await self.db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Failed to create tasks {e}",
+            ) from e
+
+        await atasks_written(affected_users(new_tasks))
+
+        return bulk_response(
+            [task.id for task in new_tasks],
+            {task.id: task for task in new_tasks},
+            status.HTTP_201_CREATED,
+            "Task successfully created.",
+            "Tasks successfully created.",
+        )
+
+    async def bulk_update(
+        self, current_user: UserPrincipal, schema: TaskSchema.BulkUpdateTask
+    ) -> TaskSchema.BulkTaskResponse:
+        task_ids = [item.id for item in schema.tasks]
+
+        try:
+            owners = (
+                await self.db.execute(visible_owners_statement(current_user, task_ids))
+            ).all()
+            visible_ids = {owner.id for owner in owners}
+            update_rows = await self._with_assignee_ids(
+                bulk_update_rows(schema, visible_ids)
+            )
+
+            updated_tasks = {}
+            if update_rows:
+                await self.db.execute(bulk_update_statement(current_user), update_rows)
+                updated_tasks = {
+                    task.id: task
+                    for task in await self.db.scalars(
+                        reload_tasks_statement(visible_ids)
+                    )
+                }
+            await self.db.commit()
+        except Exception as e:
+            await self.db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Failed to update tasks {e}",
+            ) from e
+
+        await atasks_written(
+            affected_users(owners) | affected_users(updated_tasks.values())
+        )
+
+        return bulk_response(
+            task_ids,
+            updated_tasks,
+            status.HTTP_200_OK,
+            "Task successfully updated.",
+            "Bulk update processed.",
+        )
+
+    async def bulk_delete(
+        self, current_user: UserPrincipal, schema: TaskSchema.BulkDeleteTask
+    ) -> TaskSchema.BulkTaskResponse:
+        try:
+            deleted = (
+                await self.db.execute(bulk_delete_statement(current_user, schema.ids))
+            ).all()
+            await self.db.commit()
+        except Exception as e:
+            await self.db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Failed to delete tasks {e}",
+            ) from e
+
+        await atasks_written(affected_users(deleted))
+
+        return bulk_response(
+            schema.ids,
+            dict.fromkeys(row.id for row in deleted),
+            status.HTTP_200_OK,
+            "Task successfully deleted.",
+            "Bulk delete processed.",
+        )
@@ -1,13 +1,24 @@
+from typing import Optional
 from fastapi import HTTPException, status
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
 from api.utils import password_utils
 from api.core import response_messages
 from api.v1.schemas import auth as auth_schema
 from api.v1.models.user import User
+from api.v1.services.task import claim_assigned_tasks_statement, tasks_written
 
 
-def register(db: Session, schema: auth_schema.RegisterRequest) -> User:
+# Registration and login await the bcrypt pool between their queries, which
+# run on the threadpool, so no thread is held for the length of a hash
+
+
+def fetch_by_email(db: Session, email: str) -> Optional[User]:
+    return db.query(User).filter(User.email == email).first()
+
+
+async def register(db: Session, schema: auth_schema.RegisterRequest) -> User:
     """Creates a new user
 
     Args:
@@ -19,7 +30,7 @@ def register(db: Session, schema: auth_schema.RegisterRequest) -> User:
     """
 
     # check if user with email already exists
-    if db.query(User).filter(User.email == schema.email).first():
+    if await run_in_threadpool(fetch_by_email, db, schema.email):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=response_messages.EMAIL_ALREADY_EXISTS,
@@ -27,18 +38,27 @@ def register(db: Session, schema: auth_schema.RegisterRequest) -> User:
 
     # Hash password
     if schema.password:
-        schema.password = password_utils.hash_password(password=schema.password)
+        schema.password = await password_utils.hash_password_async(schema.password)
+
+    return await run_in_threadpool(save_user, db, schema)
+
 
+def save_user(db: Session, schema: auth_schema.RegisterRequest) -> User:
     user = User(**schema.model_dump())
 
     db.add(user)
+    db.flush()
+    # tasks may have been assigned to this email before it was registered
+    db.execute(claim_assigned_tasks_statement(user.id, user.email))
     db.commit()
+    # the new user and the tasks it claimed are not on the replica yet
+    tasks_written([user.id])
     db.refresh(user)
 
     return user
 
 
-def authenticate(db: Session, schema: auth_schema.LoginRequest) -> User:
+async def authenticate(db: Session, schema: auth_schema.LoginRequest) -> User:
     """Authenticates a registered user
 
     Args:
@@ -50,7 +70,7 @@ def authenticate(db: Session, schema: auth_schema.LoginRequest) -> User:
     """
 
     # check if user with the email exists
-    user = db.query(User).filter(User.email == schema.email).first()
+    user = await run_in_threadpool(fetch_by_email, db, schema.email)
 
     if not user:
         raise HTTPException(
@@ -58,10 +78,25 @@ def authenticate(db: Session, schema: auth_schema.LoginRequest) -> User:
             detail=response_messages.INVALID_EMAIL,
         )
 
-    if not password_utils.verify_password(schema.password, user.password):
+    is_valid, new_hash = await password_utils.verify_and_update_async(
+        schema.password, user.password
+    )
+
+    if not is_valid:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=response_messages.INVALID_PASSWORD,
         )
 
+    # stored hash uses an outdated bcrypt cost, upgrade it transparently
+    if new_hash:
+        await run_in_threadpool(save_password, db, user, new_hash)
+
     return user
+
+
+def save_password(db: Session, user: User, password_hash: str) -> None:
+    user.password = password_hash
+    db.commit()
+    # loaded here, the route reads the user on the event loop
+    db.refresh(user)
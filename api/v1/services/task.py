@@ -1,11 +1,64 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import desc, or_
-from fastapi import status, HTTPException
+import csv
+import hashlib
+import io
+from datetime import datetime
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Type,
+    Union,
+)
+from sqlalchemy.orm import Session, aliased, sessionmaker
+from sqlalchemy import (
+    Delete,
+    Insert,
+    Select,
+    DateTime,
+    Update,
+    and_,
+    case,
+    desc,
+    func,
+    insert,
+    or_,
+    select,
+    tuple_,
+    union_all,
+)
+
+# aliased, `update` and `delete` are the service functions of this module
+from sqlalchemy import delete as sql_delete, update as sql_update
+from fastapi import Response, status, HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
 from starlette.status import HTTP_200_OK
 
-from api.v1.models.user import User
+from api.core.dependencies.security import UserPrincipal
 from api.v1.models.task import Task as TaskModel
+from api.v1.models.task_counter import TaskCounter
+from api.v1.models.user import User
+from api.core.config import settings
+from api.db.replica import recent_writers
+from api.db.expressions import array_contains
+from api.db.search import search_match, search_rank
 from api.v1.schemas import task as TaskSchema
+from api.utils.etag import (
+    etag_matches,
+    if_match_versions,
+    make_etag,
+    not_modified,
+    version_etag,
+)
+from api.utils.pagination import encode_cursor, decode_cursor
+from api.utils.response_cache import CachedResponse, response_cache
+from api.utils.serialization import JSONBytesResponse, compile_serializer, dumps
 
 
 def model_to_schema(task: TaskModel) -> TaskSchema.TaskBaseResponse:
@@ -21,14 +74,562 @@ def model_to_schema(task: TaskModel) -> TaskSchema.TaskBaseResponse:
         created_by=task.created_by,
         assigned_to=task.assigned_to,
         tags=task.tags,
+        version=task.version,
+    )
+
+
+# Fast path: rows go straight to a dict of the `TaskBaseResponse` fields and
+# are dumped with orjson, skipping both pydantic validations
+TASK_FIELDS = tuple(TaskSchema.TaskBaseResponse.model_fields)
+serialize_task = compile_serializer(TASK_FIELDS)
+
+
+def task_envelope(
+    response_model: Type[TaskSchema.ResponseWrapper],
+    status_code: int,
+    detail: str,
+    task: TaskModel,
+) -> Union[TaskSchema.ResponseWrapper, JSONBytesResponse]:
+    """Wrap a single task in `response_model`, or in raw JSON bytes when
+    `FAST_TASK_SERIALIZATION` is on"""
+    if settings.FAST_TASK_SERIALIZATION:
+        return JSONBytesResponse(
+            dumps(
+                {
+                    "status_code": status_code,
+                    "detail": detail,
+                    "data": serialize_task(task),
+                }
+            ),
+            status_code=status_code,
+        )
+
+    return response_model(
+        status_code=status_code, detail=detail, data=model_to_schema(task)
+    )
+
+
+def to_response(
+    result: Union[TaskSchema.ResponseWrapper, Response], etag: Optional[str] = None
+) -> Response:
+    """Render a response model into a JSONResponse, attaching `etag` if given"""
+    if not isinstance(result, Response):
+        result = JSONResponse(jsonable_encoder(result), status_code=result.status_code)
+    if etag:
+        result.headers["ETag"] = etag
+    return result
+
+
+def cached_response(cached: CachedResponse, if_none_match: Optional[str]) -> Response:
+    """Serve a response cache entry, or a 304 when the client's copy is current"""
+    if cached.etag and etag_matches(if_none_match, cached.etag):
+        return not_modified(cached.etag)
+    headers = {"ETag": cached.etag} if cached.etag else None
+    return JSONBytesResponse(cached.body, headers=headers)
+
+
+def detail_cache_key(task_id: str) -> str:
+    return f"task:{task_id}"
+
+
+def list_cache_key(
+    page: int, limit: int, cursor: Optional[str], filters: TaskSchema.TaskListFilters
+) -> str:
+    params = f"{page}:{limit}:{cursor}:{filters.model_dump_json()}"
+    return "tasks:" + hashlib.blake2b(params.encode(), digest_size=16).hexdigest()
+
+
+def affected_users(tasks: Iterable) -> Set[str]:
+    """Users whose cached task reads change when `tasks` are written
+
+    Accepts task models as well as rows with `created_by` and `assignee_id`.
+    """
+    users = set()
+    for task in tasks:
+        users.add(task.created_by)
+        if task.assignee_id:
+            users.add(task.assignee_id)
+    return users
+
+
+def tasks_written(users: Iterable[str]) -> None:
+    """Drop the cached task reads of `users` and pin their reads to the
+    primary while the replica catches up"""
+    users = set(users)
+    response_cache.invalidate(users)
+    recent_writers.mark(users)
+
+
+async def atasks_written(users: Iterable[str]) -> None:
+    users = set(users)
+    await response_cache.ainvalidate(users)
+    await recent_writers.amark(users)
+
+
+def task_etag(version: int) -> str:
+    return version_etag(version)
+
+
+def write_failed(
+    current_version: Optional[int], versions: Optional[List[int]]
+) -> HTTPException:
+    """Error of a single task write that matched no row
+
+    `current_version` is the version of the task if the user can see it, the
+    write then failed its `If-Match` precondition.
+    """
+    if current_version is None or versions is None:
+        return HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Task not found."
+        )
+    return HTTPException(
+        status_code=status.HTTP_412_PRECONDITION_FAILED,
+        detail="Task was modified since it was retrieved.",
+        headers={"ETag": task_etag(current_version)},
+    )
+
+
+def list_etag(
+    current_user: UserPrincipal,
+    page: int,
+    limit: int,
+    filters: TaskSchema.TaskListFilters,
+    total_tasks: int,
+    validator: Any,
+) -> str:
+    """ETag of a task list page
+
+    `validator` changes with any write to a matching task: it is either the
+    revision of the user's task counters or, for lists the counters cannot
+    total, the last `updated_at` of the matching tasks, which a write moves
+    past the current maximum while a task leaving the list changes the count.
+    """
+    return make_etag(
+        "tasks",
+        current_user.id,
+        page,
+        limit,
+        filters.model_dump_json(),
+        total_tasks,
+        validator,
+    )
+
+
+# Statement builders, shared with the AsyncSession based service
+
+
+def visible_to(current_user: UserPrincipal):
+    """Ownership predicate: tasks created by or assigned to the user
+
+    Both arms compare indexed user id columns, so PostgreSQL can combine two
+    index scans with a BitmapOr instead of scanning the table.
+    """
+    return or_(
+        TaskModel.created_by == current_user.id,
+        TaskModel.assignee_id == current_user.id,
+    )
+
+
+def visibility_arms(current_user: UserPrincipal) -> Tuple:
+    """Disjoint halves of `visible_to`, one per index, for UNION ALL queries"""
+    return (
+        TaskModel.created_by == current_user.id,
+        and_(
+            TaskModel.assignee_id == current_user.id,
+            TaskModel.created_by != current_user.id,
+        ),
+    )
+
+
+def assignee_id_expression(email: Optional[str]):
+    """Scalar subquery resolving an assignee email to a user id, NULL if unknown"""
+    return select(User.id).where(User.email == email).scalar_subquery()
+
+
+def assign(task: TaskModel, email: Optional[str]) -> None:
+    """Set the task's `assignee_id` for `email`, resolved by the flush itself"""
+    task.assignee_id = assignee_id_expression(email) if email else None
+
+
+def assignee_ids_statement(emails: Set[str]) -> Select:
+    """Select `(email, id)` of the registered users among `emails`"""
+    return select(User.email, User.id).where(User.email.in_(emails))
+
+
+def with_assignee_ids(rows: List[dict], assignee_ids: Dict[str, str]) -> List[dict]:
+    """Set `assignee_id` on every parameter set that carries `assigned_to`"""
+    for row in rows:
+        if "assigned_to" in row:
+            row["assignee_id"] = assignee_ids.get(row["assigned_to"])
+    return rows
+
+
+def assigned_emails(rows: List[dict]) -> Set[str]:
+    return {row["assigned_to"] for row in rows if row.get("assigned_to")}
+
+
+def claim_assigned_tasks_statement(user_id: str, email: str) -> Update:
+    """Link tasks assigned to `email` before it was registered to its user"""
+    return (
+        sql_update(TaskModel)
+        .where(TaskModel.assigned_to == email, TaskModel.assignee_id.is_(None))
+        .values(assignee_id=user_id)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def task_statement(current_user: UserPrincipal, task_id: str) -> Select:
+    """Select a single task visible to the user"""
+    return select(TaskModel).where(TaskModel.id == task_id, visible_to(current_user))
+
+
+def task_version_statement(current_user: UserPrincipal, task_id: str) -> Select:
+    """Select only the `version` of a visible task, enough to revalidate it"""
+    return select(TaskModel.version).where(
+        TaskModel.id == task_id, visible_to(current_user)
+    )
+
+
+def version_clauses(versions: Optional[List[int]]) -> list:
+    """WHERE clauses of an `If-Match` precondition, see `if_match_versions`"""
+    return [] if versions is None else [TaskModel.version.in_(versions)]
+
+
+def joins_previous_row(dialect) -> bool:
+    """Whether `update_task_statement` can return the assignee a reassignment
+    replaces, SQLite only returns columns of the updated table itself"""
+    return dialect.name != "sqlite"
+
+
+def task_assignee_statement(current_user: UserPrincipal, task_id: str) -> Select:
+    """Select the assignee of a visible task"""
+    return select(TaskModel.assignee_id).where(
+        TaskModel.id == task_id, visible_to(current_user)
+    )
+
+
+def update_task_statement(
+    current_user: UserPrincipal,
+    task_id: str,
+    values: dict,
+    versions: Optional[List[int]],
+    join_previous: bool = True,
+) -> Update:
+    """UPDATE a visible task matching `versions`, returning the updated task
+    and its assignee before the update
+
+    A reassignment resolves the new assignee in the same statement and, with
+    `join_previous`, reads the old one from a self-join. Without it, the
+    current assignee is returned in its place.
+    """
+    statement = sql_update(TaskModel).where(
+        TaskModel.id == task_id, visible_to(current_user), *version_clauses(versions)
+    )
+    previous_assignee_id = TaskModel.assignee_id
+
+    if "assigned_to" in values:
+        email = values["assigned_to"]
+        values = {
+            **values,
+            "assignee_id": assignee_id_expression(email) if email else None,
+        }
+        if join_previous:
+            previous = (
+                select(TaskModel.id, TaskModel.assignee_id)
+                .where(TaskModel.id == task_id)
+                .subquery("previous")
+            )
+            statement = statement.where(TaskModel.id == previous.c.id)
+            previous_assignee_id = previous.c.assignee_id
+
+    return (
+        statement.values(values)
+        .returning(TaskModel, previous_assignee_id)
+        .execution_options(synchronize_session=False, populate_existing=True)
+    )
+
+
+def delete_task_statement(
+    current_user: UserPrincipal, task_id: str, versions: Optional[List[int]]
+) -> Delete:
+    """DELETE a visible task matching `versions`, returning its id, creator
+    and assignee"""
+    return bulk_delete_statement(current_user, [task_id]).where(
+        *version_clauses(versions)
+    )
+
+
+# whitelisted sort columns of the task list, all of them non-nullable
+SORT_COLUMNS = {
+    "created_at": TaskModel.created_at,
+    "due_date": TaskModel.due_date,
+    "title": TaskModel.title,
+}
+
+
+def filter_clauses(filters: TaskSchema.TaskListFilters) -> list:
+    """WHERE clauses for the task list filters that are set"""
+    clauses = []
+    if filters.status:
+        clauses.append(TaskModel.status.in_([s.value for s in filters.status]))
+    if filters.priority:
+        clauses.append(TaskModel.priority.in_([p.value for p in filters.priority]))
+    if filters.due_after:
+        clauses.append(TaskModel.due_date >= filters.due_after)
+    if filters.due_before:
+        clauses.append(TaskModel.due_date < filters.due_before)
+    if filters.tags:
+        clauses.append(array_contains(TaskModel.tags, filters.tags))
+    return clauses
+
+
+def counted_by_status(filters: TaskSchema.TaskListFilters) -> bool:
+    """Whether the task counters can total a list, they only split by status"""
+    return not (
+        filters.priority or filters.due_after or filters.due_before or filters.tags
+    )
+
+
+def counter_statement(
+    current_user: UserPrincipal, statuses: Optional[List[TaskSchema.TaskStatus]]
+) -> Select:
+    """Select the number of the user's tasks with one of `statuses`, all of
+    them by default, and the sum of the user's counter revisions"""
+    total = TaskCounter.total
+    if statuses:
+        total = case(
+            (TaskCounter.status.in_([s.value for s in statuses]), total), else_=0
+        )
+    return select(
+        func.coalesce(func.sum(total), 0),
+        func.coalesce(func.sum(TaskCounter.revision), 0),
+    ).where(TaskCounter.user_id == current_user.id)
+
+
+def list_statements(
+    current_user: UserPrincipal,
+    page: int,
+    limit: int,
+    cursor: Optional[str] = None,
+    filters: Optional[TaskSchema.TaskListFilters] = None,
+) -> Tuple[Select, Optional[Select]]:
+    """Build the page query and, in page mode, the count query for a task list
+
+    Args:
+        current_user (UserPrincipal): The user the tasks are visible to
+        page (int): Page number, ignored when a cursor is given
+        limit (int): Number of tasks per page
+        cursor (Optional[str]): `next_cursor` of the previous page
+        filters (Optional[TaskSchema.TaskListFilters]): Filters and sort
+
+    Returns:
+        Tuple[Select, Optional[Select]]: The page query, fetching one extra row
+        to detect a next page, and the query of the count of the matching
+        tasks and a validator for the page's ETag, or `None` in cursor mode.
+        Lists filtered on status alone are counted from the task counters
+    """
+    filters = filters or TaskSchema.TaskListFilters()
+    clauses = filter_clauses(filters)
+
+    sort = filters.sort.value
+    descending = sort.startswith("-")
+    sort_field = sort.lstrip("-")
+    sort_column = SORT_COLUMNS[sort_field]
+
+    def ordering(entity) -> list:
+        # `id` breaks ties between rows with the same sort value
+        columns = [getattr(entity, sort_field), entity.id]
+        return [desc(column) for column in columns] if descending else columns
+
+    offset = 0
+    if cursor:
+        # keyset mode: seek past the last row seen, no COUNT and no OFFSET
+        value, task_id = decode_cursor(cursor, sort)
+        if isinstance(sort_column.type, DateTime):
+            try:
+                value = datetime.fromisoformat(value)
+            except ValueError:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor."
+                )
+        position = tuple_(sort_column, TaskModel.id)
+        clauses.append(
+            position < (value, task_id) if descending else position > (value, task_id)
+        )
+    else:
+        offset = (page - 1) * limit
+
+    # Each arm walks its own (user, sort column, id) index and stops after
+    # the rows the page can need, the outer query merges the two short lists
+    arms = [
+        select(TaskModel)
+        .where(arm, *clauses)
+        .order_by(*ordering(TaskModel))
+        .limit(offset + limit + 1)
+        .subquery()
+        for arm in visibility_arms(current_user)
+    ]
+    visible = aliased(
+        TaskModel, union_all(*(select(arm) for arm in arms)).subquery("visible_tasks")
+    )
+    page_query = (
+        select(visible).order_by(*ordering(visible)).offset(offset).limit(limit + 1)
+    )
+
+    if cursor:
+        return page_query, None
+
+    if counted_by_status(filters):
+        return page_query, counter_statement(current_user, filters.status)
+
+    # the last update doubles as the validator of the page's ETag
+    count_query = (
+        select(func.count(), func.max(TaskModel.updated_at))
+        .select_from(TaskModel)
+        .where(visible_to(current_user), *clauses)
+    )
+    return page_query, count_query
+
+
+def search_statement(
+    current_user: UserPrincipal, text: str, page: int, limit: int
+) -> Select:
+    """Select a page of the user's tasks matching `text`, best matches first"""
+    table = TaskModel.__table__
+    return (
+        select(TaskModel)
+        .where(visible_to(current_user), search_match(table, text))
+        .order_by(desc(search_rank(table, text)), TaskModel.id)
+        .offset((page - 1) * limit)
+        .limit(limit)
+    )
+
+
+def list_response(
+    tasks: List[TaskModel],
+    page: Optional[int],
+    limit: int,
+    total_tasks: Optional[int],
+    sort: Optional[TaskSchema.TaskSort] = TaskSchema.TaskSort.NEWEST,
+) -> TaskSchema.TaskListResponse:
+    """Build the task list response from the rows of a `list_statements` page
+
+    Pages without a `sort`, such as search results, get no `next_cursor`.
+    """
+    total_pages: Optional[int] = None
+    if total_tasks is not None:
+        total_pages = int(total_tasks / limit) + (total_tasks % limit > 0)
+
+    next_cursor: Optional[str] = None
+    if sort is not None and len(tasks) > limit:
+        tasks = tasks[:limit]
+        last_task = tasks[-1]
+        sort_field = sort.value.lstrip("-")
+        next_cursor = encode_cursor(
+            sort.value, getattr(last_task, sort_field), last_task.id
+        )
+
+    if settings.FAST_TASK_SERIALIZATION:
+        return JSONBytesResponse(
+            dumps(
+                {
+                    "status_code": status.HTTP_200_OK,
+                    "detail": "Tasks successfully retrieved.",
+                    "data": {
+                        "total": total_tasks,
+                        "totalPages": total_pages,
+                        "page": page,
+                        "limit": limit,
+                        "next_cursor": next_cursor,
+                        "tasks": [serialize_task(task) for task in tasks],
+                    },
+                }
+            )
+        )
+
+    task_list = [model_to_schema(task) for task in tasks]
+
+    response_data = TaskSchema.TaskListData(
+        tasks=task_list,
+        total=total_tasks,
+        totalPages=total_pages,
+        page=page,
+        limit=limit,
+        next_cursor=next_cursor,
+    )
+
+    return TaskSchema.TaskListResponse(
+        status_code=status.HTTP_200_OK,
+        detail="Tasks successfully retrieved.",
+        data=response_data,
+    )
+
+
+EXPORT_MEDIA_TYPES = {
+    TaskSchema.TaskFileFormat.NDJSON: "application/x-ndjson",
+    TaskSchema.TaskFileFormat.CSV: "text/csv; charset=utf-8",
+}
+
+
+def export_statements(current_user: UserPrincipal) -> List[Select]:
+    """Select the user's tasks as plain rows, one statement per visibility arm
+
+    Each arm is read in the order of its index, so rows are fetched from a
+    server-side cursor, `TASK_EXPORT_BATCH_SIZE` at a time, without the
+    database sorting the whole result first.
+    """
+    columns = [TaskModel.__table__.c[field] for field in TASK_FIELDS]
+    return [
+        select(*columns)
+        .where(arm)
+        .order_by(TaskModel.created_at, TaskModel.id)
+        .execution_options(yield_per=settings.TASK_EXPORT_BATCH_SIZE)
+        for arm in visibility_arms(current_user)
+    ]
+
+
+def csv_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, list):
+        return ";".join(value)
+    return value
+
+
+def export_header(export_format: TaskSchema.TaskFileFormat) -> bytes:
+    if export_format == TaskSchema.TaskFileFormat.CSV:
+        return (",".join(TASK_FIELDS) + "\r\n").encode()
+    return b""
+
+
+def export_chunk(rows: Sequence, export_format: TaskSchema.TaskFileFormat) -> bytes:
+    """Encode a batch of `export_statements` rows"""
+    if export_format == TaskSchema.TaskFileFormat.NDJSON:
+        return b"".join(dumps(serialize_task(row)) + b"\n" for row in rows)
+
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows([csv_value(value) for value in row] for row in rows)
+    return buffer.getvalue().encode()
+
+
+def export_response(
+    chunks: Iterable[bytes], export_format: TaskSchema.TaskFileFormat
+) -> StreamingResponse:
+    return StreamingResponse(
+        chunks,
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={
+            "Content-Disposition": f'attachment; filename="tasks.{export_format.value}"'
+        },
     )
 
 
 def create(
-    db: Session, schema: TaskSchema.CreateTask, current_user: User
+    db: Session, schema: TaskSchema.CreateTask, current_user: UserPrincipal
 ) -> TaskSchema.CreateTaskResponse:
     new_task = TaskModel(**schema.model_dump())
     new_task.created_by = current_user.id
+    assign(new_task, new_task.assigned_to)
 
     try:
         db.add(new_task)
@@ -41,150 +642,419 @@ def create(
             detail=f"Failed to create task {e}",
         ) from e
 
-    response_data = model_to_schema(new_task)
-    return TaskSchema.CreateTaskResponse(
-        status_code=status.HTTP_201_CREATED,
-        detail="Task successfully created.",
-        data=response_data,
+    tasks_written(affected_users([new_task]))
+
+    return task_envelope(
+        TaskSchema.CreateTaskResponse,
+        status.HTTP_201_CREATED,
+        "Task successfully created.",
+        new_task,
     )
 
 
 def fetch(
-    db: Session, current_user: User, task_id: str
+    db: Session,
+    current_user: UserPrincipal,
+    task_id: str,
+    if_none_match: Optional[str] = None,
 ) -> TaskSchema.TaskDetailResponse:
-    retrieved_task = (
-        db.query(TaskModel)
-        .filter(TaskModel.id == task_id)
-        .filter(
-            or_(
-                TaskModel.created_by == current_user.id,
-                TaskModel.assigned_to == current_user.email,
-            )
-        )
-        .first()
-    )
+    cache_key = detail_cache_key(task_id)
+    generation, cached = response_cache.lookup(current_user.id, cache_key)
+    if cached is not None:
+        return cached_response(cached, if_none_match)
+
+    if if_none_match:
+        # revalidate with a single column before loading the whole row
+        version = db.scalar(task_version_statement(current_user, task_id))
+        if version is not None:
+            etag = task_etag(version)
+            if etag_matches(if_none_match, etag):
+                return not_modified(etag)
+
+    retrieved_task = db.scalars(task_statement(current_user, task_id)).first()
 
     if not retrieved_task:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Task not found."
         )
 
-    response_data = model_to_schema(retrieved_task)
-
-    return TaskSchema.TaskDetailResponse(
-        status_code=HTTP_200_OK,
-        detail="Task successfully retrieved.",
-        data=response_data,
+    etag = task_etag(retrieved_task.version)
+    response = to_response(
+        task_envelope(
+            TaskSchema.TaskDetailResponse,
+            HTTP_200_OK,
+            "Task successfully retrieved.",
+            retrieved_task,
+        ),
+        etag,
     )
+    response_cache.store(current_user.id, generation, cache_key, response.body, etag)
+    return response
 
 
 def fetch_list(
-    db: Session, current_user: User, page: int, limit: int
+    db: Session,
+    current_user: UserPrincipal,
+    page: int,
+    limit: int,
+    cursor: Optional[str] = None,
+    filters: Optional[TaskSchema.TaskListFilters] = None,
+    if_none_match: Optional[str] = None,
 ) -> TaskSchema.TaskListResponse:
+    filters = filters or TaskSchema.TaskListFilters()
+
+    cache_key = list_cache_key(page, limit, cursor, filters)
+    generation, cached = response_cache.lookup(current_user.id, cache_key)
+    if cached is not None:
+        return cached_response(cached, if_none_match)
+
     # get all tasks related to current_user
-    all_tasks = db.query(TaskModel).filter(
-        or_(
-            TaskModel.created_by == current_user.id,
-            TaskModel.assigned_to == current_user.email,
-        )
+    page_query, count_query = list_statements(
+        current_user, page, limit, cursor, filters
     )
 
-    total_tasks: int = all_tasks.count()
-    total_pages: int = int(total_tasks / limit) + (total_tasks % limit > 0)
+    # cursor pages are not counted and carry no ETag
+    etag = total_tasks = None
+    if count_query is not None:
+        total_tasks, validator = db.execute(count_query).one()
+        etag = list_etag(current_user, page, limit, filters, total_tasks, validator)
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag)
 
-    paginated_tasks = (
-        all_tasks.order_by(desc(TaskModel.created_by))
-        .limit(limit)
-        .offset((page - 1) * limit)
-        .all()
+    paginated_tasks = db.scalars(page_query).all()
+
+    response = to_response(
+        list_response(
+            paginated_tasks,
+            None if count_query is None else page,
+            limit,
+            total_tasks,
+            filters.sort,
+        ),
+        etag,
     )
+    response_cache.store(current_user.id, generation, cache_key, response.body, etag)
+    return response
 
-    task_list = [model_to_schema(task) for task in paginated_tasks]
 
-    response_data = TaskSchema.TaskListData(
-        tasks=task_list,
-        total=total_tasks,
-        totalPages=total_pages,
-        page=page,
-        limit=limit,
-    )
+def search(
+    db: Session, current_user: UserPrincipal, text: str, page: int, limit: int
+) -> TaskSchema.TaskListResponse:
+    found_tasks = db.scalars(search_statement(current_user, text, page, limit)).all()
 
-    return TaskSchema.TaskListResponse(
-        status_code=status.HTTP_200_OK,
-        detail="Tasks successfully retrieved.",
-        data=response_data,
+    return list_response(found_tasks, page, limit, None, sort=None)
+
+
+def export_chunks(
+    sessions: sessionmaker,
+    current_user: UserPrincipal,
+    export_format: TaskSchema.TaskFileFormat,
+) -> Iterator[bytes]:
+    header = export_header(export_format)
+    if header:
+        yield header
+
+    # the request session is closed before a streamed body is sent, and is
+    # shared by its thread, so the export holds a session of its own
+    with sessions() as db:
+        for statement in export_statements(current_user):
+            for rows in db.execute(statement).partitions():
+                yield export_chunk(rows, export_format)
+
+
+def export(
+    sessions: sessionmaker,
+    current_user: UserPrincipal,
+    export_format: TaskSchema.TaskFileFormat,
+) -> StreamingResponse:
+    """Stream the user's tasks from a session of `sessions`, which may be
+    bound to the replica"""
+    return export_response(
+        export_chunks(sessions, current_user, export_format), export_format
     )
 
 
 def update(
-    db: Session, current_user: User, task_id: str, schema: TaskSchema.UpdateTask
+    db: Session,
+    current_user: UserPrincipal,
+    task_id: str,
+    schema: TaskSchema.UpdateTask,
+    if_match: Optional[str] = None,
 ) -> TaskSchema.UpdateTaskResponse:
-    retrieved_task = (
-        db.query(TaskModel)
-        .filter(TaskModel.id == task_id)
-        .filter(
-            or_(
-                TaskModel.created_by == current_user.id,
-                TaskModel.assigned_to == current_user.email,
-            )
-        )
-        .first()
+    versions = if_match_versions(if_match)
+    values = schema.model_dump(exclude_unset=True)
+    join_previous = joins_previous_row(db.get_bind().dialect)
+    statement = update_task_statement(
+        current_user, task_id, values, versions, join_previous
     )
 
-    if not retrieved_task:
+    try:
+        replaced_assignee_id = None
+        if "assigned_to" in values and not join_previous:
+            replaced_assignee_id = db.scalar(
+                task_assignee_statement(current_user, task_id)
+            )
+        row = db.execute(statement).first()
+        if row is not None:
+            updated_task, previous_assignee_id = row
+            # build the response before commit expires the returned row
+            response = to_response(
+                task_envelope(
+                    TaskSchema.UpdateTaskResponse,
+                    status.HTTP_200_OK,
+                    "Task successfully updated.",
+                    updated_task,
+                ),
+                task_etag(updated_task.version),
+            )
+            # owners before the update lose the task if it is reassigned
+            affected = affected_users([updated_task]) | {
+                user_id
+                for user_id in (previous_assignee_id, replaced_assignee_id)
+                if user_id
+            }
+        db.commit()
+    except Exception as e:
+        db.rollback()
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="Task not found."
-        )
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to update task {e}",
+        ) from e
+
+    if row is None:
+        current_version = None
+        if versions is not None:
+            current_version = db.scalar(task_version_statement(current_user, task_id))
+        raise write_failed(current_version, versions)
+
+    tasks_written(affected)
+    return response
 
-    update_data = schema.model_dump(exclude_unset=True)
 
-    # replace task data with updated data
-    for key, value in update_data.items():
-        setattr(retrieved_task, key, value)
+def delete(
+    db: Session,
+    current_user: UserPrincipal,
+    task_id: str,
+    if_match: Optional[str] = None,
+) -> None:
+    versions = if_match_versions(if_match)
 
     try:
+        deleted = db.execute(
+            delete_task_statement(current_user, task_id, versions)
+        ).all()
         db.commit()
-        db.refresh(retrieved_task)
     except Exception as e:
         db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to update task {e}",
+            detail=f"Failed to delete task {e}",
         ) from e
 
-    response_data = model_to_schema(retrieved_task)
+    if not deleted:
+        current_version = None
+        if versions is not None:
+            current_version = db.scalar(task_version_statement(current_user, task_id))
+        raise write_failed(current_version, versions)
 
-    return TaskSchema.UpdateTaskResponse(
-        status_code=status.HTTP_200_OK,
-        detail="Task successfully updated.",
-        data=response_data,
+    tasks_written(affected_users(deleted))
+
+
+def bulk_insert_rows(
+    schema: TaskSchema.BulkCreateTask, current_user: UserPrincipal
+) -> List[dict]:
+    """Parameter sets for a batched INSERT of `schema.tasks`"""
+    return [
+        {**task.model_dump(), "created_by": current_user.id} for task in schema.tasks
+    ]
+
+
+def bulk_insert_statement() -> Insert:
+    """Batched INSERT returning the new rows in parameter order"""
+    return insert(TaskModel).returning(TaskModel, sort_by_parameter_order=True)
+
+
+def visible_owners_statement(
+    current_user: UserPrincipal, task_ids: List[str]
+) -> Select:
+    """Select id, creator and assignee of the tasks among `task_ids` that are
+    visible to the user"""
+    return select(TaskModel.id, TaskModel.created_by, TaskModel.assignee_id).where(
+        TaskModel.id.in_(task_ids), visible_to(current_user)
+    )
+
+
+def bulk_update_rows(
+    schema: TaskSchema.BulkUpdateTask, visible_ids: Set[str]
+) -> List[dict]:
+    """Parameter sets, keyed on primary key, for a bulk UPDATE of visible tasks"""
+    return [
+        {"id": item.id, **item.model_dump(exclude_unset=True, exclude={"id"})}
+        for item in schema.tasks
+        if item.id in visible_ids
+    ]
+
+
+def reload_tasks_statement(task_ids: Set[str]) -> Select:
+    """Select tasks by id, refreshing any copy already in the session"""
+    return (
+        select(TaskModel)
+        .where(TaskModel.id.in_(task_ids))
+        .execution_options(populate_existing=True)
+    )
+
+
+def bulk_update_statement(current_user: UserPrincipal) -> Update:
+    """ORM bulk UPDATE by primary key, still restricted to visible tasks"""
+    # rows are reloaded afterwards, skip synchronizing the session
+    return (
+        sql_update(TaskModel)
+        .where(visible_to(current_user))
+        .execution_options(synchronize_session=None)
+    )
+
+
+def bulk_delete_statement(current_user: UserPrincipal, task_ids: List[str]) -> Delete:
+    """DELETE the visible tasks among `task_ids`, returning the id, creator and
+    assignee of each deleted task"""
+    return (
+        sql_delete(TaskModel)
+        .where(TaskModel.id.in_(task_ids), visible_to(current_user))
+        .returning(TaskModel.id, TaskModel.created_by, TaskModel.assignee_id)
+        .execution_options(synchronize_session=False)
     )
 
 
-def delete(db: Session, current_user: User, task_id: str) -> None:
-    retrieved_task = (
-        db.query(TaskModel)
-        .filter(TaskModel.id == task_id)
-        .filter(
-            or_(
-                TaskModel.created_by == current_user.id,
-                TaskModel.assigned_to == current_user.email,
+def bulk_response(
+    task_ids: List[str],
+    found: Dict[str, Optional[TaskModel]],
+    success_code: int,
+    success_detail: str,
+    detail: str,
+) -> TaskSchema.BulkTaskResponse:
+    """Build per-item results, items missing from `found` are reported as 404"""
+    results = []
+    for index, task_id in enumerate(task_ids):
+        if task_id in found:
+            task = found[task_id]
+            results.append(
+                TaskSchema.BulkTaskResult(
+                    index=index,
+                    id=task_id,
+                    status_code=success_code,
+                    detail=success_detail,
+                    data=model_to_schema(task) if task is not None else None,
+                )
             )
-        )
-        .first()
+        else:
+            results.append(
+                TaskSchema.BulkTaskResult(
+                    index=index,
+                    id=task_id,
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Task not found.",
+                )
+            )
+
+    return TaskSchema.BulkTaskResponse(
+        status_code=status.HTTP_200_OK, detail=detail, data=results
     )
 
-    if not retrieved_task:
+
+def bulk_create(
+    db: Session, schema: TaskSchema.BulkCreateTask, current_user: UserPrincipal
+) -> TaskSchema.BulkTaskResponse:
+    try:
+        rows = bulk_insert_rows(schema, current_user)
+        emails = assigned_emails(rows)
+        if emails:
+            with_assignee_ids(
+                rows, dict(db.execute(assignee_ids_statement(emails)).all())
+            )
+        new_tasks = db.scalars(bulk_insert_statement(), rows).all()
+        # build the response before commit expires the returned rows
+        response = bulk_response(
+            [task.id for task in new_tasks],
+            {task.id: task for task in new_tasks},
+            status.HTTP_201_CREATED,
+            "Task successfully created.",
+            "Tasks successfully created.",
+        )
+        affected = affected_users(new_tasks)
+        db.commit()
+    except Exception as e:
+        db.rollback()
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="Task not found."
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to create tasks {e}",
+        ) from e
+
+    tasks_written(affected)
+    return response
+
+
+def bulk_update(
+    db: Session, current_user: UserPrincipal, schema: TaskSchema.BulkUpdateTask
+) -> TaskSchema.BulkTaskResponse:
+    task_ids = [item.id for item in schema.tasks]
+
+    try:
+        owners = db.execute(visible_owners_statement(current_user, task_ids)).all()
+        visible_ids = {owner.id for owner in owners}
+        update_rows = bulk_update_rows(schema, visible_ids)
+        emails = assigned_emails(update_rows)
+        if emails:
+            with_assignee_ids(
+                update_rows, dict(db.execute(assignee_ids_statement(emails)).all())
+            )
+
+        updated_tasks = {}
+        if update_rows:
+            db.execute(bulk_update_statement(current_user), update_rows)
+            updated_tasks = {
+                task.id: task
+                for task in db.scalars(reload_tasks_statement(visible_ids))
+            }
+
+        response = bulk_response(
+            task_ids,
+            updated_tasks,
+            status.HTTP_200_OK,
+            "Task successfully updated.",
+            "Bulk update processed.",
         )
+        affected = affected_users(owners) | affected_users(updated_tasks.values())
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to update tasks {e}",
+        ) from e
+
+    tasks_written(affected)
+    return response
 
+
+def bulk_delete(
+    db: Session, current_user: UserPrincipal, schema: TaskSchema.BulkDeleteTask
+) -> TaskSchema.BulkTaskResponse:
     try:
-        db.delete(retrieved_task)
+        deleted = db.execute(bulk_delete_statement(current_user, schema.ids)).all()
         db.commit()
     except Exception as e:
         db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to delete task {e}",
+            detail=f"Failed to delete tasks {e}",
         ) from e
+
+    tasks_written(affected_users(deleted))
+
+    return bulk_response(
+        schema.ids,
+        dict.fromkeys(row.id for row in deleted),
+        status.HTTP_200_OK,
+        "Task successfully deleted.",
+        "Bulk delete processed.",
+    )
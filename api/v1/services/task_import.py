@@ -0,0 +1,313 @@
+"""Import of tasks from NDJSON or CSV files
+
+The file is read incrementally and validated against `CreateTask` in chunks
+of `TASK_IMPORT_CHUNK_SIZE` rows, each loaded and committed on its own, so
+memory stays bounded by one chunk whatever the size of the file. PostgreSQL
+chunks are loaded with `COPY`, other databases get an executemany INSERT.
+
+Rows that fail to parse or validate are reported with their line number and
+skipped. A chunk the database refuses is rolled back and its rows reported,
+the chunks before and after it are still imported.
+"""
+
+import csv
+import io
+from datetime import datetime, timezone
+from enum import Enum
+from typing import BinaryIO, Iterator, List, Set, Tuple, Union
+
+import orjson
+from fastapi import status
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from uuid_extensions import uuid7
+
+from api.core.config import settings
+from api.core.dependencies.security import UserPrincipal
+from api.v1.models.task import Task as TaskModel
+from api.v1.schemas import task as TaskSchema
+from api.v1.services.task import (
+    assigned_emails,
+    assignee_ids_statement,
+    atasks_written,
+    tasks_written,
+    with_assignee_ids,
+)
+
+# columns filled by an import, timestamps come from the server defaults
+IMPORT_COLUMNS = (
+    "id",
+    "title",
+    "description",
+    "due_date",
+    "status",
+    "priority",
+    "assigned_to",
+    "tags",
+    "created_by",
+    "assignee_id",
+)
+
+COPY_STATEMENT = (
+    f"COPY {TaskModel.__tablename__} ({', '.join(IMPORT_COLUMNS)}) "
+    "FROM STDIN WITH (FORMAT csv)"
+)
+
+# (line number, parameter set) of a validated row
+ImportRow = Tuple[int, dict]
+
+
+class ImportReport:
+    """Counts of an import and the details of its first rejected rows"""
+
+    def __init__(self) -> None:
+        self.imported = 0
+        self.rejected = 0
+        self.errors: List[TaskSchema.ImportTaskError] = []
+
+    def reject(self, line: int, detail: str) -> None:
+        self.rejected += 1
+        if len(self.errors) < settings.TASK_IMPORT_MAX_ERRORS:
+            self.errors.append(TaskSchema.ImportTaskError(line=line, detail=detail))
+
+    def response(self) -> TaskSchema.ImportTaskResponse:
+        return TaskSchema.ImportTaskResponse(
+            status_code=status.HTTP_200_OK,
+            detail="Import processed.",
+            data=TaskSchema.ImportTaskData(
+                imported=self.imported, rejected=self.rejected, errors=self.errors
+            ),
+        )
+
+
+def csv_record(record: dict) -> dict:
+    """Drop empty cells, and split `tags` the way the CSV export joins them"""
+    record = {key: value for key, value in record.items() if key is not None and value}
+    if "tags" in record:
+        record["tags"] = record["tags"].split(";")
+    return record
+
+
+def read_records(
+    file: BinaryIO, import_format: TaskSchema.TaskFileFormat
+) -> Iterator[Tuple[int, Union[dict, str]]]:
+    """Yield `(line number, record)` for every row of `file`, read line by line
+
+    A row that cannot be parsed is yielded with the error message in place of
+    the record.
+    """
+    text = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+    try:
+        if import_format == TaskSchema.TaskFileFormat.CSV:
+            reader = csv.DictReader(text)
+            for record in reader:
+                yield reader.line_num, csv_record(record)
+            return
+
+        for line_number, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = orjson.loads(line)
+            except orjson.JSONDecodeError as e:
+                yield line_number, f"Invalid JSON: {e}"
+                continue
+            if not isinstance(record, dict):
+                yield line_number, "Expected a JSON object"
+                continue
+            yield line_number, record
+    finally:
+        # leave the underlying file open for its owner
+        text.detach()
+
+
+def validation_detail(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in item['loc'])}: {item['msg']}"
+        for item in error.errors()
+    )
+
+
+def import_chunks(
+    file: BinaryIO,
+    import_format: TaskSchema.TaskFileFormat,
+    current_user: UserPrincipal,
+    report: ImportReport,
+) -> Iterator[List[ImportRow]]:
+    """Validate the rows of `file` and yield them in chunks of parameter sets
+
+    Rejected rows are recorded in `report` as they are read.
+    """
+    chunk: List[ImportRow] = []
+    for line, record in read_records(file, import_format):
+        if isinstance(record, str):
+            report.reject(line, record)
+            continue
+        try:
+            task = TaskSchema.CreateTask.model_validate(record)
+        except ValidationError as e:
+            report.reject(line, validation_detail(e))
+            continue
+
+        chunk.append(
+            (
+                line,
+                {
+                    **task.model_dump(),
+                    "id": str(uuid7()),
+                    "created_by": current_user.id,
+                },
+            )
+        )
+        if len(chunk) >= settings.TASK_IMPORT_CHUNK_SIZE:
+            yield chunk
+            chunk = []
+
+    if chunk:
+        yield chunk
+
+
+def copy_param(value):
+    """Convert a parameter the way the DBAPI would before it reaches `COPY`
+
+    `due_date` is a timestamp without time zone, aware values are stored as
+    UTC like the drivers do for an INSERT.
+    """
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, datetime) and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def copy_field(value) -> str:
+    """A parameter as a field of a `COPY ... WITH (FORMAT csv)` stream
+
+    Values are always quoted, so an empty string stays distinct from the
+    unquoted empty field `COPY` reads as NULL.
+    """
+    value = copy_param(value)
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    elif isinstance(value, list):
+        # array literal with every element quoted
+        items = (
+            '"' + item.replace("\\", "\\\\").replace('"', '\\"') + '"' for item in value
+        )
+        value = "{" + ",".join(items) + "}"
+    return '"' + value.replace('"', '""') + '"'
+
+
+def copy_buffer(rows: List[dict]) -> io.StringIO:
+    """CSV stream of `rows` for `COPY_STATEMENT`"""
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write(",".join(copy_field(row[column]) for column in IMPORT_COLUMNS))
+        buffer.write("\n")
+    buffer.seek(0)
+    return buffer
+
+
+def copy_record(row: dict) -> tuple:
+    """`row` as a record for asyncpg's binary `COPY`"""
+    return tuple(copy_param(row[column]) for column in IMPORT_COLUMNS)
+
+
+def imported_owners(chunk: List[ImportRow]) -> Set[str]:
+    return {row["assignee_id"] for _, row in chunk if row["assignee_id"]}
+
+
+def reject_chunk(
+    report: ImportReport, chunk: List[ImportRow], error: Exception
+) -> None:
+    detail = f"Failed to import rows {chunk[0][0]}-{chunk[-1][0]}: {error}"
+    for line, _ in chunk:
+        report.reject(line, detail)
+
+
+def load_chunk(db: Session, rows: List[dict]) -> None:
+    emails = assigned_emails(rows)
+    with_assignee_ids(
+        rows, dict(db.execute(assignee_ids_statement(emails)).all()) if emails else {}
+    )
+
+    connection = db.connection()
+    if connection.dialect.driver == "psycopg2":
+        with connection.connection.driver_connection.cursor() as cursor:
+            cursor.copy_expert(COPY_STATEMENT, copy_buffer(rows))
+    else:
+        db.execute(insert(TaskModel.__table__), rows)
+
+
+def import_tasks(
+    db: Session,
+    file: BinaryIO,
+    import_format: TaskSchema.TaskFileFormat,
+    current_user: UserPrincipal,
+) -> TaskSchema.ImportTaskResponse:
+    report = ImportReport()
+    owners = {current_user.id}
+
+    for chunk in import_chunks(file, import_format, current_user, report):
+        try:
+            load_chunk(db, [row for _, row in chunk])
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            reject_chunk(report, chunk, e)
+            continue
+        report.imported += len(chunk)
+        owners |= imported_owners(chunk)
+
+    tasks_written(owners)
+    return report.response()
+
+
+async def aload_chunk(db: AsyncSession, rows: List[dict]) -> None:
+    emails = assigned_emails(rows)
+    assignee_ids = {}
+    if emails:
+        assignee_ids = dict((await db.execute(assignee_ids_statement(emails))).all())
+    with_assignee_ids(rows, assignee_ids)
+
+    connection = await db.connection()
+    if connection.dialect.driver == "asyncpg":
+        raw_connection = await connection.get_raw_connection()
+        await raw_connection.driver_connection.copy_records_to_table(
+            TaskModel.__tablename__,
+            records=[copy_record(row) for row in rows],
+            columns=IMPORT_COLUMNS,
+        )
+    else:
+        await db.execute(insert(TaskModel.__table__), rows)
+
+
+async def aimport_tasks(
+    db: AsyncSession,
+    file: BinaryIO,
+    import_format: TaskSchema.TaskFileFormat,
+    current_user: UserPrincipal,
+) -> TaskSchema.ImportTaskResponse:
+    report = ImportReport()
+    owners = {current_user.id}
+    chunks = import_chunks(file, import_format, current_user, report)
+
+    # reading and validating a chunk is blocking work, keep it off the loop
+    while (chunk := await run_in_threadpool(next, chunks, None)) is not None:
+        try:
+            await aload_chunk(db, [row for _, row in chunk])
+            await db.commit()
+        except Exception as e:
+            await db.rollback()
+            reject_chunk(report, chunk, e)
+            continue
+        report.imported += len(chunk)
+        owners |= imported_owners(chunk)
+
+    await atasks_written(owners)
+    return report.response()
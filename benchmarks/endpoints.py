@@ -0,0 +1,324 @@
+"""Benchmark the API endpoints in-process, and check them against a baseline
+
+Drives the `app` of `main.py` through httpx's ASGI transport, so requests
+go through every middleware, dependency and database call without a
+network in between. For each data size, a fresh user owning that many
+seeded tasks registers, logs in, refreshes tokens and creates, fetches,
+lists, updates and deletes tasks. Every scenario reports its throughput and
+p50/p95/p99 latency.
+
+The database of `DATABASE_URL` is seeded and left behind, point it at a
+throwaway SQLite file or local Postgres database. Rate limiting is turned
+off, it would refuse most of the login requests.
+
+    DATABASE_URL=sqlite:///bench.db python -m benchmarks.endpoints \\
+        --sizes 0 1000 10000 --save benchmarks/baselines/sqlite.json
+    DATABASE_URL=sqlite:///bench.db python -m benchmarks.endpoints \\
+        --sizes 0 1000 10000 --baseline benchmarks/baselines/sqlite.json
+
+With `--baseline`, the command exits with status 1 when the p95 latency of
+a scenario grew, or its throughput dropped, by more than `--threshold`.
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import httpx
+from sqlalchemy import insert, select
+from uuid_extensions import uuid7
+
+from api.core.config import settings
+from api.core.middleware.rate_limit import rate_limiter
+from api.db import database
+from api.v1.models.task import Task as TaskModel
+from api.v1.models.user import User
+from main import app, lifespan
+
+PASSWORD = "benchmark-password"
+
+# results by data size, then by scenario
+Results = Dict[str, Dict[str, dict]]
+
+
+def percentile(latencies: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of sorted `latencies`"""
+    index = max(0, min(len(latencies) - 1, round(fraction * len(latencies)) - 1))
+    return latencies[index]
+
+
+async def measure(
+    requests: int,
+    concurrency: int,
+    call: Callable[[int], Awaitable[httpx.Response]],
+    expected: int,
+) -> dict:
+    """Run `call(index)` for `requests` indexes, `concurrency` at a time"""
+    latencies: List[float] = []
+    indexes = iter(range(requests))
+
+    async def worker() -> None:
+        for index in indexes:
+            started_at = time.perf_counter()
+            response = await call(index)
+            latencies.append(time.perf_counter() - started_at)
+            if response.status_code != expected:
+                raise RuntimeError(
+                    f"{response.request.method} {response.request.url.path} "
+                    f"answered {response.status_code}: {response.text}"
+                )
+
+    started_at = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started_at
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "throughput": round(requests / elapsed, 2),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+    }
+
+
+def seed_tasks(user_id: str, count: int) -> None:
+    """Insert `count` tasks created by `user_id`"""
+    now = datetime.now(timezone.utc)
+    statuses = ("pending", "in-progress", "completed")
+    rows = [
+        {
+            "id": str(uuid7()),
+            "title": f"Seeded task {index}",
+            "description": "Complete the API documentation for the project",
+            "due_date": now + timedelta(hours=index),
+            "status": statuses[index % len(statuses)],
+            "priority": "medium",
+            "tags": ["seeded", f"batch-{index % 10}"],
+            "created_by": user_id,
+        }
+        for index in range(count)
+    ]
+    with database.engine.begin() as connection:
+        for start in range(0, count, 5000):
+            connection.execute(insert(TaskModel.__table__), rows[start : start + 5000])
+
+
+def user_id_of(email: str) -> str:
+    with database.engine.connect() as connection:
+        return connection.execute(select(User.id).where(User.email == email)).scalar()
+
+
+async def run_size(
+    client: httpx.AsyncClient, size: int, args: argparse.Namespace
+) -> Dict[str, dict]:
+    """Run every scenario for a user owning `size` tasks"""
+    run_id = uuid7().hex[-12:]
+    email = f"bench-{run_id}@example.com"
+    response = await client.post(
+        "/api/v1/users/register",
+        json={"email": email, "password": PASSWORD, "username": f"bench-{run_id}"},
+    )
+    response.raise_for_status()
+    user_id = await asyncio.to_thread(user_id_of, email)
+    await asyncio.to_thread(seed_tasks, user_id, size)
+
+    response = await client.post(
+        "/api/v1/users/login", json={"email": email, "password": PASSWORD}
+    )
+    response.raise_for_status()
+    tokens = response.json()
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+    task_ids: List[str] = []
+    due_date = datetime.now(timezone.utc).isoformat()
+
+    async def register(index: int) -> httpx.Response:
+        return await client.post(
+            "/api/v1/users/register",
+            json={
+                "email": f"bench-{run_id}-{index}@example.com",
+                "password": PASSWORD,
+                "username": f"bench-{run_id}-{index}",
+            },
+        )
+
+    async def login(index: int) -> httpx.Response:
+        return await client.post(
+            "/api/v1/users/login", json={"email": email, "password": PASSWORD}
+        )
+
+    async def refresh(index: int) -> httpx.Response:
+        return await client.post(
+            "/api/v1/users/token/refresh",
+            json={"refresh_token": tokens["refresh_token"]},
+        )
+
+    async def create(index: int) -> httpx.Response:
+        response = await client.post(
+            "/api/v1/tasks",
+            json={
+                "title": f"Benchmark task {index}",
+                "description": "Created by the endpoint benchmark",
+                "due_date": due_date,
+                "priority": "high",
+                "tags": ["benchmark"],
+            },
+            headers=headers,
+        )
+        if response.status_code == 201:
+            task_ids.append(response.json()["data"]["id"])
+        return response
+
+    async def fetch(index: int) -> httpx.Response:
+        task_id = task_ids[index % len(task_ids)]
+        return await client.get(f"/api/v1/tasks/{task_id}", headers=headers)
+
+    async def list_page(index: int) -> httpx.Response:
+        return await client.get(
+            f"/api/v1/tasks?page={index % 5 + 1}&limit=20", headers=headers
+        )
+
+    async def update(index: int) -> httpx.Response:
+        task_id = task_ids[index % len(task_ids)]
+        return await client.patch(
+            f"/api/v1/tasks/{task_id}",
+            json={"status": "completed" if index % 2 else "in-progress"},
+            headers=headers,
+        )
+
+    async def delete(index: int) -> httpx.Response:
+        return await client.delete(f"/api/v1/tasks/{task_ids[index]}", headers=headers)
+
+    # every created task is deleted again, sizes stay as seeded
+    scenarios = (
+        ("register", args.auth_requests, register, 201),
+        ("login", args.auth_requests, login, 200),
+        ("token_refresh", args.requests, refresh, 200),
+        ("task_create", args.requests, create, 201),
+        ("task_fetch", args.requests, fetch, 200),
+        ("task_list", args.requests, list_page, 200),
+        ("task_update", args.requests, update, 200),
+        ("task_delete", args.requests, delete, 204),
+    )
+    results = {}
+    for name, requests, call, expected in scenarios:
+        results[name] = await measure(requests, args.concurrency, call, expected)
+        print_result(size, name, results[name])
+    return results
+
+
+def print_result(size: int, name: str, result: dict) -> None:
+    print(
+        f"{size:>7} {name:<14} {result['throughput']:>10.1f} req/s"
+        f" p50 {result['p50_ms']:>8.2f} ms p95 {result['p95_ms']:>8.2f} ms"
+        f" p99 {result['p99_ms']:>8.2f} ms"
+    )
+
+
+def regressions(results: Results, baseline: Results, threshold: float) -> List[str]:
+    """Scenarios whose p95 latency or throughput got worse than `baseline`
+    by more than `threshold`, a fraction"""
+    found = []
+    for size, scenarios in results.items():
+        for name, result in scenarios.items():
+            base = baseline.get(size, {}).get(name)
+            if base is None:
+                continue
+            if result["p95_ms"] > base["p95_ms"] * (1 + threshold):
+                found.append(
+                    f"{name} at {size} tasks: p95 {result['p95_ms']:.2f} ms,"
+                    f" baseline {base['p95_ms']:.2f} ms"
+                )
+            if result["throughput"] < base["throughput"] * (1 - threshold):
+                found.append(
+                    f"{name} at {size} tasks: {result['throughput']:.1f} req/s,"
+                    f" baseline {base['throughput']:.1f} req/s"
+                )
+    return found
+
+
+async def run(args: argparse.Namespace) -> Results:
+    if database.async_engine is not None:
+        await database.init_async_db()
+    else:
+        await asyncio.to_thread(database.init_db)
+
+    results: Results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with lifespan(app), httpx.AsyncClient(
+        transport=transport, base_url="http://benchmark"
+    ) as client:
+        for size in args.sizes:
+            results[str(size)] = await run_size(client, size, args)
+    return results
+
+
+def environment() -> dict:
+    return {
+        "database": database.engine.dialect.name,
+        "async_database": settings.ASYNC_DATABASE,
+        "python": platform.python_version(),
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[0, 1000, 10000])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument(
+        "--auth-requests",
+        type=int,
+        default=20,
+        help="requests of the register and login scenarios, bound by bcrypt",
+    )
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--save", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare against this JSON file")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.2,
+        help="allowed regression from the baseline, as a fraction",
+    )
+    args = parser.parse_args(argv)
+
+    rate_limiter.backend = None
+    results = asyncio.run(run(args))
+
+    if args.save:
+        Path(args.save).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.save, "w") as file:
+            json.dump(
+                {"environment": environment(), "results": results}, file, indent=2
+            )
+        print(f"Saved results to {args.save}")
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        recorded = baseline["environment"]
+        current = environment()
+        for key in ("database", "async_database"):
+            if recorded.get(key) != current[key]:
+                print(
+                    f"WARNING baseline ran with {key} {recorded.get(key)!r},"
+                    f" this run with {current[key]!r}"
+                )
+        found = regressions(results, baseline["results"], args.threshold)
+        for regression in found:
+            print(f"REGRESSION {regression}")
+        if found:
+            return 1
+        print(f"No regression beyond {args.threshold:.0%} of {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,42 @@
+"""Benchmark verify_jwt_token with and without the verified-token cache
+
+Needs the same environment as the API (a `.env` file or exported variables).
+
+    python -m benchmarks.jwt_verify --iterations 20000
+"""
+
+import argparse
+import timeit
+
+from fastapi import HTTPException
+
+from api.utils import jwt_helpers
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    token = jwt_helpers.create_jwt_token("access", "benchmark-user")
+    credentials_exception = HTTPException(status_code=401)
+
+    def uncached():
+        jwt_helpers.decode_jwt_token(token, "access")
+
+    def cached():
+        jwt_helpers.verify_jwt_token(token, credentials_exception, "access")
+
+    cached()  # warm the cache
+
+    results = {}
+    for name, fn in (("uncached", uncached), ("cached", cached)):
+        seconds = timeit.timeit(fn, number=args.iterations)
+        results[name] = seconds / args.iterations * 1e6
+        print(f"{name:>9}: {results[name]:8.2f} us/op")
+
+    print(f"  speedup: {results['uncached'] / results['cached']:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""Profile the cold start of an API worker
+
+Reports the slowest imports of `main` by their own and cumulative time, the
+import time per top-level package, and the time to the first request of
+fresh processes. Each of those processes imports `main`, runs the lifespan
+startup, then serves `/probe` and a login with an unknown email, the first
+request touching the database.
+
+Needs the same environment as the API (a `.env` file or exported variables),
+and a database with the tables created for the login to answer 400.
+
+    python -m benchmarks.startup --runs 5 --top 25
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+# (module, self microseconds, cumulative microseconds)
+ImportTime = Tuple[str, int, int]
+
+
+def import_times(module: str) -> List[ImportTime]:
+    """Import `module` in a fresh interpreter under `-X importtime`"""
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = []
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        own, cumulative, name = line[len("import time:") :].split("|")
+        if own.strip().isdigit():
+            times.append((name.strip(), int(own), int(cumulative)))
+    return times
+
+
+def print_import_profile(times: List[ImportTime], top: int) -> None:
+    total = sum(own for _, own, _ in times)
+    print(f"Import of main: {total / 1000:.1f} ms over {len(times)} modules\n")
+
+    by_package: Dict[str, int] = defaultdict(int)
+    for name, own, _ in times:
+        by_package[name.partition(".")[0]] += own
+    print(f"{'package':<40} {'ms':>9} {'share':>7}")
+    for package, own in sorted(by_package.items(), key=lambda item: -item[1])[:top]:
+        print(f"{package:<40} {own / 1000:>9.1f} {own / total:>7.1%}")
+
+    print(f"\n{'module':<50} {'self ms':>9} {'cumul. ms':>10}")
+    for name, own, cumulative in sorted(times, key=lambda item: -item[1])[:top]:
+        print(f"{name:<50} {own / 1000:>9.1f} {cumulative / 1000:>10.1f}")
+
+
+async def first_requests() -> Dict[str, float]:
+    """Phases of a cold start, in milliseconds since this function started"""
+    started_at = time.perf_counter()
+    phases = {}
+
+    def mark(phase: str) -> None:
+        phases[phase] = round((time.perf_counter() - started_at) * 1000, 1)
+
+    import httpx
+
+    from main import app, lifespan
+
+    mark("import")
+    async with lifespan(app):
+        mark("startup")
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as c:
+            response = await c.get("/probe")
+            response.raise_for_status()
+            mark("first_request")
+            response = await c.post(
+                "/api/v1/users/login",
+                json={"email": "startup@example.com", "password": "startup"},
+            )
+            if response.status_code != 400:
+                raise RuntimeError(f"Login answered {response.status_code}")
+            mark("first_database_request")
+    return phases
+
+
+def time_to_first_request(runs: int) -> None:
+    """Run cold starts in fresh processes and print their median phases"""
+    results: Dict[str, List[float]] = defaultdict(list)
+    for _ in range(runs):
+        started_at = time.perf_counter()
+        process = subprocess.run(
+            [sys.executable, "-m", "benchmarks.startup", "--child"],
+            capture_output=True,
+            text=True,
+            check=True,
+            env={**os.environ, "LOG_LEVEL": "WARNING"},
+        )
+        elapsed = (time.perf_counter() - started_at) * 1000
+        phases = json.loads(process.stdout.splitlines()[-1])
+        # the interpreter's own startup is what the child cannot see
+        results["interpreter"].append(elapsed - phases["total"])
+        for phase, value in phases.items():
+            results[phase].append(value)
+
+    print(f"\nCold start, median of {runs} processes")
+    print(f"{'phase':<24} {'ms':>9}")
+    for phase, values in results.items():
+        print(f"{phase:<24} {statistics.median(values):>9.1f}")
+
+
+def child() -> None:
+    started_at = time.perf_counter()
+    phases = asyncio.run(first_requests())
+    phases["total"] = round((time.perf_counter() - started_at) * 1000, 1)
+    print(json.dumps(phases))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=25)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child()
+        return
+    print_import_profile(import_times("main"), args.top)
+    time_to_first_request(args.runs)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Benchmark building a 100-task list page with and without the fast path
+
+The default path builds pydantic responses, which FastAPI then validates
+against the `response_model` and encodes with the stdlib json encoder. The
+fast path dumps the ORM rows straight to JSON bytes with orjson.
+
+Needs the same environment as the API (a `.env` file or exported variables).
+
+    python -m benchmarks.task_serialization --tasks 100 --iterations 500
+"""
+
+import argparse
+import asyncio
+import timeit
+from datetime import datetime, timedelta, timezone
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+
+from api.core.config import settings
+from api.v1.models.task import Task as TaskModel
+from api.v1.schemas import task as TaskSchema
+from api.v1.services import task as TaskService
+
+
+def make_tasks(count: int):
+    now = datetime.now(timezone.utc)
+    return [
+        TaskModel(
+            id=f"0192c6f0-0000-7000-8000-{index:012d}",
+            title=f"Task {index}",
+            description="Complete the API documentation for the project",
+            due_date=now + timedelta(days=index),
+            status="pending",
+            priority="high",
+            created_at=now,
+            updated_at=now,
+            created_by="0192c6f0-0000-7000-8000-000000000000",
+            assigned_to="assignee@example.com",
+            tags=["documentation", "high-priority"],
+        )
+        for index in range(count)
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=100)
+    parser.add_argument("--iterations", type=int, default=500)
+    args = parser.parse_args()
+
+    tasks = make_tasks(args.tasks)
+    field = create_model_field("Response", TaskSchema.TaskListResponse)
+    loop = asyncio.new_event_loop()
+
+    def default_path():
+        settings.FAST_TASK_SERIALIZATION = False
+        content = TaskService.list_response(tasks, 1, args.tasks, args.tasks)
+        # what FastAPI does with the returned model before sending it
+        encoded = loop.run_until_complete(
+            serialize_response(field=field, response_content=content)
+        )
+        return JSONResponse(encoded).body
+
+    def fast_path():
+        settings.FAST_TASK_SERIALIZATION = True
+        return TaskService.list_response(tasks, 1, args.tasks, args.tasks).body
+
+    results = {}
+    for name, fn in (("default", default_path), ("fast", fast_path)):
+        fn()  # warm up
+        seconds = timeit.timeit(fn, number=args.iterations)
+        results[name] = seconds / args.iterations * 1000
+        print(f"{name:>8}: {results[name]:8.3f} ms/page")
+
+    print(f" speedup: {results['default'] / results['fast']:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
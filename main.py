@@ -1,42 +1,46 @@
-import uvicorn
-from collections import defaultdict
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, status
 from fastapi import HTTPException, Request
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.exc import IntegrityError
 from starlette.middleware.sessions import SessionMiddleware  # required by google oauth
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.concurrency import run_in_threadpool
 
 from api.core.config import settings
-from api.utils.logger import logger
+from api.core.dependencies.security import principal_cache
+from api.core.middleware.access_log import AccessLogMiddleware
+from api.core.middleware.metrics import MetricsMiddleware, metrics_registry
+from api.core.middleware.profiling import ProfilingMiddleware
+from api.core.middleware.rate_limit import RateLimitMiddleware, rate_limiter
+from api.db import database
+from api.db.pool import pool_registry
+from api.utils import jwt_helpers, password_utils
+from api.utils.logger import logger, logging_stats
+from api.utils.response_cache import response_cache
 from api.v1.routes.main import main_router
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    database.init_engines()
+    await run_in_threadpool(password_utils.configure_bcrypt_cost)
     yield
+    await database.dispose_engines()
 
 
 app = FastAPI(lifespan=lifespan, title="Boilerplate")
 
-# In-memory request counter by endpoint and IP address
-request_counter = defaultdict(lambda: defaultdict(int))
-
-
-# Middleware to track request counts and IP addresses
-class RequestCountMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        endpoint = request.url.path
-        ip_address = request.client.host
-        request_counter[endpoint][ip_address] += 1
-        response = await call_next(request)
-        return response
-
-
-app.add_middleware(RequestCountMiddleware)
+# Opt-in SQL timings in a Server-Timing header, and profiles on request
+if settings.PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware)
+# Per-client rate limits, inside the metrics so refused requests are counted
+app.add_middleware(RateLimitMiddleware, limiter=rate_limiter)
+# Request counts, latency and size by route template
+app.add_middleware(MetricsMiddleware, registry=metrics_registry)
+# Request ids on every log record, and a JSON access log record per request
+app.add_middleware(AccessLogMiddleware)
 app.include_router(main_router)
 
 
@@ -46,14 +50,43 @@ async def get_request_stats():
     return JSONResponse(
         status_code=status.HTTP_200_OK,
         content={
-            "request_counts": {
-                endpoint: dict(ips) for endpoint, ips in request_counter.items()
-            },
+            "request_counts": metrics_registry.request_counts(),
+            "principal_cache": principal_cache.stats(),
+            "password_hashing": password_utils.metrics.stats(),
+            "jwt_cache": jwt_helpers.verified_tokens.stats(),
+            "rate_limits": rate_limiter.stats(),
+            "logging": logging_stats(),
+            # a redis backend answers over the network
+            "response_cache": await run_in_threadpool(response_cache.stats),
             "message": "endpoints request retreived successfully",
         },
     )
 
 
+# Endpoint to inspect the database connection pools of this worker
+@app.get("/pool-stats", response_class=JSONResponse)
+async def get_pool_stats():
+    return JSONResponse(
+        status_code=status.HTTP_200_OK,
+        content={
+            "pools": pool_registry.stats(),
+            "message": "connection pool stats retrieved successfully",
+        },
+    )
+
+
+# Endpoint to scrape request metrics in the Prometheus text format
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def get_metrics():
+    return PlainTextResponse(
+        metrics_registry.render_prometheus()
+        + pool_registry.render_prometheus()
+        + rate_limiter.render_prometheus()
+        + await run_in_threadpool(response_cache.render_prometheus),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
+
 app.add_middleware(SessionMiddleware, secret_key=settings.SECRET_KEY)
 app.add_middleware(
     CORSMiddleware,
@@ -89,6 +122,7 @@ async def http_exception(request: Request, exc: HTTPException):
             "status_code": exc.status_code,
             "message": exc.detail,
         },
+        headers=exc.headers,
     )
 
 
@@ -145,9 +179,7 @@ async def exception(request: Request, exc: Exception):
 
 
 if __name__ == "__main__":
-    uvicorn.run(
-        "main:app",
-        port=7001,
-        reload=True,
-        workers=4,
-    )
+    # same as `python -m api.cli.serve`, kept out of the import of the app
+    from api.cli import serve
+
+    serve.main()